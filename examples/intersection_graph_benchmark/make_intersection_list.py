@@ -0,0 +1,72 @@
+"""
+.. file:: make_intersection_list.py
+   :synopsis: writes a synthetic intersection_list.dat and fracture_info.dat
+   :version: 1.0
+
+"""
+
+import sys
+import numpy as np
+
+
+def make_intersection_list(num_intersections,
+                           intersection_file="intersection_list.dat",
+                           fracture_info="fracture_info.dat",
+                           seed=0):
+    """ Write a synthetic DFN with num_intersections intersections, on average 4 per fracture
+
+    Parameters
+    ----------
+        num_intersections : int
+            number of intersections between fractures
+        intersection_file : string
+            name of the intersection list
+        fracture_info : string
+            name of the fracture information file
+        seed : int
+            seed of the random number generator
+
+    Returns
+    -------
+        None
+
+    Notes
+    -----
+    The fractures are numbered 1 to num_intersections / 2 and each intersection joins two different random fractures. Fractures 1 to 49 intersect the left boundary and fractures 51 to 99 the right boundary. Intersection centers are uniform in the unit cube.
+    """
+
+    rng = np.random.RandomState(seed)
+    num_fractures = num_intersections // 2
+    f1 = rng.randint(1, num_fractures + 1, num_intersections)
+    f2 = rng.randint(1, num_fractures + 1, num_intersections)
+    f2 = np.where(f2 == f1, (f1 % num_fractures) + 1, f2)
+    center = rng.rand(num_intersections, 3)
+
+    boundary = np.arange(1, 50)
+    f1 = np.concatenate((f1, boundary, boundary + 50))
+    f2 = np.concatenate((f2, np.full(49, -3), np.full(49, -5)))
+    center = np.concatenate((center, np.zeros((98, 3))))
+    length = np.ones(len(f1))
+
+    with open(intersection_file, "w") as f:
+        f.write(
+            "fracture 1, fracture 2, x center, y center, z center, intersection length\n"
+        )
+        np.savetxt(f,
+                   np.column_stack((f1, f2, center, length)),
+                   fmt="%d %d %f %f %f %f")
+
+    with open(fracture_info, "w") as f:
+        f.write("num_connections perm aperture\n")
+        np.savetxt(f,
+                   np.column_stack((np.bincount(
+                       np.concatenate((f1, f2[f2 > 0])),
+                       minlength=num_fractures + 1)[1:],
+                                    np.full(num_fractures, 1e-12),
+                                    np.full(num_fractures, 1e-6))),
+                   fmt="%d %e %e")
+
+
+if __name__ == "__main__":
+    num_intersections = int(sys.argv[1]) if len(sys.argv) > 1 else 10**6
+    make_intersection_list(num_intersections)
@@ -0,0 +1,40 @@
+"""
+.. file:: run_benchmark.py
+   :synopsis: times the construction of the intersection graph
+   :version: 1.0
+
+"""
+
+import os
+import sys
+from time import time as timer
+
+import numpy as np
+
+from pydfnworks.dfnGraph import dfn2graph as d2g
+from make_intersection_list import make_intersection_list
+
+# edge arrays of the intersection graph, up to 10^6 intersections
+for num_intersections in [10**4, 10**5, 10**6]:
+    rng = np.random.RandomState(0)
+    num_fractures = num_intersections // 2
+    f1 = rng.randint(1, num_fractures + 1, num_intersections)
+    f2 = rng.randint(1, num_fractures + 1, num_intersections)
+    f2 = np.where(f2 == f1, (f1 % num_fractures) + 1, f2)
+    x, y, z = rng.rand(3, num_intersections)
+    start = timer()
+    u, v, frac, distance = d2g.intersection_graph_edges(
+        list(zip(f1.tolist(), f2.tolist())), x, y, z)
+    print("--> %d intersections: %d edges in %0.2f seconds" %
+          (num_intersections, len(u), timer() - start))
+
+# full NetworkX graph from intersection_list.dat, limited by memory
+sizes = [int(n) for n in sys.argv[1:]] or [5000, 10**5, 3 * 10**5]
+for num_intersections in sizes:
+    make_intersection_list(num_intersections)
+    start = timer()
+    G = d2g.create_intersection_graph("left", "right")
+    print("--> %d intersections: graph with %d edges in %0.2f seconds" %
+          (num_intersections, G.number_of_edges(), timer() - start))
+    os.remove("intersection_list.dat")
+    os.remove("fracture_info.dat")
@@ -53,11 +53,14 @@ class Poisson_Variables():
         # number of the next already accepted node to be center of
         # a sampling. Stored here, so main_sampling can continue,
         # where it left off, if interrupted.
-        self.no_of_nodes = 0  # current length of Coordinate-list
-        self.coordinates = []
-        # list of coordinates. Every entry is an array with the first
-        # two components being x/y-coordinates and the third entry being
-        # the local exclusion radius of the node.
+        self.sampling_front = 64
+        # number of accepted nodes, that are sampled around at a time.
+        self.no_of_nodes = 0  # current number of nodes in coordinates
+        self.coordinates = np.zeros((0, 3))
+        # array of coordinates, grown by append_node. The first
+        # no_of_nodes rows are nodes, with the first two components being
+        # x/y-coordinates and the third entry being the local exclusion
+        # radius of the node.
 
         # Geometry of Polygon
         self.vertices = []  # corner vertices of the polygon,
@@ -75,8 +78,14 @@ class Poisson_Variables():
         # vertex-index of the vertex with the smallest y-value of the
         # vertices with x-value x_min, used to define upper and lower
         # boundary function. requires convexity of polygon to be well-def
-        self.slope_lower_boundary = 0  # boundaries of polygon are piecewise linear
-        self.slope_upper_boundary = 0
+        self.lower_boundary_x = np.zeros(0)
+        self.lower_boundary_y = np.zeros(0)
+        self.lower_boundary_slopes = np.zeros(0)
+        self.upper_boundary_x = np.zeros(0)
+        self.upper_boundary_y = np.zeros(0)
+        self.upper_boundary_slopes = np.zeros(0)
+        # breakpoints (vertices ordered by x) and slopes of the lower and
+        # upper boundary functions, see read_vertices
 
         # Neighbor-grid variables
         self.neighbor_cell_size = self.H / 2 / np.sqrt(2)
@@ -96,9 +105,19 @@ class Poisson_Variables():
             self.intersect_grid_inv = 1
             # inverse cell-size of intersection-grid
         self.intersect_endpts = []
+        self.intersect_segments = np.zeros((0, 2, 2))
+        # start and end point of each intersection, array version of
+        # intersect_endpts
         self.intersect_cells = {}
         # key (i,j) contains numbers of intersection within a distance
         # of intersect-range or less to the intersect-cell (i,j)
+        self.distance_field = None
+        # distance to the closest intersection on a grid of spacing H/2,
+        # capped at the intersect range, see distance_field_init
+        self.distance_field_band = np.zeros((0, 0), dtype=bool)
+        # True for cells of the distance field where exclusion radii
+        # are computed exactly
+        self.distance_field_spacing_inv = 1
         self.square_nodes = np.array([[1, 0], [1, 1], [0, 1], [0, 0], [1, 0]])
         # (k-1)-th and k-th row contain nodes of a square bounding the
         # edge of that square in direction k, where k in [1,2,3,4]
@@ -1,7 +1,8 @@
 # func.py
 from pydfnworks.dfnGen.meshing.poisson_disc import poisson_class as pc
 
-from numpy import arange, array, ogrid, nonzero, zeros, append
+import numpy as np
+from numpy import arange, array, nonzero, zeros, append
 from random import random, shuffle
 from math import sqrt, floor, ceil, cos, sin, pi
 from matplotlib import pyplot as plt
@@ -27,12 +28,22 @@ The contained functions in order are:
 
 *called by other functions:
     - neighbor_cell()
+    - neighbor_cells()
     - neighbor_grid_init()
-    - new_candidate()
+    - new_candidates()
     - accept_candidate()
+    - accept_candidates()
+    - append_node()
     - exclusion_radius()
+    - exclusion_radii()
+    - exclusion_radius_from_distance()
+    - exclusion_radius_exact()
+    - exclusion_radii_exact()
     - intersect_distance()
+    - intersect_distances_sq()
     - not_in_domain()
+    - in_domain_candidates()
+    - boundary_values()
     - neighboring_cells()
     - read_vertices()
     - read_intersections()
@@ -40,18 +51,19 @@ The contained functions in order are:
     - sampling_along_line()
     - intersect_cell()
     - intersect_grid_init()
+    - distance_field_init()
+    - distance_grid()
     - intersect_mark_start_cells()
     - intersect_direction()
     - intersect_mark_next_cells()
     - intersect_crossing_cell_wall()
     - intersect_cell_sign()
-    - occupancy_cell()
     - occupancy_undersampled()
     - occupancy_grid_update()
+    - occupancy_outside()
+    - boundary_chain()
     - occupancy_mark()
     - resample()
-    - lower_boundary()
-    - upper_boundary()
     - distance()
     - distance_sq()
     - norm_sq()
@@ -93,10 +105,15 @@ def main_init(c):  # polygons, intersections):
             c.intersect_endpts.append(well_pts[i])
             #print(c.intersect_endpts)
 
+    c.intersect_segments = array(c.intersect_endpts,
+                                 dtype=float).reshape(-1, 2, 2)
     intersect_grid_init(c)
-    c.coordinates = boundary_sampling(c)
+    distance_field_init(c)
+    boundary_points = boundary_sampling(c)
+    c.no_of_nodes = len(boundary_points)
+    c.coordinates = zeros((max(2 * c.no_of_nodes, 1024), 3))
+    c.coordinates[:c.no_of_nodes] = boundary_points
     c.neighbor_grid = neighbor_grid_init(c)
-    c.no_of_nodes = len(c.coordinates)
 
 
 #####################################################################
@@ -106,9 +123,11 @@ def main_init(c):  # polygons, intersections):
 def main_sample(c):
     """ Runs over already accepted nodes and samples new candidates  on an
     annulus around them. valid candidates are added to c.coordinates
-    c.k candidates are sampled at once. If all k
-    are rejected, move on to next already accepted node. Terminate
-    after their are no new already accepted nodes.
+    c.k candidates are sampled around each of the next c.sampling_front
+    accepted nodes, and all of them are tested as one batch. A node
+    whose k candidates are all rejected is done, the others are sampled
+    around again. Terminate after their are no new already accepted
+    nodes.
 
 
     Parameters
@@ -125,16 +144,19 @@ def main_sample(c):
         Proceeds from, where it terminated the previous time, if called
         more than once.
     """
-    while c.current_node < c.no_of_nodes:  # sample around all accepted nodes
-        next_node = False
-        while not next_node:
-            next_node = True
-            for j in range(0, c.k):  # sample k candidates around node
-                candidate = new_candidate(c, c.coordinates[c.current_node])
-                if accept_candidate(c, candidate):
-                    c.no_of_nodes = c.no_of_nodes + 1
-                    next_node = False  # stay at  node unless all k candidates are rejected
-        c.current_node = c.current_node + 1
+    active = arange(c.current_node, c.no_of_nodes)
+    # accepted nodes, that are not done yet, in order of acceptance
+    while len(active) > 0:  # sample around all accepted nodes
+        front = active[:c.sampling_front]
+        first_new_node = c.no_of_nodes
+        # sample k candidates around every node of the front
+        candidates = new_candidates(c, c.coordinates[front])
+        accepted = accept_candidates(c, candidates)
+        # stay at a node unless all its k candidates are rejected
+        stay = accepted.reshape(len(front), c.k).any(axis=1)
+        active = np.concatenate((front[stay], active[len(front):],
+                                 arange(first_new_node, c.no_of_nodes)))
+    c.current_node = c.no_of_nodes
 
 
 #######################################################################
@@ -172,8 +194,7 @@ def search_undersampled_cells(c):
         random_integer = random_permutation.pop()
         candidate = resample(c, undersampled_x[random_integer],
                              undersampled_y[random_integer])
-        if accept_candidate(c, candidate):
-            c.no_of_nodes = c.no_of_nodes + 1
+        accept_candidate(c, candidate)
 
 
 #######################################################################
@@ -197,11 +218,9 @@ def dump_coordinates(c, output_file="points.xyz"):
 
         """
 
-    col_format = "{:<30}" * 3 + "\n"
-    z = c.z_plane
-    with open(output_file, 'w') as file_o:
-        for element in c.coordinates:
-            file_o.write(col_format.format(*[element[0], element[1], z]))
+    points = c.coordinates[:c.no_of_nodes].copy()
+    points[:, 2] = c.z_plane
+    np.savetxt(output_file, points, fmt="%-30.17g", delimiter="")
 
 
 #######################################################################
@@ -228,8 +247,8 @@ def plot_coordinates(c, output_file=""):
 
     """
 
-    xcoord = [x[0] for x in c.coordinates]
-    ycoord = [x[1] for x in c.coordinates]
+    xcoord = c.coordinates[:c.no_of_nodes, 0]
+    ycoord = c.coordinates[:c.no_of_nodes, 1]
     plt.axis([
         c.x_min - c.max_exclusion_radius, c.x_max + c.max_exclusion_radius,
         c.y_min - c.max_exclusion_radius, c.y_max + c.max_exclusion_radius
@@ -273,6 +292,32 @@ def neighbor_cell(c, X):
 #######################################################################
 
 
+def neighbor_cells(c, X):
+    """ Returns look up-Grid indices of a batch of points
+
+    Parameters
+    -----------
+        c : Poisson Disc Class
+            contains input parameters and widely used variables
+        X : ndarray(float)
+            (n, 2) array of 2D coordinates of points inside the neighbor-grid
+
+    Returns
+    ---------
+        cells : ndarray(int)
+            (n, 2) array of horizontal and vertical neighbor-cell numbers
+
+    Notes
+    -----
+
+    """
+    return np.floor((X[:, 0:2] - [c.x_min, c.y_min]) *
+                    c.neighbor_cell_size_inv).astype(int)
+
+
+#######################################################################
+
+
 def neighbor_grid_init(c):
     """ Initializes background grid
 
@@ -302,11 +347,10 @@ def neighbor_grid_init(c):
         (c.y_max - c.y_min) * c.neighbor_cell_size_inv)
     neighbor_grid = zeros((c.no_horizontal_neighbor_cells + 1,
                            c.no_vertical_neighbor_cells + 1)).astype(int)
-    for node_number in range(0, len(c.coordinates)):
-        neighbor_grid[neighbor_cell(
-            c, c.coordinates[node_number])] = node_number + 1
-        # every occupied cells is labelled with the node-number (start at 1)
-        # of the node occupying it. empty cells are 0.
+    cells = neighbor_cells(c, c.coordinates[:c.no_of_nodes])
+    neighbor_grid[cells[:, 0], cells[:, 1]] = arange(1, c.no_of_nodes + 1)
+    # every occupied cells is labelled with the node-number (start at 1)
+    # of the node occupying it. empty cells are 0.
     return neighbor_grid
 
 
@@ -314,34 +358,39 @@ def neighbor_grid_init(c):
 ###########___Functions related to primary Sampling___#################
 
 
-def new_candidate(c, X):
-    """ Returns a random point in a annular neighborhood of X
+def new_candidates(c, X):
+    """ Returns c.k random points in a annular neighborhood of each node of X
 
     Parameters
     ------------
         c : Poisson Disc Class
             contains input parameters and widely used variables
         X : ndarray(float)
-            first two entries: x,y-coordinates of a already accepted node.
-            last entry: local exclusion_radius of that node.
+            (n, 3) array of already accepted nodes. first two columns:
+            x,y-coordinates, last column: local exclusion_radius.
 
     Returns
     ---------
-        candidate : ndarray(float)
-            x,y- coordinates of a potential new node.
+        candidates : ndarray(float)
+            (n * c.k, 2) array of x,y- coordinates of potential new nodes.
+            Rows i * c.k to (i + 1) * c.k - 1 are sampled around X[i].
 
     Notes
     -----
 
     """
-    radius = random() * c.max_exclusion_radius + X[2]
+    n = len(X) * c.k
+    radius = array([random() for _ in range(n)]) * c.max_exclusion_radius + \
+        np.repeat(X[:, 2], c.k)
     # last entry of an element of c.coordinates
     # contains its local exclusion radius
     # Note: setting radius to X[2]+epsilon gives denser samplings
     # resulting in a per-node-speedup
-    angle = random() * pi * 2
-    candidate = X[0:2] + [radius * cos(angle), radius * sin(angle)]
-    return candidate
+    angle = array([random() for _ in range(n)]) * pi * 2
+    candidates = np.repeat(X[:, 0:2], c.k, axis=0)
+    candidates[:, 0] += radius * np.cos(angle)
+    candidates[:, 1] += radius * np.sin(angle)
+    return candidates
 
 
 #######################################################################
@@ -366,8 +415,8 @@ def accept_candidate(c, candidate):
     Notes
     -----
         If the candidate is accepted, it is added to c.coordinates
-        (including its local_exclusion_radius) and the neighbor grid
-        is updated.
+        (including its local_exclusion_radius), c.no_of_nodes is increased
+        and the neighbor grid is updated.
 
     """
 
@@ -408,17 +457,307 @@ def accept_candidate(c, candidate):
 
     # Appends candidate and its loc. ex-rad to accepted nodes and updates
     # neighbor-cells
-    c.coordinates.append(append(candidate, candidates_ex_rad))
-    c.neighbor_grid[candidates_neighbor_cell] = c.no_of_nodes + 1
+    append_node(c, candidate, candidates_ex_rad)
+    c.neighbor_grid[candidates_neighbor_cell] = c.no_of_nodes
     return True
 
 
 #######################################################################
 
 
+def accept_candidates(c, candidates):
+    """ accepts a batch of candidates, in order, if no conflicts with domain,
+    already accepted nodes, or earlier candidates of the batch arise
+
+    Parameters
+    ------------
+        c : Poisson Disc Class
+            contains input parameters and widely used variables
+        candidates : ndarray(float)
+            (n, 2) array of x,y-coordinates of potential new nodes
+
+    Returns
+    ---------
+        accepted : ndarray(bool)
+            True for the candidates accepted as new nodes
+
+    Notes
+    -----
+        Same tests as accept_candidate, but done for all candidates at
+        once. Candidates passing them are checked against each other, and
+        accepted unless they conflict with an earlier accepted candidate
+        of the batch. Accepted candidates are added to c.coordinates, the
+        neighbor grid is updated and c.no_of_nodes is increased.
+    """
+    accepted = zeros(len(candidates), dtype=bool)
+    index = arange(len(candidates))
+
+    # Checks if candidates are within rectangle defined by polygon
+    x, y = candidates[:, 0], candidates[:, 1]
+    keep = (x >= c.x_min) & (x <= c.x_max) & (y >= c.y_min) & (y <= c.y_max)
+    candidates, index = candidates[keep], index[keep]
+
+    # Checks if neighbor-cells are already occupied
+    cells = neighbor_cells(c, candidates)
+    keep = c.neighbor_grid[cells[:, 0], cells[:, 1]] == 0
+    candidates, index, cells = candidates[keep], index[keep], cells[keep]
+
+    # Checks if candidates are within polygon
+    keep = in_domain_candidates(c, candidates)
+    candidates, index, cells = candidates[keep], index[keep], cells[keep]
+    if len(candidates) == 0:
+        return accepted
+
+    # Checks if any closeby points conflict
+    ex_rad = exclusion_radii(c, candidates)
+    cell_distance = np.ceil(ex_rad * c.neighbor_cell_size_inv).astype(int)
+    # furthest number of cells a cell still containing a conflicting node
+    # could be away in x or y-direction
+    keep = np.ones(len(candidates), dtype=bool)
+    for max_cell_distance in np.unique(cell_distance):
+        group = nonzero(cell_distance == max_cell_distance)[0]
+        offset = arange(-max_cell_distance, max_cell_distance + 1)
+        X = (cells[group, 0, None, None] + offset[:, None]).clip(
+            0, c.no_horizontal_neighbor_cells)
+        Y = (cells[group, 1, None, None] + offset).clip(
+            0, c.no_vertical_neighbor_cells)
+        subgrid = c.neighbor_grid[X, Y].reshape(len(group), -1)
+        # neighboring cells of every candidate, clipped to the grid
+        candidate_number, cell_number = nonzero(subgrid)
+        closeby_nodes = c.coordinates[subgrid[candidate_number, cell_number]
+                                      - 1]
+        candidate_number = group[candidate_number]
+        conflict = (
+            (candidates[candidate_number, 0] - closeby_nodes[:, 0])**2 +
+            (candidates[candidate_number, 1] - closeby_nodes[:, 1])**2 <
+            np.minimum(ex_rad[candidate_number], closeby_nodes[:, 2])**2)
+        keep[candidate_number[conflict]] = False
+    candidates, index, cells, ex_rad = candidates[keep], index[keep], cells[
+        keep], ex_rad[keep]
+
+    # Resolve remaining candidates against each other in order, appends
+    # accepted candidates and their loc. ex-rad to accepted nodes and
+    # updates neighbor-cells
+    conflict = (((candidates[:, None, :] - candidates[None, :, :])**2).sum(
+        axis=2) < np.minimum(ex_rad[:, None], ex_rad[None, :])**2) | (
+            (cells[:, None, :] == cells[None, :, :]).all(axis=2))
+    later_conflicts = [[] for _ in range(len(candidates))]
+    for i, j in zip(*nonzero(np.triu(conflict, 1))):
+        later_conflicts[i].append(j)
+    rejected = [False] * len(candidates)
+    for j in range(len(candidates)):
+        if rejected[j]:
+            continue
+        accepted[index[j]] = True
+        append_node(c, candidates[j], ex_rad[j])
+        c.neighbor_grid[cells[j, 0], cells[j, 1]] = c.no_of_nodes
+        for i in later_conflicts[j]:
+            rejected[i] = True
+    return accepted
+
+
+#######################################################################
+
+
+def append_node(c, X, local_exclusion_radius):
+    """ Appends an accepted node to c.coordinates
+
+    Parameters
+    ------------
+        c : Poisson Disc Class
+            contains input parameters and widely used variables
+        X : ndarray(float)
+            x,y-coordinates of the node
+        local_exclusion_radius : float
+            exclusion radius of the node
+
+    Returns
+    ---------
+        None
+
+    Notes
+    -----
+        c.coordinates is preallocated and its size is doubled when full,
+        so only the first c.no_of_nodes rows are nodes. c.no_of_nodes is
+        increased.
+    """
+    if c.no_of_nodes == len(c.coordinates):
+        coordinates = zeros((max(2 * len(c.coordinates), 1024), 3))
+        coordinates[:c.no_of_nodes] = c.coordinates[:c.no_of_nodes]
+        c.coordinates = coordinates
+    c.coordinates[c.no_of_nodes, 0:2] = X[0:2]
+    c.coordinates[c.no_of_nodes, 2] = local_exclusion_radius
+    c.no_of_nodes = c.no_of_nodes + 1
+
+
+#######################################################################
+
+
+def exclusion_radii(c, X):
+    """ returns the local min-distance of a batch of points
+
+    Parameters
+    ------------
+        c : Poisson Disc Class
+            contains input parameters and widely used variables
+        X : ndarray(float)
+            (n, 2) array of x,y-coordinates of nodes
+
+    Returns
+    ---------
+        local_exclusion_radius : ndarray(float)
+            exclusion radius at each point
+    Notes
+    -----
+        The distance to the closest intersection is interpolated from
+        c.distance_field, see distance_field_init. Points in cells of the
+        refinement band, or outside of the field, use exclusion_radii_exact.
+        """
+
+    if c.distance_field is None:
+        return exclusion_radii_exact(c, X)
+    f = (X[:, 0:2] - [c.x_min, c.y_min]) * c.distance_field_spacing_inv
+    cells = f.astype(int)
+    # cells outside of the field are clipped and computed exactly
+    nx, ny = c.distance_field_band.shape
+    i = cells[:, 0].clip(0, nx - 1)
+    j = cells[:, 1].clip(0, ny - 1)
+    exact = c.distance_field_band[i, j] | (f < 0).any(axis=1) | (
+        i != cells[:, 0]) | (j != cells[:, 1])
+    # bilinear interpolation
+    t = f - np.column_stack((i, j))
+    index = i * (ny + 1) + j
+    field = c.distance_field.ravel()
+    D0 = field[index] + t[:, 1] * (field[index + 1] - field[index])
+    D1 = field[index + ny + 1] + t[:, 1] * (field[index + ny + 2] -
+                                            field[index + ny + 1])
+    local_exclusion_radius = exclusion_radius_from_distance(
+        c, D0 + t[:, 0] * (D1 - D0))
+    if exact.any():
+        local_exclusion_radius[exact] = exclusion_radii_exact(c, X[exact])
+    return local_exclusion_radius
+
+
+#######################################################################
+
+
 def exclusion_radius(c, X):
     """ returns the local min-distance of particle X
 
+    Parameters
+    ------------
+        c : Poisson Disc Class
+            contains input parameters and widely used variables
+        X : ndarray(float)
+            first two entries: x,y-coordinates of a node
+
+    Returns
+    ---------
+        local_exclusion_radius : float
+            exclusion radius at point X
+    Notes
+    -----
+        X can have more than 2 entries. Anything, but the first
+        two will be ignored. Scalar version of exclusion_radii
+
+        """
+
+    if c.distance_field is None:
+        return exclusion_radius_exact(c, X)
+    fx = (X[0] - c.x_min) * c.distance_field_spacing_inv
+    fy = (X[1] - c.y_min) * c.distance_field_spacing_inv
+    i, j = floor(fx), floor(fy)
+    nx, ny = c.distance_field_band.shape
+    if i < 0 or i >= nx or j < 0 or j >= ny or c.distance_field_band[i, j]:
+        return exclusion_radius_exact(c, X)
+    tx, ty = fx - i, fy - j
+    field = c.distance_field
+    D = ((1 - tx) * (1 - ty) * field[i, j] + tx * (1 - ty) * field[i + 1, j] +
+         (1 - tx) * ty * field[i, j + 1] + tx * ty * field[i + 1, j + 1])
+    if D * D >= c.intersect_range_sq:
+        return c.max_exclusion_radius
+    return max(c.A * (D - c.F * c.H) + .5 * c.H, .5 * c.H)
+
+
+#######################################################################
+
+
+def exclusion_radius_from_distance(c, D):
+    """ returns the local min-distance at a distance D from the closest intersection
+
+    Parameters
+    ------------
+        c : Poisson Disc Class
+            contains input parameters and widely used variables
+        D : ndarray(float)
+            distances to the closest intersection
+
+    Returns
+    ---------
+        local_exclusion_radius : ndarray(float)
+            exclusion radius at each distance
+    Notes
+    -----
+        see exclusion_radius_exact. The radius reaches c.max_exclusion_radius at
+        the intersect range and is capped there.
+        """
+    return np.minimum(np.maximum(c.A * (D - c.F * c.H) + .5 * c.H, .5 * c.H),
+                      c.max_exclusion_radius)
+
+
+#######################################################################
+
+
+def exclusion_radii_exact(c, X):
+    """ returns the local min-distance of a batch of points, computed from the
+    distances to the close by intersections
+
+    Parameters
+    ------------
+        c : Poisson Disc Class
+            contains input parameters and widely used variables
+        X : ndarray(float)
+            (n, 2) array of x,y-coordinates of nodes
+
+    Returns
+    ---------
+        local_exclusion_radius : ndarray(float)
+            exclusion radius at each point
+    Notes
+    -----
+        Same as exclusion_radius_exact for every point. Points in the same
+        intersect-cell are evaluated together.
+        """
+
+    local_exclusion_radius = np.full(len(X), c.max_exclusion_radius)
+    cells = np.floor(
+        (X[:, 0:2] - [c.x_min, c.y_min]) * c.intersect_grid_inv).astype(int)
+    points_in_cell = {}
+    for i, cell in enumerate(map(tuple, cells.tolist())):
+        points_in_cell.setdefault(cell, []).append(i)
+    for cell, points in points_in_cell.items():
+        closeby_intersections = c.intersect_cells.get(cell)
+        if closeby_intersections is None:
+            # no intersection is close enough to influence the exclusion
+            # radius in this cell
+            continue
+        points = array(points)
+        closest_intersect_distance_sq = intersect_distances_sq(
+            c, X[points], closeby_intersections)
+        close = closest_intersect_distance_sq < c.intersect_range_sq
+        D = np.sqrt(closest_intersect_distance_sq[close])
+        local_exclusion_radius[points[close]] = np.maximum(
+            c.A * (D - c.F * c.H) + .5 * c.H, .5 * c.H)
+    return local_exclusion_radius
+
+
+#######################################################################
+
+
+def exclusion_radius_exact(c, X):
+    """ returns the local min-distance of particle X, computed from the
+    distances to the close by intersections
+
     Parameters
     ------------
         c : Poisson Disc Class
@@ -509,6 +848,61 @@ def intersect_distance_sq(c, X, closeby_intersections):
     return square_dist
 
 
+###################################################################
+
+
+def intersect_distances_sq(c, X, closeby_intersections, return_closest=False):
+    """ returns square distance of a batch of points to the closest intersection
+
+    Parameters
+    -----------
+        c : Poisson Disc Class
+            contains input parameters and widely used variables
+        X : ndarray(float)
+            (n, 2) array of x,y-coordinates of nodes
+        closeby_intersections : list(int)
+            numbers of intersections to consider
+        return_closest : bool
+            if True, the index of the closest intersection in
+            closeby_intersections is returned as well
+
+    Returns
+    ---------
+        square_dist : ndarray(float)
+            square of the distance of each point to the closest intersection
+        closest : ndarray(int)
+            index of the closest intersection of each point, only if
+            return_closest is True
+
+    Notes
+    -----
+        Same as intersect_distance_sq for every point
+    """
+    segments = c.intersect_segments[closeby_intersections]
+    start, end = segments[None, :, 0, :], segments[None, :, 1, :]
+    X = X[:, None, 0:2]
+    direction = end - start
+    projection_on_intersection = ((X - start) * direction).sum(axis=2)
+    length_of_intersection_sq = (direction * direction).sum(axis=2)
+    # If one of the endpoints is closest to X
+    to_end_points = np.minimum(((X - start)**2).sum(axis=2),
+                               ((X - end)**2).sum(axis=2))
+    inner = (projection_on_intersection > 0) & (projection_on_intersection <
+                                                length_of_intersection_sq)
+    # square distance from point to infinite line defined by start and
+    # end point
+    fraction = np.where(
+        inner,
+        projection_on_intersection / np.where(inner, length_of_intersection_sq,
+                                              1), 0)
+    to_line = (((X - start) - direction * fraction[:, :, None])**2).sum(axis=2)
+    square_dist = np.where(inner, to_line, to_end_points)
+    if return_closest:
+        closest = square_dist.argmin(axis=1)
+        return square_dist[arange(len(X)), closest], closest
+    return square_dist.min(axis=1)
+
+
 ####################################################################
 
 
@@ -525,53 +919,83 @@ def in_domain(c, X):
     Returns
     ---------
         True/False : bool
-            False if X lies within the polygon
-            True otherwise
+            True if X lies within the polygon
+            False otherwise
     Notes
     -----
+        see in_domain_candidates
+    """
+    return bool(in_domain_candidates(c, np.reshape(X[0:2], (1, 2)))[0])
+
+
+#######################################################################
+
 
+def in_domain_candidates(c, X):
+    """ Tests which nodes of a batch are within the polyon defined by c.vertices.
 
+    Parameters
+    -----------
+        c : Poisson Disc Class
+            contains input parameters and widely used variables
+        X : ndarray(float)
+            (n, 2) array of x,y-coordinates of nodes
 
+    Returns
+    ---------
+        inside : ndarray(bool)
+            True for the nodes within the polygon
+    Notes
+    -----
+        A node is within the polygon if its x-value lies between x_min and
+        x_max, and its y-value lies between the lower and upper bounding
+        function at that x-value. Nodes on the boundary are within the
+        polygon.
     """
-    # Checks if below lower bounding function
-    i = c.last_x_min_index  # start at index of the vertex of the polygon
-    # with the smalles y-value out of the vertices
-    # with x-value x_min
-    while c.vertices_x[i] < c.x_max:
-        # Go through the x-coordinates of the  vertices along the lower
-        # boundary to see between, which two the x-value of X lies
-        # Remember vertices are ordered clockwise
-        if X[0] >= c.vertices_x[i] and X[0] <= c.vertices_x[(i + 1) %
-                                                            c.no_of_vertices]:
-            if X[1] < c.vertices_y[i] + \
-                    c.slope_lower_boundary[i] * (X[0] - c.vertices_x[i]):
-                # See if the y-value of X lies below the lower boundary
-                # Since the boundary is piecewise linear, it was enough
-                # to find the two vertices in the previous step
-                return False
-            else:
-                break
-        i = (i + 1) % c.no_of_vertices
+    if len(c.lower_boundary_slopes) == 0 or len(c.upper_boundary_slopes) == 0:
+        return zeros(len(X), dtype=bool)
+    inside = (X[:, 0] >= c.x_min) & (X[:, 0] <= c.x_max)
+    inside &= X[:, 1] >= boundary_values(c.lower_boundary_x,
+                                         c.lower_boundary_y,
+                                         c.lower_boundary_slopes, X[:, 0])
+    # See if the y-value of X lies below the lower boundary
+    inside &= X[:, 1] <= boundary_values(c.upper_boundary_x,
+                                         c.upper_boundary_y,
+                                         c.upper_boundary_slopes, X[:, 0])
+    # See if the y-value of X lies above the upper boundary
+    return inside
 
-    # Checks if above upper bounding function
-    i = c.first_x_min_index  # start at index of vertex of polygon
-    # with highest y-value out of the vertices with
-    # x-value x_min
-    while c.vertices_x[i] < c.x_max:
-        # Go through the x-coordinates of the  vertices along the upper
-        # boundary to see between, which two the x-value of X lies
-        # Remember vertices are ordered clockwise
-        if X[0] >= c.vertices_x[i] and X[0] <= c.vertices_x[(i - 1) %
-                                                            c.no_of_vertices]:
-            if X[1] > c.vertices_y[i] + \
-                    c.slope_upper_boundary[i] * (X[0] - c.vertices_x[i]):
-                # See if the y-value of X lies above the upper boundary
-                # Since the boundary is piecewise linear, it was enough
-                # to find the two vertices in the previous step
-                return False
-            else:
-                return True
-        i = (i - 1) % c.no_of_vertices
+
+#######################################################################
+
+
+def boundary_values(breakpoints_x, breakpoints_y, slopes, x):
+    """ Evaluates a piecewise linear bounding function of the polygon
+
+    Parameters
+    -----------
+        breakpoints_x, breakpoints_y : ndarray(float)
+            vertices of the boundary, breakpoints_x is increasing
+        slopes : ndarray(float)
+            slope of the boundary between consecutive breakpoints
+        x : ndarray(float)
+            x-values between c.x_min and c.x_max
+
+    Returns
+    ---------
+        y : ndarray(float)
+            values of the bounding function at x
+
+    Notes
+    -----
+        The segment between two breakpoints is found by bisection. At a
+        breakpoint the segment to its left is used, as when walking the
+        vertices of the boundary in clockwise order.
+    """
+    i = np.searchsorted(breakpoints_x[1:-1], x)
+    # x-values left of the first or right of the last breakpoint use
+    # the first or last segment
+    return breakpoints_y[i] + slopes[i] * (x - breakpoints_x[i])
 
 
 #######################################################################
@@ -666,20 +1090,15 @@ def read_vertices(c, path_to_polygon):
                        c.no_of_vertices] == c.vertices_x[c.last_x_min_index]:
         c.last_x_min_index = (c.last_x_min_index + 1) % c.no_of_vertices
 
-    c.slope_lower_boundary = zeros(c.no_of_vertices)
-    c.slope_upper_boundary = zeros(c.no_of_vertices)
-    i = c.last_x_min_index
-    while c.vertices_x[i] < c.x_max:
-        c.slope_lower_boundary[i] = (c.vertices_y[
-            (i + 1) % c.no_of_vertices] - c.vertices_y[i]) / (c.vertices_x[
-                (i + 1) % c.no_of_vertices] - c.vertices_x[i])
-        i = (i + 1) % c.no_of_vertices
-    i = c.first_x_min_index
-    while c.vertices_x[i] < c.x_max:
-        c.slope_upper_boundary[i] = (c.vertices_y[
-            (i - 1) % c.no_of_vertices] - c.vertices_y[i]) / (c.vertices_x[
-                (i - 1) % c.no_of_vertices] - c.vertices_x[i])
-        i = (i - 1) % c.no_of_vertices
+    # Breakpoints and slopes of the bounding functions, for bisection
+    c.lower_boundary_x, c.lower_boundary_y = boundary_chain(
+        c, c.last_x_min_index, 1)
+    c.lower_boundary_slopes = np.diff(c.lower_boundary_y) / np.diff(
+        c.lower_boundary_x)
+    c.upper_boundary_x, c.upper_boundary_y = boundary_chain(
+        c, c.first_x_min_index, -1)
+    c.upper_boundary_slopes = np.diff(c.upper_boundary_y) / np.diff(
+        c.upper_boundary_x)
     del lines
     return vertices
 
@@ -992,6 +1411,104 @@ def intersect_grid_init(c):
 #######################################################################
 
 
+def distance_field_init(c):
+    """ Rasterizes the distance to the closest intersection, so exclusion radii
+    can be interpolated instead of computed from the intersections
+
+    Parameters
+    ------------
+        c : Poisson Disc Class
+            contains input parameters and widely used variables
+
+    Returns
+    ---------
+        None
+
+    Notes
+    -----
+        The distance is computed exactly at the nodes of a grid with spacing
+        H/2 over the bounding box of the polygon and capped at the intersect
+        range. Outside of the refinement band, where exclusion radii are
+        computed exactly, the interpolated distance is never smaller than
+        the exact distance, so interpolated exclusion radii are never smaller
+        than the exact ones: the distance to a single intersection is convex,
+        and bilinear interpolation of a convex function is not smaller than
+        the function. A cell of the grid is in the refinement band unless the
+        same intersection is the closest one at its four nodes, or all four
+        are beyond the intersect range. These are the cells where two
+        intersections are equally close and at the intersect range.
+    """
+    c.distance_field = None
+    if len(c.intersect_segments) == 0 or c.intersect_range_sq == 0 or c.A == 0:
+        # exclusion radius is constant
+        return
+    spacing = .5 * c.H
+    xs = c.x_min + spacing * arange(ceil((c.x_max - c.x_min) / spacing) + 2)
+    ys = c.y_min + spacing * arange(ceil((c.y_max - c.y_min) / spacing) + 2)
+    field, closest = distance_grid(c, xs, ys)
+
+    c.distance_field = field
+    c.distance_field_band = (closest[:-1, :-1] != closest[1:, :-1]) | (
+        closest[:-1, :-1] != closest[:-1, 1:]) | (closest[:-1, :-1] !=
+                                                  closest[1:, 1:])
+    c.distance_field_spacing_inv = 1 / spacing
+
+
+#######################################################################
+
+
+def distance_grid(c, xs, ys):
+    """ Distance to the closest intersection at the nodes of a grid, capped at the intersect range
+
+    Parameters
+    ------------
+        c : Poisson Disc Class
+            contains input parameters and widely used variables
+        xs/ys : ndarray(float)
+            increasing x/y-coordinates of the grid lines
+
+    Returns
+    ---------
+        distance : ndarray(float)
+            (len(xs), len(ys)) array of distances
+        closest : ndarray(int)
+            (len(xs), len(ys)) array of the numbers of the closest
+            intersections, -1 where the distance is capped
+
+    Notes
+    -----
+        Uses the intersections listed in c.intersect_cells for the
+        intersect-cell of each node, as exclusion_radius_exact.
+    """
+    intersect_range = sqrt(c.intersect_range_sq)
+    distance = np.full((len(xs), len(ys)), intersect_range)
+    closest = np.full((len(xs), len(ys)), -1)
+    # grid nodes in each intersect-cell
+    cells_x = np.floor((xs - c.x_min) * c.intersect_grid_inv).astype(int)
+    cells_y = np.floor((ys - c.y_min) * c.intersect_grid_inv).astype(int)
+    for (cell_x, cell_y), closeby_intersections in c.intersect_cells.items():
+        x0, x1 = np.searchsorted(cells_x, [cell_x, cell_x + 1])
+        y0, y1 = np.searchsorted(cells_y, [cell_y, cell_y + 1])
+        if x0 == x1 or y0 == y1:
+            continue
+        X = np.stack(np.meshgrid(xs[x0:x1], ys[y0:y1], indexing='ij'),
+                     axis=-1).reshape(-1, 2)
+        square_dist, closest_number = intersect_distances_sq(
+            c, X, closeby_intersections, return_closest=True)
+        capped = square_dist >= c.intersect_range_sq
+        distance[x0:x1, y0:y1] = np.where(capped, intersect_range,
+                                          np.sqrt(square_dist)).reshape(
+                                              x1 - x0, y1 - y0)
+        closest[x0:x1, y0:y1] = np.where(
+            capped, -1,
+            array(closeby_intersections)[closest_number]).reshape(
+                x1 - x0, y1 - y0)
+    return distance, closest
+
+
+#######################################################################
+
+
 def intersect_mark_start_cells(c, center_cell, intersect_number):
     """ Adds the intersection number to the center cell and all its 8 neighbor cells in
     the dictionary c.intersect_cells. Marks 3x3 cells
@@ -1231,34 +1748,6 @@ def intersect_cell_sign(c, X, Y, dx, dy, yshift):
 #############___Functions related to Occupancy Grid___#################
 
 
-def occupancy_cell(c, X):
-    """ Returns Occupancy-Grid index of the point X
-
-    Parameters
-    ------------
-        c : Poisson Disc Class
-            contains input parameters and widely used variables
-        X : ndarray(float)
-            x,y-coordinats of a points
-
-    Returns
-    ---------
-        x,y : int
-            index-pair of the occupancy-grid-cell, in which X lies
-
-    Notes
-    -----
-
-
-    """
-    x = floor((X[0] - c.x_min) * c.occupancy_grid_side_length_inv)
-    y = floor((X[1] - c.y_min) * c.occupancy_grid_side_length_inv)
-    return x, y
-
-
-#######################################################################
-
-
 #@profile
 def occupancy_undersampled(c):
     """ Determines and fills the occupancy grid and returns the indices of
@@ -1295,31 +1784,12 @@ def occupancy_undersampled(c):
     # Takes care of rare cases, where x_max is not in the last boundary cell
     # (x_max a multiple of the grid size.)
 
-    xs = arange(
-        c.x_min, c.x_min +
-        c.no_horizontal_occupancy_cells * c.occupancy_grid_side_length,
-        .5 * c.occupancy_grid_side_length)
-    # create array of x, values such that at least on falls in every column
-    # of the grid
-    for points in xs:
-        try:
-            boundary_cell = occupancy_cell(c, upper_boundary(c, points))
-        except BaseException:
-            print("error", points)
-        if boundary_cell[0] < c.no_horizontal_occupancy_cells:
-            # for every x-value find the two boundary-cells and mark
-            # everything above/below, i.w. outside of the domain as
-            # occupied, otherwise the algorithm tries to fill in
-            # holes outside of the domain, which wastes a lot of time
-            c.occupancy_grid[boundary_cell[0], (boundary_cell[1]):] = True  #(
-            #c.occupancy_grid[boundary_cell[0], (boundary_cell[1]):]) + 1
-            boundary_cell = occupancy_cell(c, lower_boundary(c, points))
-            (c.occupancy_grid[boundary_cell[0], :(
-                boundary_cell[1])]) = True  # (
-            #c.occupancy_grid[boundary_cell[0], :(boundary_cell[1])]) + 1
-    # marks cells around boundary points
-    for i in range(0, len(c.coordinates)):
-        occupancy_mark(c, c.coordinates[i])
+    c.occupancy_grid |= occupancy_outside(c)
+    # mark everything above/below the polygon, i.e. outside of the domain
+    # as occupied, otherwise the algorithm tries to fill in holes outside
+    # of the domain, which wastes a lot of time
+    occupancy_mark(c, c.coordinates[:c.no_of_nodes])
+    # marks cells around accepted nodes
     undersampled_cells = nonzero(c.occupancy_grid == 0)
     del c.occupancy_grid
     return undersampled_cells
@@ -1328,144 +1798,173 @@ def occupancy_undersampled(c):
 #######################################################################
 
 
-def occupancy_mark(c, node):
-    """marks circular region around  as occupied. Region is chosen such,
-    that cells overlapping with a circle of radius r(C) around C are
-    marked, hence Cells that are unmarked are guaranteed to be empty.
+def occupancy_outside(c):
+    """ Rasterizes the polygon on the occupancy grid. For every column of
+    the grid, cells on or above the upper boundary and below the lower
+    boundary are outside of the domain.
 
     Parameters
     ------------
         c : Poisson Disc Class
             contains input parameters and widely used variables
-        node : ndarray(float)
-            x,y coordinates of an accepted node
 
     Returns
     ---------
+        outside : ndarray(bool)
+            mask of the occupancy grid, True for cells outside of the domain
 
     Notes
     -----
-
+        The boundaries are evaluated at the left edge and the center of
+        every column.
     """
-    center_cell = occupancy_cell(c, node[0:2])
-    occupied_radius = ceil(node[2] * c.occupancy_grid_side_length_inv)
-    # furthest number of cells that could still contain a node conflicting
-    # with a node in center cell.
-    X, Y = ogrid[max(center_cell[0] - occupied_radius, 0
-                     ):min(center_cell[0] + occupied_radius +
-                           1, c.no_horizontal_occupancy_cells + 1),
-                 max(center_cell[1] - occupied_radius, 0
-                     ):min(center_cell[1] + occupied_radius +
-                           1, c.no_vertical_occupancy_cells + 1)]
-    distance_from_center = ((X - center_cell[0])**2 + (Y - center_cell[1])**2)
-    occupied_by_node = (distance_from_center <= (occupied_radius + 1)**2)
-    # create a circular mask of ones of cells occupied by center node.
-    c.occupancy_grid[X, Y] = (c.occupancy_grid[X, Y]) | occupied_by_node
-    # add circilar mask to grid, to mark cells occupied by center node
-    # unoccupied cells remain 0.
+    xs = arange(
+        c.x_min, c.x_min +
+        c.no_horizontal_occupancy_cells * c.occupancy_grid_side_length,
+        .5 * c.occupancy_grid_side_length)
+    # create array of x, values such that at least on falls in every column
+    # of the grid
+    columns = np.floor(
+        (xs - c.x_min) * c.occupancy_grid_side_length_inv).astype(int)
+    upper_rows = np.floor(
+        (boundary_values(c.upper_boundary_x, c.upper_boundary_y,
+                         c.upper_boundary_slopes, xs) - c.y_min) *
+        c.occupancy_grid_side_length_inv).astype(int)
+    lower_rows = np.floor(
+        (boundary_values(c.lower_boundary_x, c.lower_boundary_y,
+                         c.lower_boundary_slopes, xs) - c.y_min) *
+        c.occupancy_grid_side_length_inv).astype(int)
+    keep = columns < c.no_horizontal_occupancy_cells
+    first_outside = np.full(c.no_horizontal_occupancy_cells + 1,
+                            c.no_vertical_occupancy_cells + 1)
+    last_outside = zeros(c.no_horizontal_occupancy_cells + 1, dtype=int)
+    np.minimum.at(first_outside, columns[keep], upper_rows[keep])
+    np.maximum.at(last_outside, columns[keep], lower_rows[keep])
+    # union over the x-values in each column
+    rows = arange(c.no_vertical_occupancy_cells + 1)
+    return (rows >= first_outside[:, None]) | (rows < last_outside[:, None])
 
 
 #######################################################################
 
 
-def resample(c, cell_x, cell_y):
-    """ Uniformly samples a point from an under-sampled cell
+def boundary_chain(c, first_index, step):
+    """ Vertices of the lower (step = 1) or upper (step = -1) boundary
+    of the polygon, from x_min to x_max
 
     Parameters
-    -----------
+    ------------
         c : Poisson Disc Class
             contains input parameters and widely used variables
-        cell_x/cell_y : int
-            x,y index of an empty occupancy cell
+        first_index : int
+            c.last_x_min_index for the lower boundary,
+            c.first_x_min_index for the upper boundary
+        step : int
+            direction in which the vertices are walked
 
     Returns
     ---------
-        candidate : ndarray(float)
-            coordinates of a point within the empty occupancy cell
+        x, y : ndarray(float)
+            coordinates of the vertices of the boundary, x is increasing
 
     Notes
     -----
-        by choice of the empty cells, points sampled by this function
-        can only conflict with each other.
+        requires convexity of the polygon, see read_vertices
     """
-    candidate = array([
-        c.x_min + (cell_x + random()) * c.occupancy_grid_side_length,
-        c.y_min + (cell_y + random()) * c.occupancy_grid_side_length
-    ])
-    return candidate
+    chain = [first_index]
+    i = first_index
+    while c.vertices_x[i] < c.x_max:
+        i = (i + step) % c.no_of_vertices
+        chain.append(i)
+    return (array(c.vertices_x)[chain], array(c.vertices_y)[chain])
 
 
 #######################################################################
 
 
-def lower_boundary(c, x):
-    """ lower bounding function at x
+def occupancy_mark(c, nodes):
+    """marks circular regions around nodes as occupied. Regions are chosen
+    such, that cells overlapping with a circle of radius r(C) around C are
+    marked, hence Cells that are unmarked are guaranteed to be empty.
 
     Parameters
-    -----------
+    ------------
         c : Poisson Disc Class
             contains input parameters and widely used variables
-        x : float
-            x-value between c.x_min and c.x_max
+        nodes : ndarray(float)
+            (n, 3) array of accepted nodes, x,y coordinates and local
+            exclusion radius
 
     Returns
     ---------
-        x,y : ndarray(float)
-            coordinates of apoint on the upper boundary with x-
-            coordinate x.
 
     Notes
     -----
-
+        Nodes are grouped by the radius of their disk in cells. Every
+        column of a disk is a run of cells, the start and end of the runs
+        of all nodes of a group are counted in a difference array.
     """
-    i = c.last_x_min_index
-
-    while c.vertices_x[i] < c.x_max:
-        if x >= c.vertices_x[i] and x <= c.vertices_x[(i + 1) %
-                                                      c.no_of_vertices]:
-            y = c.vertices_y[i] + \
-                c.slope_lower_boundary[i] * (x - c.vertices_x[i])
-            return array([x, y])
-        i = (i + 1) % c.no_of_vertices
-    return array([x, c.y_max])
+    nx = c.no_horizontal_occupancy_cells + 1
+    ny = c.no_vertical_occupancy_cells + 1
+    center_cells = np.floor((nodes[:, 0:2] - [c.x_min, c.y_min]) *
+                            c.occupancy_grid_side_length_inv).astype(int)
+    occupied_radii = np.ceil(nodes[:, 2] *
+                             c.occupancy_grid_side_length_inv).astype(int)
+    # furthest number of cells that could still contain a node conflicting
+    # with a node in center cell.
+    starts, ends = [], []
+    for occupied_radius in np.unique(occupied_radii):
+        dx = arange(-occupied_radius, occupied_radius + 1)
+        half_height = np.minimum(
+            np.floor(np.sqrt((occupied_radius + 1)**2 - dx**2)),
+            occupied_radius).astype(int)
+        # circular mask of cells occupied by a center node, column by column
+        centers = center_cells[occupied_radii == occupied_radius]
+        X = centers[:, 0, None] + dx
+        Y_start = np.maximum(centers[:, 1, None] - half_height, 0)
+        Y_end = np.minimum(centers[:, 1, None] + half_height + 1, ny)
+        inside = (X >= 0) & (X < nx) & (Y_start < Y_end)
+        starts.append(X[inside] * (ny + 1) + Y_start[inside])
+        ends.append(X[inside] * (ny + 1) + Y_end[inside])
+    runs = np.bincount(np.concatenate(starts), minlength=nx * (ny + 1)) - \
+        np.bincount(np.concatenate(ends), minlength=nx * (ny + 1))
+    c.occupancy_grid |= np.cumsum(runs.reshape(nx, ny + 1), axis=1)[:, :-1] > 0
+    # unoccupied cells remain 0.
 
 
 #######################################################################
 
 
-def upper_boundary(c, x):
-    """ upper bounding function at x
+def resample(c, cell_x, cell_y):
+    """ Uniformly samples a point from an under-sampled cell
 
     Parameters
     -----------
         c : Poisson Disc Class
             contains input parameters and widely used variables
-        x : float
-            x-value between c.x_min and c.x_max
+        cell_x/cell_y : int
+            x,y index of an empty occupancy cell
 
     Returns
     ---------
-        x,y : ndarray(float)
-            coordinates of a point on the upper boundary with x-
-            coordinate x.
+        candidate : ndarray(float)
+            coordinates of a point within the empty occupancy cell
 
     Notes
     -----
-
+        by choice of the empty cells, points sampled by this function
+        can only conflict with each other.
     """
-
-    i = c.first_x_min_index
-    while c.vertices_x[i] < c.x_max:
-        if x >= c.vertices_x[i] and x <= c.vertices_x[(i - 1) %
-                                                      c.no_of_vertices]:
-            y = c.vertices_y[i] + \
-                c.slope_upper_boundary[i] * (x - c.vertices_x[i])
-            return array([x, y])
-        i = (i - 1) % c.no_of_vertices
-    return array([x, c.y_min])
+    candidate = array([
+        c.x_min + (cell_x + random()) * c.occupancy_grid_side_length,
+        c.y_min + (cell_y + random()) * c.occupancy_grid_side_length
+    ])
+    return candidate
 
 
 #######################################################################
+
+
 #####################___2D-Numpy replacements___#######################
 """The following turned out to be faster then their numpy counterpart """
 
@@ -7,6 +7,9 @@
 
 import pickle
 import os
+import numpy as np
+
+from pydfnworks.dfnGraph.dfn2graph import read_connectivity
 
 
 def check_false_connections(self, path="../"):
@@ -36,8 +39,8 @@ def check_false_connections(self, path="../"):
 
     """
     print("--> Checking for false connections in the upscaled mesh.")
-    # Create symbolic links to create fracture graph
-    files = ["connectivity.dat", "left.dat", "right.dat", "fracture_info.dat"]
+    # Create symbolic link to the DFN topology
+    files = ["connectivity.dat"]
     for f in files:
         try:
             os.symlink(path + f, f)
@@ -45,54 +48,52 @@ def check_false_connections(self, path="../"):
             print(f"--> Warning!!! Unable to make symbolic link to {path+f}")
             pass
 
-    # create fracture graph, with arbitrary source/target
-    G = self.create_graph("fracture", "left", "right")
-    # remove source and target
-    G.remove_node("s")
-    G.remove_node("t")
-
-    # Make a copy of G and remove all edges
-    H = G.copy()
-    for u, v in H.edges():
-        H.remove_edge(u, v)
+    # edges of the fracture graph
+    u, v = read_connectivity("connectivity.dat")
 
     # load the fracture_mesh_connection dictionary
     print("--> Loading mesh intersection information")
     fmc = pickle.load(open("connections.p", "rb"))
     print("--> Complete")
-    # Get cell ids for the cells that fractures intersect
-    cells = [key for key in fmc.keys()]
-
-    # walk through the cells and add edges to graph H
-    # if two fractures are in the same cell
-    cell_false = [False] * len(cells)
-    for i, cell in enumerate(cells):
-        num_conn = len(fmc[cell])
+
+    # walk through the cells and collect the pairs of fractures
+    # that are in the same cell
+    pairs = []
+    pair_cells = []
+    for i, cell in enumerate(fmc.keys()):
+        ids = [conn[0] for conn in fmc[cell]]
+        num_conn = len(ids)
         # If more than one fracture intersects the mesh cell
-        # add edges
-        if num_conn > 1:
-            # add edges between all fractures in a cell
-            for j in range(num_conn):
-                id1 = fmc[cell][j][0]
-                for k in range(j + 1, num_conn):
-                    id2 = fmc[cell][k][0]
-                    H.add_edge(id1, id2)
-                    cell_false[i] = True
+        # add edges between all fractures in a cell
+        for j in range(num_conn):
+            for k in range(j + 1, num_conn):
+                pairs.append((ids[j], ids[k]))
+                pair_cells.append(i)
+    pairs = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+    pair_cells = np.array(pair_cells, dtype=np.int64)
 
     ## check for false connections
     print("--> Checking for false connections")
-    false_connections = []
-    for u, v, in H.edges():
-        if not G.has_edge(u, v):
-            print(f"--> False connection between fractures {u} and {v}")
-            false_connections.append((u, v))
+    # an undirected pair is identified by its smaller and larger fracture
+    scale = max(pairs.max(initial=0), u.max(initial=0), v.max(initial=0)) + 1
+    graph_keys = np.minimum(u, v) * scale + np.maximum(u, v)
+    keys = pairs.min(axis=1) * scale + pairs.max(axis=1)
+    false = ~np.isin(keys, graph_keys)
+    # each false connection is reported once, in the order it is first found
+    first = np.unique(keys[false], return_index=True)[1]
+    first.sort()
+    false_connections = [
+        tuple(pair) for pair in pairs[false][first].tolist()
+    ]
+    for f1, f2 in false_connections:
+        print(f"--> False connection between fractures {f1} and {f2}")
 
     if len(false_connections) > 0:
         num_false_connections = len(false_connections)
         print(
             f"--> There are {num_false_connections} false connections between fractures"
         )
-        num_false_cells = sum(cell_false)
+        num_false_cells = len(np.unique(pair_cells[false]))
         print(f"--> These occur in {num_false_cells} Voronoi cells")
     else:
         print(f"--> No false connections found")
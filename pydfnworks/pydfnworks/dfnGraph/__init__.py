@@ -1,3 +1,8 @@
+from .array_graph import *
 from .dfn2graph import *
 from .graph_flow import *
+from .graph_io import *
 from .graph_transport import *
+from .graph_transport_arrays import *
+from .transport_postprocess import *
+from .transport_statistics import *
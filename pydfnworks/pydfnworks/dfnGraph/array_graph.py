@@ -0,0 +1,534 @@
+"""
+.. module:: array_graph.py
+   :synopsis: array-backed graph representation of a DFN
+
+"""
+
+import networkx as nx
+import numpy as np
+import sys
+
+from pydfnworks.dfnGraph.graph_io import column_kind, _missing
+
+# integer codes of the source 's' and target 't' in label columns, as in
+# boundary_index: the source and target replace the boundary faces -1 and -2
+SOURCE = -1
+TARGET = -2
+
+
+def encode_labels(values):
+    """ Encode a list of labels, integers or 's' / 't', as an integer array
+
+    Parameters
+    ----------
+        values : list
+            labels
+
+    Returns
+    -------
+        labels : NumPy array
+            int64 array, 's' and 't' are SOURCE and TARGET
+    """
+
+    return np.array([
+        SOURCE if x == 's' else TARGET if x == 't' else x for x in values
+    ],
+                    dtype=np.int64)
+
+
+def decode_labels(labels):
+    """ Decode an integer array of labels encoded by encode_labels
+
+    Parameters
+    ----------
+        labels : NumPy array
+            int64 array
+
+    Returns
+    -------
+        values : list
+            labels, SOURCE and TARGET are 's' and 't'
+    """
+
+    values = labels.tolist()
+    for i in np.flatnonzero(labels < 0).tolist():
+        values[i] = 's' if labels[i] == SOURCE else 't'
+    return values
+
+
+def label_kind(values):
+    """ Kind of a column of values, see function column_kind in graph_io. A 'label' column holds integers and only the strings 's' and 't', other mixes of integers and strings are 'json' """
+
+    kind = column_kind(values)
+    if kind in ['str', 'label']:
+        strings = set(x for x in values if isinstance(x, str))
+        if strings <= set(['s', 't']):
+            kind = 'label'
+        elif kind == 'label':
+            kind = 'json'
+    return kind
+
+
+def encode_values(values):
+    """ Store a column of attribute values in a NumPy array
+
+    Parameters
+    ----------
+        values : list
+            attribute values, _missing where an item does not have the attribute
+
+    Returns
+    -------
+        column : NumPy array
+            typed array for 'bool', 'int', 'float', and 'label' columns, (n, k) int64 array for tuples of k labels, object array otherwise
+
+        kind : string
+            'bool', 'int', 'float', 'label', 'tuple<k>', or 'object'
+
+        present : NumPy array
+            boolean array, True for items that have the attribute. None if all items have it
+
+    Notes
+    -----
+    A 'label' column holds non negative integers and 's' / 't', see function encode_labels
+    """
+
+    present = np.array([x is not _missing for x in values], dtype=bool)
+    if present.all():
+        present = None
+        known = values
+    else:
+        known = [x for x in values if x is not _missing]
+
+    kind = label_kind(known)
+    if kind == 'label' and any(
+            not isinstance(x, str) and x < 0 for x in known):
+        kind = 'json'
+    if kind.startswith('tuple'):
+        k = int(kind[5:])
+        component = [
+            label_kind([x[j] for x in known]) for j in range(k)
+        ]
+        if set(component) <= set(['int', 'label']) and all(
+                x[j] >= 0 for x in known for j in range(k)
+                if not isinstance(x[j], str)):
+            fill = (0, ) * k
+            column = np.array([[
+                SOURCE if y == 's' else TARGET if y == 't' else y for y in x
+            ] for x in (values if present is None else [
+                x if x is not _missing else fill for x in values
+            ])],
+                              dtype=np.int64).reshape(len(values), k)
+            return column, kind, present
+        kind = 'json'
+
+    if kind in ['bool', 'int', 'float']:
+        dtype = {'bool': bool, 'int': np.int64, 'float': float}[kind]
+        fill = {'bool': False, 'int': 0, 'float': np.nan}[kind]
+        if present is not None:
+            values = [x if x is not _missing else fill for x in values]
+        return np.array(values, dtype=dtype), kind, present
+    if kind == 'label':
+        if present is not None:
+            values = [x if x is not _missing else 0 for x in values]
+        return encode_labels(values), kind, present
+
+    column = np.empty(len(values), dtype=object)
+    column[:] = [x if x is not _missing else None for x in values]
+    return column, 'object', present
+
+
+def decode_values(column, kind):
+    """ Convert a column stored by encode_values back to a list of attribute values
+
+    Parameters
+    ----------
+        column : NumPy array
+            see function encode_values
+
+        kind : string
+            see function encode_values
+
+    Returns
+    -------
+        values : list
+            attribute values
+    """
+
+    if kind == 'label':
+        return decode_labels(column)
+    if kind.startswith('tuple'):
+        components = [decode_labels(column[:, j]) for j in range(column.shape[1])]
+        return list(zip(*components))
+    return column.tolist()
+
+
+class ArrayGraph():
+    '''
+    Undirected graph stored in NumPy arrays: the end points of every edge, a compressed sparse row (CSR) adjacency, and one typed array per vertex or edge attribute. Memory is about 8 bytes per edge and attribute rather than the dictionaries of a NetworkX graph.
+
+    Attributes:
+        * graph : dictionary of graph attributes, e.g. 'representation'
+        * labels : NumPy array of vertex labels. Integer labels and 's' / 't' are stored as int64 with SOURCE and TARGET, other labels in an object array
+        * label_kind : kind of the labels, see function encode_values
+        * u, v : NumPy arrays, indices of the end points of every edge
+        * node_data : dictionary of vertex attribute columns, one entry per vertex
+        * edge_data : dictionary of edge attribute columns, one entry per edge
+        * kinds : dictionary ('node' or 'edge', name) -> kind of the column, see function encode_values
+        * present : dictionary ('node' or 'edge', name) -> boolean array of the items that have the attribute, for columns with missing values
+
+    Notes
+    -----
+    Vertex i of the graph is labels[i]. Float columns hold NaN where an item does not have the attribute. The vertex attributes of the intersection graph are 'x', 'y', 'z', 'length', and 'frac' (an (n, 2) array of fracture ids). Edge attributes are 'frac', 'length', 'perm', 'iperm', 'area', 'weight', and after the flow solve 'flux' and 'time', with 'pressure' on the vertices.
+    '''
+    def __init__(self,
+                 labels,
+                 u,
+                 v,
+                 node_data=None,
+                 edge_data=None,
+                 graph=None,
+                 label_kind='int',
+                 kinds=None,
+                 present=None):
+        self.graph = {} if graph is None else dict(graph)
+        self.labels = labels
+        self.label_kind = label_kind
+        self.u = np.asarray(u, dtype=np.int64)
+        self.v = np.asarray(v, dtype=np.int64)
+        self.node_data = {}
+        self.edge_data = {}
+        self.kinds = {} if kinds is None else dict(kinds)
+        self.present = {} if present is None else dict(present)
+        self._csr = None
+        self._index = None
+        for key, column in (node_data or {}).items():
+            self.node_data[key] = column
+            self.kinds.setdefault(('node', key), column_dtype_kind(column))
+        for key, column in (edge_data or {}).items():
+            self.edge_data[key] = column
+            self.kinds.setdefault(('edge', key), column_dtype_kind(column))
+
+    @property
+    def num_nodes(self):
+        return len(self.labels)
+
+    @property
+    def num_edges(self):
+        return len(self.u)
+
+    def number_of_nodes(self):
+        return self.num_nodes
+
+    def number_of_edges(self):
+        return self.num_edges
+
+    def index(self, label):
+        """ Index of the vertex with the given label
+
+        Parameters
+        ----------
+            self: object
+
+            label : int or string
+                vertex label, 's' and 't' for the source and target
+
+        Returns
+        -------
+            i : int
+                vertex index, None if the graph has no such vertex
+        """
+
+        if self._index is None:
+            self._index = {
+                n: i
+                for i, n in enumerate(
+                    decode_values(self.labels, self.label_kind))
+            }
+        return self._index.get(label)
+
+    def set_node_column(self, key, column, kind=None, present=None):
+        """ Set a vertex attribute column
+
+        Parameters
+        ----------
+            self: object
+
+            key : string
+                attribute name
+
+            column : NumPy array
+                one value per vertex
+
+            kind : string
+                see function encode_values, default is the kind of the dtype of column
+
+            present : NumPy array
+                boolean array of the vertices that have the attribute, default is None (all)
+
+        Returns
+        -------
+            None
+        """
+
+        self.node_data[key] = column
+        self.kinds[('node', key)] = column_dtype_kind(
+            column) if kind is None else kind
+        self.present.pop(('node', key), None)
+        if present is not None:
+            self.present[('node', key)] = present
+
+    def set_edge_column(self, key, column, kind=None, present=None):
+        """ Set an edge attribute column, see function set_node_column
+
+        Parameters
+        ----------
+            self: object
+
+            key : string
+                attribute name
+
+            column : NumPy array
+                one value per edge
+
+            kind : string
+                see function encode_values
+
+            present : NumPy array
+                boolean array of the edges that have the attribute, default is None (all)
+
+        Returns
+        -------
+            None
+        """
+
+        self.edge_data[key] = column
+        self.kinds[('edge', key)] = column_dtype_kind(
+            column) if kind is None else kind
+        self.present.pop(('edge', key), None)
+        if present is not None:
+            self.present[('edge', key)] = present
+
+    def adjacency(self):
+        """ Compressed sparse row adjacency of the graph, built once
+
+        Parameters
+        ----------
+            self: object
+
+        Returns
+        -------
+            offsets : NumPy array
+                the neighbors of vertex i are neighbors[offsets[i]:offsets[i+1]]
+
+            neighbors : NumPy array
+                neighbor vertex indices
+
+            edges : NumPy array
+                index of the edge joining the vertex to each neighbor
+        """
+
+        if self._csr is None:
+            ends = np.concatenate((self.u, self.v))
+            other = np.concatenate((self.v, self.u))
+            edge = np.concatenate((np.arange(self.num_edges),) * 2)
+            order = np.argsort(ends, kind='stable')
+            offsets = np.zeros(self.num_nodes + 1, dtype=np.int64)
+            offsets[1:] = np.cumsum(np.bincount(ends,
+                                                minlength=self.num_nodes))
+            self._csr = (offsets, other[order], edge[order])
+        return self._csr
+
+    def neighbors(self, i):
+        """ Neighbors of vertex i
+
+        Parameters
+        ----------
+            self: object
+
+            i : int
+                vertex index
+
+        Returns
+        -------
+            neighbors : NumPy array
+                vertex indices
+        """
+
+        offsets, neighbors, edges = self.adjacency()
+        return neighbors[offsets[i]:offsets[i + 1]]
+
+    def degree(self):
+        """ Number of edges of every vertex
+
+        Parameters
+        ----------
+            self: object
+
+        Returns
+        -------
+            degree : NumPy array
+        """
+
+        return np.bincount(self.u, minlength=self.num_nodes) + np.bincount(
+            self.v, minlength=self.num_nodes)
+
+    def subgraph(self, keep):
+        """ Subgraph induced by a set of vertices
+
+        Parameters
+        ----------
+            self: object
+
+            keep : NumPy array
+                boolean array over the vertices, the vertices keep their order, or array of vertex indices, the vertices are numbered in the order of keep
+
+        Returns
+        -------
+            H : ArrayGraph
+                subgraph with the graph attributes, labels and attribute columns of the kept vertices and edges
+        """
+
+        keep = np.asarray(keep)
+        if keep.dtype == bool:
+            keep = np.flatnonzero(keep)
+        new_index = np.full(self.num_nodes, -1, dtype=np.int64)
+        new_index[keep] = np.arange(len(keep))
+        edge_mask = (new_index[self.u] >= 0) & (new_index[self.v] >= 0)
+
+        present = {}
+        for (where, key), values in self.present.items():
+            present[(where, key)] = values[keep] if where == 'node' else values[
+                edge_mask]
+        return ArrayGraph(
+            self.labels[keep], new_index[self.u[edge_mask]],
+            new_index[self.v[edge_mask]],
+            {key: column[keep]
+             for key, column in self.node_data.items()},
+            {key: column[edge_mask]
+             for key, column in self.edge_data.items()}, self.graph,
+            self.label_kind, self.kinds, present)
+
+    def node_attribute_list(self, key):
+        """ Vertex attribute as a list, _missing where a vertex does not have it """
+        return self.attribute_list('node', key, self.node_data[key])
+
+    def edge_attribute_list(self, key):
+        """ Edge attribute as a list, _missing where an edge does not have it """
+        return self.attribute_list('edge', key, self.edge_data[key])
+
+    def attribute_list(self, where, key, column):
+        """ Decode a column of the vertices ('node') or edges ('edge') to a list """
+        values = decode_values(column, self.kinds[(where, key)])
+        present = self.present.get((where, key))
+        if present is not None:
+            for i in np.flatnonzero(~present).tolist():
+                values[i] = _missing
+        return values
+
+    @classmethod
+    def from_networkx(cls, G):
+        """ Convert a NetworkX graph to an ArrayGraph
+
+        Parameters
+        ----------
+            G : NetworkX graph
+                undirected graph based on a DFN
+
+        Returns
+        -------
+            H : ArrayGraph
+                graph with the vertices in the order of G.nodes() and the edges in the order of G.edges()
+        """
+
+        if G.is_directed() or G.is_multigraph():
+            error = "ERROR: ArrayGraph only holds undirected simple graphs\n"
+            sys.stderr.write(error)
+            sys.exit(1)
+        from pydfnworks.dfnGraph.dfn2graph import edge_data
+
+        nodes = list(G.nodes())
+        labels, label_kind, missing = encode_values(nodes)
+        index = {n: i for i, n in enumerate(nodes)}
+
+        kinds = {}
+        present = {}
+        node_data = {}
+        data = [d for n, d in G.nodes(data=True)]
+        for key in unique_keys(data):
+            column, kind, mask = encode_values(
+                [d.get(key, _missing) for d in data])
+            node_data[key] = column
+            kinds[('node', key)] = kind
+            if mask is not None:
+                present[('node', key)] = mask
+
+        u, v, data = edge_data(G)
+        edge_columns = {}
+        for key in unique_keys(data):
+            column, kind, mask = encode_values(
+                [d.get(key, _missing) for d in data])
+            edge_columns[key] = column
+            kinds[('edge', key)] = kind
+            if mask is not None:
+                present[('edge', key)] = mask
+
+        return cls(labels, [index[n] for n in u], [index[n] for n in v],
+                   node_data, edge_columns, G.graph, label_kind, kinds,
+                   present)
+
+    def to_networkx(self):
+        """ Convert to a NetworkX graph
+
+        Parameters
+        ----------
+            self: object
+
+        Returns
+        -------
+            G : NetworkX Graph
+                graph with the graph attributes, vertices, edges and attributes of the ArrayGraph
+        """
+
+        G = nx.Graph()
+        G.graph.update(self.graph)
+        nodes = decode_values(self.labels, self.label_kind)
+        G.add_nodes_from(nodes)
+        for key in self.node_data:
+            values = self.node_attribute_list(key)
+            for n, x in zip(nodes, values):
+                if x is not _missing:
+                    G.nodes[n][key] = x
+        u = [nodes[i] for i in self.u.tolist()]
+        v = [nodes[i] for i in self.v.tolist()]
+        G.add_edges_from(zip(u, v))
+        for key in self.edge_data:
+            values = self.edge_attribute_list(key)
+            for a, b, x in zip(u, v, values):
+                if x is not _missing:
+                    G.edges[a, b][key] = x
+        return G
+
+
+def column_dtype_kind(column):
+    """ Kind of a column from its dtype, see function encode_values """
+
+    if column.dtype == bool:
+        return 'bool'
+    if column.dtype.kind in 'iu':
+        if column.ndim == 2:
+            return 'tuple%d' % column.shape[1]
+        return 'int'
+    if column.dtype.kind == 'f':
+        return 'float'
+    return 'object'
+
+
+def unique_keys(data):
+    """ Attribute names of a list of attribute dictionaries, in order of first appearance """
+
+    keys = {}
+    for d in data:
+        for key in d:
+            keys[key] = None
+    return list(keys)
@@ -1,6 +1,12 @@
 import networkx as nx
 import numpy as np
 import json
+import os
+import sys
+import heapq
+import scipy.sparse
+import scipy.sparse.csgraph
+from time import time as timer
 
 from networkx.algorithms.flow.shortestaugmentingpath import *
 from networkx.algorithms.flow.edmondskarp import *
@@ -13,8 +19,13 @@ matplotlib.use('Agg')
 import matplotlib.pylab as plt
 from itertools import islice
 
+from pydfnworks.dfnGraph.array_graph import ArrayGraph, SOURCE, TARGET, decode_labels, decode_values
 
-def create_graph(self, graph_type, inflow, outflow):
+# parsed fracture_info.dat files, see load_fracture_info
+_fracture_info_cache = {}
+
+
+def create_graph(self, graph_type, inflow, outflow, array_graph=False):
     """Header function to create a graph based on a DFN
 
     Parameters
@@ -27,10 +38,12 @@ def create_graph(self, graph_type, inflow, outflow):
             Name of inflow boundary (connect to source)
         outflow : string
             Name of outflow boundary (connect to target)
+        array_graph : bool
+            If True, an ArrayGraph is returned. The fracture and intersection graphs are then built directly in arrays without NetworkX. Default is False
 
     Returns
     -------
-        G : NetworkX Graph
+        G : NetworkX Graph or ArrayGraph
             Graph based on DFN 
 
     Notes
@@ -38,6 +51,11 @@ def create_graph(self, graph_type, inflow, outflow):
 
 """
 
+    if array_graph and graph_type == "fracture":
+        return create_fracture_array_graph(inflow, outflow)
+    if array_graph and graph_type == "intersection":
+        return create_intersection_array_graph(inflow, outflow)
+
     if graph_type == "fracture":
         G = create_fracture_graph(inflow, outflow)
     elif graph_type == "intersection":
@@ -47,6 +65,8 @@ def create_graph(self, graph_type, inflow, outflow):
     else:
         print("ERROR! Unknown graph type")
         return []
+    if array_graph:
+        G = ArrayGraph.from_networkx(G)
     return G
 
 
@@ -80,30 +100,13 @@ def create_fracture_graph(inflow,
     -----
     """
     print("--> Loading Graph based on topology in " + topology_file)
+    u, v = read_connectivity(topology_file)
     G = nx.Graph(representation="fracture")
-    with open(topology_file, "r") as infile:
-        for i, line in enumerate(infile):
-            conn = [int(n) for n in line.split()]
-            for j in conn:
-                G.add_edge(i + 1, j)
+    # edges are in file order, so vertices are added in the order they first appear
+    G.add_edges_from(zip(u.tolist(), v.tolist()))
     ## Create Source and Target and add edges
-    inflow_filename = inflow + ".dat"
-    outflow_filename = outflow + ".dat"
-    inflow = np.genfromtxt(inflow_filename).astype(int)
-    outflow = np.genfromtxt(outflow_filename).astype(int)
-
-    try:
-        if len(inflow) > 1:
-            inflow = list(inflow)
-    except:
-        inflow = [inflow.tolist()]
-
-    try:
-        if len(outflow) > 1:
-            outflow = list(outflow)
-    except:
-        outflow = [outflow.tolist()]
-
+    inflow = read_boundary_fractures(inflow + ".dat").tolist()
+    outflow = read_boundary_fractures(outflow + ".dat").tolist()
     G.add_node('s')
     G.add_node('t')
     G.add_edges_from(zip(['s'] * (len(inflow)), inflow))
@@ -113,6 +116,174 @@ def create_fracture_graph(inflow,
     return G
 
 
+def create_fracture_array_graph(inflow,
+                                outflow,
+                                topology_file="connectivity.dat",
+                                fracture_info="fracture_info.dat"):
+    """ Create the fracture graph of the DFN as an ArrayGraph, without building a NetworkX graph. Vertices, edges, and attributes are those of create_fracture_graph
+
+    Parameters
+    ----------
+        inflow : string
+            Name of inflow boundary (connect to source)
+        outflow : string
+            Name of outflow boundary (connect to target)
+        topology_file : string
+            Name of adjacency matrix file for a DFN default=connectivity.dat  
+        fracture_info : str
+                filename for fracture information
+
+    Returns
+    -------
+        G : ArrayGraph
+            Vertices are fractures, labeled by fracture number, and have attributes perm and iperm. Edges indicate two fractures intersect
+
+    Notes
+    -----
+    Vertices are in the order of create_fracture_graph, the fractures in the order they first appear in topology_file followed by 's' and 't'
+    """
+
+    print("--> Loading Graph based on topology in " + topology_file)
+    u, v = read_connectivity(topology_file)
+    inflow = read_boundary_fractures(inflow + ".dat")
+    outflow = read_boundary_fractures(outflow + ".dat")
+
+    # fractures in order of first appearance, boundary fractures without
+    # intersections come after source and target as in create_fracture_graph
+    ends = np.column_stack((u, v)).ravel()
+    fractures, first = np.unique(ends, return_index=True)
+    fractures = fractures[np.argsort(first)]
+    isolated = np.concatenate((inflow, outflow))
+    isolated = isolated[~np.isin(isolated, fractures)]
+    isolated, first = np.unique(isolated, return_index=True)
+    isolated = isolated[np.argsort(first)]
+    labels = np.concatenate((fractures, [SOURCE, TARGET], isolated))
+
+    index = np.zeros(max(labels.max(initial=0), 0) + 1, dtype=np.int64)
+    index[fractures] = np.arange(len(fractures))
+    index[isolated] = len(fractures) + 2 + np.arange(len(isolated))
+    source = len(fractures)
+    target = source + 1
+    u = np.concatenate((index[u], np.full(len(inflow), source,
+                                          dtype=np.int64), index[outflow]))
+    v = np.concatenate((index[v], index[inflow],
+                        np.full(len(outflow), target, dtype=np.int64)))
+    G = ArrayGraph(labels,
+                   u,
+                   v, {}, {},
+                   graph={'representation': "fracture"},
+                   label_kind='label')
+    add_perm(G, fracture_info)
+    print("--> Graph loaded")
+    return G
+
+
+def read_connectivity(topology_file="connectivity.dat", block_size=2**26):
+    """ Read the edges of the fracture graph from the DFN topology file. Line i of the file lists the fractures that intersect fracture i. 
+
+    Parameters
+    ----------
+        topology_file : string
+            Name of adjacency matrix file for a DFN default=connectivity.dat  
+        block_size : int
+            Number of bytes parsed at a time. The file is memory mapped and read in blocks of whole lines, so the memory used does not grow with the size of the file
+
+    Returns
+    -------
+        u : NumPy array
+            fracture numbers of the first end of each edge
+        v : NumPy array
+            fracture numbers of the second end of each edge
+
+    Notes
+    -----
+    Every intersection is listed twice in topology_file, once for each fracture. Each edge is returned once, in the order and orientation it first appears in the file.
+    """
+
+    rows = []
+    cols = []
+    if os.path.getsize(topology_file) > 0:
+        buf = np.memmap(topology_file, dtype=np.uint8, mode='r')
+        line = 0
+        start = 0
+        while start < len(buf):
+            stop = min(start + block_size, len(buf))
+            if stop < len(buf):
+                newlines = np.flatnonzero(buf[start:stop] == ord('\n'))
+                # end the block after its last full line
+                stop = start + newlines[-1] + 1 if len(newlines) else len(
+                    buf)
+            values, lines = parse_integers(np.asarray(buf[start:stop]))
+            rows.append(line + lines[0] + 1)
+            cols.append(values)
+            line += lines[1]
+            start = stop
+        del buf
+    u = np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64)
+    v = np.concatenate(cols) if cols else np.zeros(0, dtype=np.int64)
+    if len(u) == 0:
+        return u, v
+
+    # remove the second listing of each intersection
+    lo = np.minimum(u, v)
+    hi = np.maximum(u, v)
+    key = lo * (hi.max() + 1) + hi
+    first = np.unique(key, return_index=True)[1]
+    first.sort()
+    return u[first], v[first]
+
+
+def parse_integers(block):
+    """ Parse the non-negative integers in a block of text
+
+    Parameters
+    ----------
+        block : NumPy array
+            bytes of text, uint8
+
+    Returns
+    -------
+        values : NumPy array
+            integers in the block, in order
+        lines : tuple
+            NumPy array with the line, counted from 0, of each integer and the number of newlines in the block
+    """
+
+    is_digit = (block >= ord('0')) & (block <= ord('9'))
+    change = np.diff(is_digit.astype(np.int8), prepend=0, append=0)
+    first = np.flatnonzero(change == 1)
+    last = np.flatnonzero(change == -1)
+    digits = np.flatnonzero(is_digit)
+    token = np.cumsum(change[:-1] == 1)[digits] - 1
+    # place value of each digit in its integer
+    power = last[token] - digits - 1
+    values = np.zeros(len(first), dtype=np.int64)
+    for p in range(power.max(initial=-1) + 1):
+        at = power == p
+        values += np.bincount(token[at],
+                              weights=block[digits[at]] - ord('0'),
+                              minlength=len(first)).astype(np.int64) * 10**p
+    newlines = np.flatnonzero(block == ord('\n'))
+    return values, (np.searchsorted(newlines, first), len(newlines))
+
+
+def read_boundary_fractures(filename):
+    """ Read the fractures on a boundary of the domain, e.g., left.dat
+
+    Parameters
+    ----------
+        filename : string
+            file with one fracture number per line
+
+    Returns
+    -------
+        fractures : NumPy array
+            fracture numbers
+    """
+
+    return np.loadtxt(filename, ndmin=1).astype(np.int64)
+
+
 def boundary_index(bc_name):
     """Determines boundary index in intersections_list.dat from name
 
@@ -154,7 +325,8 @@ def boundary_index(bc_name):
 def create_intersection_graph(inflow,
                               outflow,
                               intersection_file="intersection_list.dat",
-                              fracture_info="fracture_info.dat"):
+                              fracture_info="fracture_info.dat",
+                              boundaries=False):
     """ Create a graph based on topology of network.
     Edges are represented as nodes and if two intersections
     are on the same fracture, there is an edge between them in the graph. 
@@ -174,6 +346,8 @@ def create_intersection_graph(inflow,
 
         fracture_infor : str
                 filename for fracture information
+        boundaries : bool
+            If True, the intersections with all six boundaries are kept, with the boundary index as second fracture, and source and target are not added. inflow and outflow are not used. Default is False
     Returns
     -------
         G : NetworkX Graph
@@ -181,13 +355,14 @@ def create_intersection_graph(inflow,
 
     Notes
     -----
-    Aperture and Perm on edges can be added using add_app and add_perm functions
+    Aperture and Perm on edges can be added using add_app and add_perm functions. A graph with boundaries is connected to an inflow and outflow boundary by function connect_boundaries
     """
 
     print("Creating Graph Based on DFN")
     print("Intersections being mapped to nodes and fractures to edges")
-    inflow_index = boundary_index(inflow)
-    outflow_index = boundary_index(outflow)
+    if not boundaries:
+        inflow_index = boundary_index(inflow)
+        outflow_index = boundary_index(outflow)
 
     f = open(intersection_file)
     f.readline()
@@ -206,7 +381,7 @@ def create_intersection_graph(inflow,
         keep = True
         if frac_edges[i][1] == 's' or frac_edges[i][1] == 't':
             f2 = frac_edges[i][1]
-        elif int(frac_edges[i][1]) > 0:
+        elif int(frac_edges[i][1]) > 0 or boundaries:
             f2 = int(frac_edges[i][1])
         elif int(frac_edges[i][1]) == inflow_index:
             f2 = 's'
@@ -226,31 +401,20 @@ def create_intersection_graph(inflow,
 
     nodes = list(nx.nodes(G))
     f1 = nx.get_node_attributes(G, 'frac')
-    # identify which edges are on whcih fractures
-    for i in nodes:
-        e = set(f1[i])
-        for j in nodes:
-            if i != j:
-                tmp = set(f1[j])
-                x = e.intersection(tmp)
-                if len(x) > 0:
-                    x = list(x)[0]
-                    # Check for Boundary Intersections
-                    # This stops boundary fractures from being incorrectly
-                    # connected
-                    # If not, add edge between
-                    if x != 's' and x != 't':
-                        xi = G.nodes[i]['x']
-                        yi = G.nodes[i]['y']
-                        zi = G.nodes[i]['z']
-
-                        xj = G.nodes[j]['x']
-                        yj = G.nodes[j]['y']
-                        zj = G.nodes[j]['z']
-
-                        distance = np.sqrt((xi - xj)**2 + (yi - yj)**2 +
-                                           (zi - zj)**2)
-                        G.add_edge(i, j, frac=x, length=distance)
+    # identify which edges are on which fractures
+    u, v, frac, distance = intersection_graph_edges(
+        [f1[i] for i in nodes], [G.nodes[i]['x'] for i in nodes],
+        [G.nodes[i]['y'] for i in nodes], [G.nodes[i]['z'] for i in nodes])
+    G.add_edges_from((nodes[i], nodes[j], {
+        'frac': x,
+        'length': d
+    }) for i, j, x, d in zip(u.tolist(), v.tolist(), frac.tolist(),
+                             distance.tolist()))
+
+    if boundaries:
+        add_perm(G, fracture_info)
+        print("Graph Construction Complete")
+        return G
 
     # Add Sink and Source nodes
     G.add_node('s')
@@ -269,6 +433,263 @@ def create_intersection_graph(inflow,
     return G
 
 
+def connect_boundaries(G, inflow, outflow):
+    """ Connect an intersection graph created with boundaries to source and target
+
+    Parameters
+    ----------
+        G : NetworkX Graph
+            intersection graph created by create_intersection_graph with boundaries=True
+        inflow : string
+            Name of inflow boundary
+        outflow : string
+            Name of outflow boundary
+
+    Returns
+    -------
+        H : NetworkX Graph
+            copy of G with source 's' and target 't' connected to the intersections with the inflow and outflow boundaries, and without the intersections with the other boundaries, as created by create_intersection_graph
+
+    Notes
+    -----
+    Edge attributes of G, such as perm, area and weight, are kept. The edges to source and target have unit permeability and area, see functions add_perm and add_area
+    """
+
+    inflow_index = boundary_index(inflow)
+    outflow_index = boundary_index(outflow)
+    H = G.copy()
+    H.add_node('s')
+    H.add_node('t')
+    for i, frac in G.nodes(data='frac'):
+        if frac[1] == inflow_index:
+            H.nodes[i]['frac'] = (frac[0], 's')
+            H.add_edge(i,
+                       's',
+                       frac='s',
+                       length=0.0,
+                       perm=1.0,
+                       iperm=1.0,
+                       area=1.0)
+        elif frac[1] == outflow_index:
+            H.nodes[i]['frac'] = (frac[0], 't')
+            H.add_edge(i,
+                       't',
+                       frac='t',
+                       length=0.0,
+                       perm=1.0,
+                       iperm=1.0,
+                       area=1.0)
+        elif frac[1] < 0:
+            H.remove_node(i)
+    return H
+
+
+def read_intersection_list(inflow_index,
+                           outflow_index,
+                           intersection_file="intersection_list.dat",
+                           drop_boundaries=True):
+    """ Read the intersections of the DFN into arrays
+
+    Parameters
+    ----------
+        inflow_index, outflow_index : int
+            index of the inflow and outflow boundaries, see function boundary_index
+        intersection_file : string
+             File containing intersection information
+             File Format:
+             fracture 1, fracture 2, x center, y center, z center, intersection length
+        drop_boundaries : bool
+            If True, intersections with a boundary other than inflow and outflow are dropped. Otherwise they are kept with 0 as second fracture
+
+    Returns
+    -------
+        rows : NumPy array
+            line of each kept intersection, starting at 0 after the header
+        fracs : NumPy array
+            (n, 2) array of the fractures of each intersection, SOURCE and TARGET for intersections with the inflow and outflow boundaries
+        x, y, z, length : NumPy arrays
+            center and length of each intersection
+    """
+
+    data = np.loadtxt(intersection_file, skiprows=1, dtype=str, ndmin=2)
+    f1 = data[:, 0].astype(np.int64)
+    second = data[:, 1]
+    is_source = second == 's'
+    is_target = second == 't'
+    f2 = np.where(is_source | is_target, '0', second).astype(np.int64)
+    is_source |= ~is_target & (f2 == inflow_index) & (f2 <= 0)
+    is_target |= ~is_source & (f2 == outflow_index) & (f2 <= 0)
+    f2[is_source] = SOURCE
+    f2[is_target] = TARGET
+
+    if drop_boundaries:
+        rows = np.flatnonzero((f2 > 0) | is_source | is_target)
+    else:
+        # other boundaries must not be mistaken for SOURCE and TARGET
+        f2[(f2 <= 0) & ~is_source & ~is_target] = 0
+        rows = np.arange(len(f2))
+    values = data[rows, 2:6].astype(float)
+    fracs = np.column_stack((f1[rows], f2[rows]))
+    return rows, fracs, values[:, 0], values[:, 1], values[:, 2], values[:,
+                                                                          3]
+
+
+def create_intersection_array_graph(inflow,
+                                    outflow,
+                                    intersection_file="intersection_list.dat",
+                                    fracture_info="fracture_info.dat"):
+    """ Create the intersection graph of the DFN as an ArrayGraph, without building a NetworkX graph. Vertices, edges, and attributes are those of create_intersection_graph
+
+    Parameters
+    ----------
+        inflow : string
+            Name of inflow boundary
+        outflow : string
+            Name of outflow boundary
+        intersection_file : string
+             File containing intersection information, see function read_intersection_list
+        fracture_info : str
+                filename for fracture information
+
+    Returns
+    -------
+        G : ArrayGraph
+            Vertices have attributes x,y,z location, length and frac. Edges have attributes frac, length, perm and iperm
+
+    Notes
+    -----
+    Vertices are the intersections in file order followed by 's' and 't'
+    """
+
+    print("Creating Graph Based on DFN")
+    print("Intersections being mapped to nodes and fractures to edges")
+    rows, fracs, x, y, z, length = read_intersection_list(
+        boundary_index(inflow), boundary_index(outflow), intersection_file)
+    num_nodes = len(rows)
+
+    u, v, frac, distance = intersection_graph_edges(fracs, x, y, z)
+
+    source = np.flatnonzero(fracs[:, 1] == SOURCE)
+    target = np.flatnonzero(fracs[:, 1] == TARGET)
+    u = np.concatenate((u, source, target))
+    v = np.concatenate((v, np.full(len(source), num_nodes, dtype=np.int64),
+                        np.full(len(target), num_nodes + 1, dtype=np.int64)))
+    frac = np.concatenate((frac, np.full(len(source), SOURCE,
+                                         dtype=np.int64),
+                           np.full(len(target), TARGET, dtype=np.int64)))
+    distance = np.concatenate((distance, np.zeros(len(source) + len(target))))
+
+    # source and target are the last two vertices
+    G = ArrayGraph(np.append(rows, [SOURCE, TARGET]),
+                   u,
+                   v, {
+                       'x': np.append(x, [np.nan, np.nan]),
+                       'y': np.append(y, [np.nan, np.nan]),
+                       'z': np.append(z, [np.nan, np.nan]),
+                       'length': np.append(length, [np.nan, np.nan]),
+                       'frac': np.vstack((fracs, [[0, 0], [0, 0]]))
+                   }, {
+                       'frac': frac,
+                       'length': distance
+                   },
+                   graph={'representation': "intersection"},
+                   label_kind='label',
+                   kinds={
+                       ('node', 'frac'): 'tuple2',
+                       ('edge', 'frac'): 'label'
+                   })
+    # source and target have no attributes
+    has_data = np.append(np.ones(num_nodes, dtype=bool), [False, False])
+    for key in ['x', 'y', 'z', 'length', 'frac']:
+        G.present[('node', key)] = has_data
+    add_perm(G, fracture_info)
+    print("--> Graph with %d vertices and %d edges" %
+          (G.num_nodes, G.num_edges))
+    print("Graph Construction Complete")
+    return G
+
+
+def intersection_graph_edges(fracs, x, y, z):
+    """ Determine the edges of the intersection graph. Intersections are
+    grouped by fracture in a single pass and every pair of intersections on
+    the same fracture is connected.
+
+    Parameters
+    ----------
+        fracs : list
+            tuple (f1, f2) of the fractures of each intersection, source and target are 's' and 't'. An (n, 2) integer array with non positive values for source and target is accepted as well
+        x, y, z : list
+            coordinates of the intersection centers
+
+    Returns
+    -------
+        u, v : NumPy arrays
+            indices of the two intersections of each edge, u < v, edges are sorted by u then v
+        frac : NumPy array
+            fracture shared by the two intersections
+        distance : NumPy array
+            distance between the intersection centers
+
+    Notes
+    -----
+    Work is proportional to the number of edges rather than the square of the number of intersections. Boundary fractures 's' and 't', and boundary indices, do not create edges. If two intersections share two fractures, the edge is on the lower fracture id. 
+    """
+
+    if isinstance(fracs, np.ndarray):
+        member_node = np.repeat(np.arange(len(fracs)), fracs.shape[1])
+        member_frac = fracs.ravel()
+        member = member_frac > 0
+        member_node = member_node[member]
+        member_frac = member_frac[member].astype(np.int64)
+    else:
+        member_node = []
+        member_frac = []
+        for k, frac in enumerate(fracs):
+            for f in frac:
+                if f != 's' and f != 't' and f > 0:
+                    member_node.append(k)
+                    member_frac.append(f)
+        member_node = np.array(member_node, dtype=np.int64)
+        member_frac = np.array(member_frac, dtype=np.int64)
+
+    # sort memberships by fracture, then by node
+    order = np.lexsort((member_node, member_frac))
+    member_node = member_node[order]
+    member_frac = member_frac[order]
+
+    # size of the fracture group of each membership and its rank in the group
+    group_start = np.flatnonzero(
+        np.diff(member_frac, prepend=member_frac[:1] - 1))
+    group_size = np.diff(np.append(group_start, len(member_frac)))
+    size = np.repeat(group_size, group_size)
+    rank = np.arange(len(member_frac)) - np.repeat(group_start, group_size)
+
+    # pair every membership with the memberships after it in its group
+    count = size - 1 - rank
+    first = np.repeat(np.arange(len(member_frac)), count)
+    run_start = np.repeat(np.cumsum(count) - count, count)
+    second = first + 1 + np.arange(len(first)) - run_start
+
+    i = member_node[first]
+    j = member_node[second]
+    frac = member_frac[first]
+
+    # remove duplicate pairs, keeping the lowest fracture id
+    num_nodes = len(fracs)
+    key = i * num_nodes + j
+    order = np.lexsort((frac, key))
+    key, unique = np.unique(key[order], return_index=True)
+    i = i[order][unique]
+    j = j[order][unique]
+    frac = frac[order][unique]
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    z = np.asarray(z, dtype=float)
+    distance = np.sqrt((x[i] - x[j])**2 + (y[i] - y[j])**2 + (z[i] - z[j])**2)
+    return i, j, frac, distance
+
+
 def create_bipartite_graph(inflow,
                            outflow,
                            intersection_list='intersection_list.dat',
@@ -291,77 +712,136 @@ def create_bipartite_graph(inflow,
     Returns
     -------
         B : NetworkX Graph
+            Fractures are labeled by fracture number. The intersection on line i of intersection_list, counted from 0 after the header, is labeled B.graph['intersection_offset'] + 1 + i, where the offset is the number of fractures
 
     Notes
     -----
+    The projections onto the fractures and intersections are available as sparse matrices, see functions bipartite_incidence and bipartite_projection.
+
     See Hyman et al. 2018 "Identifying Backbones in Three-Dimensional Discrete Fracture Networks: A Bipartite Graph-Based Approach" SIAM Multiscale Modeling and Simulation for more details 
 """
 
     print("--> Creating Bipartite Graph")
 
-    # generate sequential letter sequence as ids for fractures
-    # e..g aaaaa aaaaab aaaaac
-    from itertools import product
-
-    def intersection_id_generator(length=5):
-        chars = 'abcdefghijklmnopqrstuvwxyz'
-        for p in product(chars, repeat=length):
-            yield (''.join(p))
-
     B = nx.Graph(representation="bipartite")
-    # keep track of the sets of fractures and intersections
-    B.fractures = set()
-    B.intersections = set()
-    intersection_id = intersection_id_generator()
-
-    inflow_index = boundary_index(inflow)
-    outflow_index = boundary_index(outflow)
+    rows, fracs, x, y, z, length = read_intersection_list(
+        boundary_index(inflow),
+        boundary_index(outflow),
+        intersection_list,
+        drop_boundaries=False)
+
+    # intersections are numbered after the fractures so the ids are disjoint
+    offset = len(load_fracture_info(fracture_info)['perm'])
+    B.graph['intersection_offset'] = offset
+    intersections = (offset + 1 + rows).tolist()
+
+    # add intersection nodes explicitly to include intersection properties
+    B.add_nodes_from(
+        (i, {
+            'x': xi,
+            'y': yi,
+            'z': zi,
+            'length': li
+        }) for i, xi, yi, zi, li in zip(intersections, x.tolist(), y.tolist(
+        ), z.tolist(), length.tolist()))
+
+    fracture1 = fracs[:, 0].tolist()
+    B.add_edges_from((i, f, {
+        'frac': f
+    }) for i, f in zip(intersections, fracture1))
+    # second fracture, or source and target. Intersections with other
+    # boundaries only connect to their first fracture
+    keep = np.flatnonzero(fracs[:, 1] != 0)
+    fracture2 = decode_labels(fracs[keep, 1])
+    B.add_edges_from((intersections[k], f, {
+        'frac': f
+    }) for k, f in zip(keep.tolist(), fracture2))
 
-    with open(intersection_list) as f:
-        header = f.readline()
-        data = f.read().strip()
-        for line in data.split('\n'):
-            fracture1, fracture2, x, y, z, length = line.split(' ')
-            fracture1 = int(fracture1)
-            fracture2 = int(fracture2)
-            if fracture2 < 0:
-                if fracture2 == inflow_index:
-                    fracture2 = 's'
-                elif fracture2 == outflow_index:
-                    fracture2 = 't'
-            intersection = next(intersection_id)
-            # add intersection node explicitly to include intersection properties
-            B.add_node(intersection,
-                       x=float(x),
-                       y=float(y),
-                       z=float(z),
-                       length=float(length))
-            B.intersections.add(intersection)
-
-            B.add_edge(intersection, fracture1, frac=fracture1)
-            B.fractures.add(fracture1)
-            if fracture2 > 0 or fracture2 == 's' or fracture2 == 't':
-                B.add_edge(intersection, fracture2, frac=fracture2)
-                B.fractures.add(fracture2)
+    # keep track of the sets of fractures and intersections
+    B.fractures = set(fracture1) | set(fracture2)
+    B.intersections = set(intersections)
 
     # add  source and sink for intersections so they will appear in intersection projection
     B.add_edge('intersection_s', 's')
     B.add_edge('intersection_t', 't')
 
     # add fracture info
-    with open(fracture_info) as f:
-        header = f.readline()
-        data = f.read().strip()
-        for fracture, line in enumerate(data.split('\n'), 1):
-            c, perm, aperture = line.split(' ')
-            B.nodes[fracture]['perm'] = float(perm)
-            B.nodes[fracture]['aperture'] = float(aperture)
+    add_perm(B, fracture_info)
 
     print("--> Complete")
 
     return B
 
 
+def bipartite_incidence(B):
+    """ Sparse incidence matrix of a bipartite graph of the DFN
+
+    Parameters
+    ----------
+        B : NetworkX Graph
+            bipartite graph, see function create_bipartite_graph
+
+    Returns
+    -------
+        incidence : SciPy CSR matrix
+            incidence[i, j] is 1 if intersection i lies on fracture j
+        intersections : list
+            intersection vertex of each row, including 'intersection_s' and 'intersection_t'
+        fractures : list
+            fracture vertex of each column, including 's' and 't'
+
+    Notes
+    -----
+    Rows and columns are in the vertex order of B
+    """
+
+    fractures = [n for n in B.nodes() if n in B.fractures]
+    intersections = [n for n in B.nodes() if n not in B.fractures]
+    column = {n: j for j, n in enumerate(fractures)}
+    row = {n: i for i, n in enumerate(intersections)}
+    rows = []
+    cols = []
+    for u, v in B.edges():
+        if u in column:
+            u, v = v, u
+        rows.append(row[u])
+        cols.append(column[v])
+    incidence = scipy.sparse.csr_matrix(
+        (np.ones(len(rows)), (rows, cols)),
+        shape=(len(intersections), len(fractures)))
+    return incidence, intersections, fractures
+
+
+def bipartite_projection(incidence, nodes="fracture"):
+    """ Sparse adjacency matrix of a projection of the bipartite graph, computed as a product of incidence matrices
+
+    Parameters
+    ----------
+        incidence : SciPy sparse matrix
+            incidence matrix, see function bipartite_incidence
+        nodes : str
+            'fracture' for the fracture projection, where two fractures are adjacent if they share an intersection, or 'intersection' for the intersection projection, where two intersections are adjacent if they lie on the same fracture
+
+    Returns
+    -------
+        adjacency : SciPy CSR matrix
+            symmetric with zero diagonal. Entries are the number of shared intersections (fracture projection) or fractures (intersection projection)
+    """
+
+    incidence = scipy.sparse.csr_matrix(incidence)
+    if nodes == "fracture":
+        adjacency = (incidence.T @ incidence).tocsr()
+    elif nodes == "intersection":
+        adjacency = (incidence @ incidence.T).tocsr()
+    else:
+        error = "ERROR: Unknown projection %s, use 'fracture' or 'intersection'\n" % nodes
+        sys.stderr.write(error)
+        sys.exit(1)
+    adjacency.setdiag(0)
+    adjacency.eliminate_zeros()
+    return adjacency
+
+
 def add_fracture_source(self, G, source):
     """Returns the k shortest paths in a graph 
     
@@ -511,7 +991,167 @@ def add_fracture_target(self, G, target):
     return G
 
 
-def k_shortest_paths(G, k, source, target, weight):
+def path_adjacency(G, weight=None):
+    """ Compressed sparse row adjacency of a graph with edge weights, used by the shortest path functions
+
+    Parameters
+    ----------
+        G : NetworkX Graph
+            NetworkX Graph based on a DFN
+        weight : string
+            Edge weight used for finding the shortest path. If None, every edge has unit weight
+
+    Returns
+    -------
+        adjacency : dict
+            'nodes' (list of vertices), 'index' (vertex to position), 'offsets', 'neighbors', and 'weights' (Python lists in CSR format) of the outgoing edges, and 'reverse_offsets', 'reverse_neighbors', 'reverse_weights' of the incoming edges
+
+    Notes
+    -----
+    Edges without the weight attribute have unit weight. Edge weights must be numerical and non-negative
+"""
+
+    nodes = list(G.nodes())
+    index = {n: i for i, n in enumerate(nodes)}
+
+    def csr(adj):
+        offsets = [0]
+        neighbors = []
+        weights = []
+        for n in nodes:
+            for m, d in adj[n].items():
+                neighbors.append(index[m])
+                if weight is None:
+                    weights.append(1.0)
+                else:
+                    weights.append(float(d.get(weight, 1.0)))
+            offsets.append(len(neighbors))
+        return offsets, neighbors, weights
+
+    adjacency = {'nodes': nodes, 'index': index}
+    adjacency['offsets'], adjacency['neighbors'], adjacency['weights'] = csr(
+        G.adj)
+    if min(adjacency['weights'], default=0.0) < 0:
+        error = "ERROR: Edge weights must be non-negative\n"
+        sys.stderr.write(error)
+        sys.exit(1)
+    if G.is_directed():
+        adjacency['reverse_offsets'], adjacency[
+            'reverse_neighbors'], adjacency['reverse_weights'] = csr(G.pred)
+    else:
+        adjacency['reverse_offsets'] = adjacency['offsets']
+        adjacency['reverse_neighbors'] = adjacency['neighbors']
+        adjacency['reverse_weights'] = adjacency['weights']
+    return adjacency
+
+
+def distance_to_target(adjacency, target):
+    """ Shortest path distance from every vertex to the target (Dijkstra on the reversed edges)
+
+    Parameters
+    ----------
+        adjacency : dict
+            see function path_adjacency
+        target : int
+            index of the target vertex
+
+    Returns
+    -------
+        dist : list
+            distance of every vertex to the target, inf if the target cannot be reached
+"""
+
+    offsets = adjacency['reverse_offsets']
+    neighbors = adjacency['reverse_neighbors']
+    weights = adjacency['reverse_weights']
+    dist = [float('inf')] * len(adjacency['nodes'])
+    dist[target] = 0.0
+    heap = [(0.0, target)]
+    while heap:
+        d, n = heapq.heappop(heap)
+        if d > dist[n]:
+            continue
+        for j in range(offsets[n], offsets[n + 1]):
+            m = neighbors[j]
+            dm = d + weights[j]
+            if dm < dist[m]:
+                dist[m] = dm
+                heapq.heappush(heap, (dm, m))
+    return dist
+
+
+def spur_path(adjacency, heuristic, spur, target, blocked_nodes,
+              blocked_next):
+    """ A* search for the shortest path from a spur vertex to the target that avoids blocked vertices and edges
+
+    Parameters
+    ----------
+        adjacency : dict
+            see function path_adjacency
+        heuristic : list
+            distance of every vertex to the target in the full graph, see function distance_to_target
+        spur : int
+            index of the first vertex of the path
+        target : int
+            index of the target vertex
+        blocked_nodes : set
+            indices of vertices the path may not visit
+        blocked_next : set
+            indices of vertices the path may not step to from the spur vertex
+
+    Returns
+    -------
+        path : list
+            indices of the vertices of the path, None if there is no path
+        cost : float
+            length of the path
+
+    Notes
+    -----
+    Removing vertices and edges can only increase distances, so the distances in the full graph are a consistent heuristic and every vertex is settled at most once
+"""
+
+    if heuristic[spur] == float('inf'):
+        return None, None
+    offsets = adjacency['offsets']
+    neighbors = adjacency['neighbors']
+    weights = adjacency['weights']
+    g = {spur: 0.0}
+    parent = {spur: -1}
+    settled = set()
+    heap = [(heuristic[spur], 0.0, spur)]
+    while heap:
+        f, d, n = heapq.heappop(heap)
+        if n in settled:
+            continue
+        if n == target:
+            path = [n]
+            while parent[n] != -1:
+                n = parent[n]
+                path.append(n)
+            return path[::-1], d
+        settled.add(n)
+        for j in range(offsets[n], offsets[n + 1]):
+            m = neighbors[j]
+            if m in settled or m in blocked_nodes:
+                continue
+            if n == spur and m in blocked_next:
+                continue
+            dm = d + weights[j]
+            if dm < g.get(m, float('inf')):
+                g[m] = dm
+                parent[m] = n
+                heapq.heappush(heap, (dm + heuristic[m], dm, m))
+    return None, None
+
+
+def k_shortest_paths(G,
+                     k,
+                     source,
+                     target,
+                     weight,
+                     time_budget=None,
+                     report=False):
     """Returns the k shortest paths in a graph 
     
     Parameters
@@ -526,6 +1166,10 @@ def k_shortest_paths(G, k, source, target, weight):
             Ending node
         weight : string
             Edge weight used for finding the shortest path
+        time_budget : float
+            Maximum run time in seconds. If the budget is exceeded, the paths found so far are returned. Default is None (no limit)
+        report : bool
+            If True, progress is printed to screen. Default is False
 
     Returns 
     -------
@@ -534,13 +1178,99 @@ def k_shortest_paths(G, k, source, target, weight):
 
     Notes
     -----
-    Edge weights must be numerical and non-negative
+    Edge weights must be numerical and non-negative.
+    Loopless paths are found with Yen's algorithm. Every spur path is an A* search guided by a single Dijkstra tree rooted at the target, which is shared by all searches. Paths are returned in order of increasing length, ties may be ordered differently than by networkx.shortest_simple_paths
 """
-    return list(
-        islice(nx.shortest_simple_paths(G, source, target, weight=weight), k))
 
+    for n in [source, target]:
+        if n not in G:
+            error = "ERROR: Node {} is not in the graph\n".format(n)
+            sys.stderr.write(error)
+            sys.exit(1)
+
+    tic = timer()
+    adjacency = path_adjacency(G, weight)
+    nodes = adjacency['nodes']
+    s = adjacency['index'][source]
+    t = adjacency['index'][target]
+    heuristic = distance_to_target(adjacency, t)
+
+    path, cost = spur_path(adjacency, heuristic, s, t, set(), set())
+    if path is None:
+        error = "ERROR: No path between {} and {}\n".format(source, target)
+        sys.stderr.write(error)
+        sys.exit(1)
 
-def k_shortest_paths_backbone(self, G, k, source='s', target='t', weight=None):
+    offsets = adjacency['offsets']
+    neighbors = adjacency['neighbors']
+    weights = adjacency['weights']
+
+    def cumulative_cost(path):
+        cost = [0.0]
+        for n, m in zip(path[:-1], path[1:]):
+            j = neighbors.index(m, offsets[n], offsets[n + 1])
+            cost.append(cost[-1] + weights[j])
+        return cost
+
+    paths = [path]
+    costs = [cumulative_cost(path)]
+    # next vertices of the accepted paths after each root path
+    next_nodes = {}
+    candidates = []
+    seen = set([tuple(path)])
+    counter = 0
+    report_every = max(1, k // 10)
+
+    while len(paths) < k:
+        previous = paths[-1]
+        previous_cost = costs[-1]
+        for i in range(len(previous) - 1):
+            root = tuple(previous[:i + 1])
+            next_nodes.setdefault(root, set()).add(previous[i + 1])
+        for i in range(len(previous) - 1):
+            root = previous[:i + 1]
+            spur, spur_cost = spur_path(adjacency, heuristic, previous[i], t,
+                                        set(root[:-1]),
+                                        next_nodes[tuple(root)])
+            if spur is None:
+                continue
+            candidate = root[:-1] + spur
+            key = tuple(candidate)
+            if key in seen:
+                continue
+            seen.add(key)
+            counter += 1
+            heapq.heappush(candidates,
+                           (previous_cost[i] + spur_cost, counter, candidate))
+
+        if len(candidates) == 0:
+            break
+        cost, _, path = heapq.heappop(candidates)
+        paths.append(path)
+        costs.append(cumulative_cost(path))
+
+        elapsed = timer() - tic
+        if report and len(paths) % report_every == 0:
+            print("--> Found %d of %d paths, length %g, %0.2f seconds" %
+                  (len(paths), k, cost, elapsed))
+        if time_budget is not None and elapsed > time_budget and len(
+                paths) < k:
+            print(
+                "--> Warning: time budget of %0.2f seconds exceeded, returning %d of %d paths"
+                % (time_budget, len(paths), k))
+            break
+
+    return [[nodes[n] for n in path] for path in paths]
+
+
+def k_shortest_paths_backbone(self,
+                              G,
+                              k,
+                              source='s',
+                              target='t',
+                              weight=None,
+                              time_budget=None,
+                              copy=True):
     """Returns the subgraph made up of the k shortest paths in a graph 
    
     Parameters
@@ -555,6 +1285,10 @@ def k_shortest_paths_backbone(self, G, k, source='s', target='t', weight=None):
             Ending node
         weight : string
             Edge weight used for finding the shortest path
+        time_budget : float
+            Maximum run time in seconds of the path search. If the budget is exceeded, the backbone is made of the paths found so far. Default is None (no limit)
+        copy : bool
+            If True, the subgraph is a copy of the vertices and edges of the paths. If False, a read-only view of G is returned. Default is True
 
     Returns 
     -------
@@ -564,24 +1298,239 @@ def k_shortest_paths_backbone(self, G, k, source='s', target='t', weight=None):
     Notes
     -----
         See Hyman et al. 2017 "Predictions of first passage times in sparse discrete fracture networks using graph-based reductions" Physical Review E for more details
+        The subgraph induced by the path vertices is built directly, G is not copied
 """
 
     print("\n--> Determining %d shortest paths in the network" % k)
-    H = G.copy()
+    tic = timer()
     k_shortest = set([])
-    for path in k_shortest_paths(G, k, source, target, weight):
+    paths = k_shortest_paths(G,
+                             k,
+                             source,
+                             target,
+                             weight,
+                             time_budget=time_budget,
+                             report=True)
+    for path in paths:
         k_shortest |= set(path)
-    k_shortest.remove('s')
-    k_shortest.remove('t')
-    path_nodes = sorted(list(k_shortest))
-    path_nodes.append('s')
-    path_nodes.append('t')
-    nodes = list(G.nodes())
-    secondary = list(set(nodes) - set(path_nodes))
-    for n in secondary:
-        H.remove_node(n)
-    return H
+    k_shortest.add(source)
+    k_shortest.add(target)
+    H = G.subgraph(k_shortest)
+    if copy:
+        H = H.copy()
+    print("--> Backbone of %d paths: %d vertices, %d edges, %0.2f seconds" %
+          (len(paths), H.number_of_nodes(), H.number_of_edges(),
+           timer() - tic))
     print("--> Complete\n")
+    return H
+
+
+def isolated_clusters(G, source='s', target='t'):
+    """Splits the vertices of a graph into the connected component of the source and target and the clusters that are not connected to them
+
+    Parameters
+    ----------
+        G : NetworkX Graph
+            NetworkX Graph based on a DFN 
+        source : node 
+            Starting node
+        target : node
+            Ending node
+
+    Returns
+    -------
+        flowing : set
+            vertices of the component containing source and target
+        clusters : list
+            sets of vertices of the other connected components, largest first
+
+    Notes
+    -----
+        Exits with an error if source and target are not connected
+"""
+
+    flowing = None
+    clusters = []
+    for component in nx.connected_components(G):
+        if source in component:
+            flowing = component
+        else:
+            clusters.append(component)
+    if flowing is None or target not in flowing:
+        error = "ERROR: {} and {} are not connected in the graph\n".format(
+            source, target)
+        sys.stderr.write(error)
+        sys.exit(1)
+    clusters.sort(key=len, reverse=True)
+    return flowing, clusters
+
+
+def dead_end_vertices(G, keep=()):
+    """Finds the vertices on dead-end branches by iteratively stripping vertices with at most one neighbor
+
+    Parameters
+    ----------
+        G : NetworkX Graph
+            NetworkX Graph based on a DFN 
+        keep : iterable
+            vertices that are never stripped, e.g. source and target
+
+    Returns
+    -------
+        dead_ends : set
+            vertices that are removed by the stripping
+
+    Notes
+    -----
+        The remaining vertices form the 2-core of G, with the vertices in keep protected. Parallel edges and self loops do not count as additional neighbors
+"""
+
+    keep = set(keep)
+    degree = {v: len(G.adj[v]) - (v in G.adj[v]) for v in G}
+    stack = [v for v, d in degree.items() if d <= 1 and v not in keep]
+    dead_ends = set()
+    while stack:
+        v = stack.pop()
+        if v in dead_ends:
+            continue
+        dead_ends.add(v)
+        for w in G.adj[v]:
+            if w == v or w in dead_ends:
+                continue
+            degree[w] -= 1
+            if degree[w] <= 1 and w not in keep:
+                stack.append(w)
+    return dead_ends
+
+
+def prune_non_flowing(G, source='s', target='t', dead_ends=True, copy=True):
+    """Removes the vertices that cannot carry flow from source to target: the clusters not connected to source and target and, optionally, dead-end branches
+
+    Parameters
+    ----------
+        G : NetworkX Graph
+            NetworkX Graph based on a DFN 
+        source : node 
+            Starting node
+        target : node
+            Ending node
+        dead_ends : bool
+            If True, dead-end branches are stripped, see function dead_end_vertices. Default is True
+        copy : bool
+            If True, the subgraph is a copy. If False, a read-only view of G is returned. Default is True
+
+    Returns 
+    -------
+        H : NetworkX Graph
+            Subgraph of G on the flowing vertices, with the labels of G
+        clusters : list
+            sets of vertices of G in the clusters not connected to source and target, largest first
+
+    Notes
+    -----
+        The pressure of a removed vertex equals that of the vertex where its branch attaches and no flux goes through it, so the flow solution on the remaining vertices is unchanged.
+        Dead-end stripping is 2-core style: a dead-end cluster containing a loop is kept.
+        G can be an ArrayGraph, see function prune_array_graph
+"""
+
+    if isinstance(G, ArrayGraph):
+        return prune_array_graph(G, source, target, dead_ends)
+
+    tic = timer()
+    flowing, clusters = isolated_clusters(G, source, target)
+    H = G.subgraph(flowing)
+    ndead = 0
+    if dead_ends:
+        stripped = dead_end_vertices(H, keep=[source, target])
+        ndead = len(stripped)
+        H = G.subgraph(flowing - stripped)
+    if copy:
+        H = H.copy()
+    print(
+        "--> Pruned %d vertices in %d isolated clusters and %d dead-end vertices, %d of %d vertices remain, %0.2f seconds"
+        % (sum(len(c) for c in clusters), len(clusters), ndead,
+           H.number_of_nodes(), G.number_of_nodes(), timer() - tic))
+    return H, clusters
+
+
+def prune_array_graph(G, source='s', target='t', dead_ends=True):
+    """Removes the vertices of an ArrayGraph that cannot carry flow from source to target, see function prune_non_flowing
+
+    Parameters
+    ----------
+        G : ArrayGraph
+            graph based on a DFN 
+        source : node 
+            Starting node
+        target : node
+            Ending node
+        dead_ends : bool
+            If True, dead-end branches are stripped. Default is True
+
+    Returns 
+    -------
+        H : ArrayGraph
+            Subgraph of G on the flowing vertices, in the order of G
+        clusters : list
+            lists of labels of the vertices of G in the clusters not connected to source and target, largest first
+
+    Notes
+    -----
+        Connected components are found with scipy.sparse.csgraph. Dead ends are stripped in rounds, each round removes all vertices with at most one neighbor left
+"""
+
+    tic = timer()
+    s = G.index(source)
+    t = G.index(target)
+    n = G.num_nodes
+    A = scipy.sparse.csr_matrix((np.ones(G.num_edges), (G.u, G.v)),
+                                shape=(n, n))
+    ncomp, comp = scipy.sparse.csgraph.connected_components(A,
+                                                           directed=False)
+    if comp[s] != comp[t]:
+        error = "ERROR: {} and {} are not connected in the graph\n".format(
+            source, target)
+        sys.stderr.write(error)
+        sys.exit(1)
+    keep = comp == comp[s]
+
+    other = np.flatnonzero(~keep)
+    other = other[np.argsort(comp[other], kind='stable')]
+    start = np.flatnonzero(np.diff(comp[other], prepend=-1))
+    labels = decode_values(G.labels[other], G.label_kind)
+    clusters = [
+        labels[i:j] for i, j in zip(start.tolist(),
+                                    np.append(start[1:], len(other)).tolist())
+    ]
+    clusters.sort(key=len, reverse=True)
+
+    ndead = 0
+    if dead_ends:
+        offsets, neighbors, edges = G.adjacency()
+        loop = G.u == G.v
+        degree = np.bincount(G.u[~loop], minlength=n) + np.bincount(
+            G.v[~loop], minlength=n)
+        protected = np.zeros(n, dtype=bool)
+        protected[[s, t]] = True
+        while True:
+            leaves = np.flatnonzero(keep & (degree <= 1) & ~protected)
+            if len(leaves) == 0:
+                break
+            keep[leaves] = False
+            ndead += len(leaves)
+            # neighbors of the stripped vertices lose one neighbor
+            counts = offsets[leaves + 1] - offsets[leaves]
+            slots = np.repeat(offsets[leaves] - np.cumsum(counts) + counts,
+                              counts) + np.arange(counts.sum())
+            others = neighbors[slots]
+            others = others[keep[others]]
+            np.subtract.at(degree, others, 1)
+
+    H = G.subgraph(keep)
+    print(
+        "--> Pruned %d vertices in %d isolated clusters and %d dead-end vertices, %d of %d vertices remain, %0.2f seconds"
+        % (len(other), len(clusters), ndead, H.num_nodes, n, timer() - tic))
+    return H, clusters
 
 
 def pull_source_and_target(nodes, source='s', target='t'):
@@ -815,6 +1764,99 @@ def load_json_graph(self, name):
     return G
 
 
+def load_fracture_info(fracture_info="fracture_info.dat"):
+    """ Read fracture_info.dat into arrays. The file is parsed once and
+    kept in memory until it is modified.
+
+    Parameters
+    ----------
+        fracture_info : str
+                filename for fracture information
+
+    Returns
+    -------
+        info : dict
+            read-only NumPy arrays 'num_connections', 'perm', and 'aperture'. Entry i belongs to fracture i + 1
+
+    Notes
+    -----
+    File Format: one header line, then num_connections perm aperture of each fracture
+    """
+
+    key = os.path.abspath(fracture_info)
+    stat = os.stat(key)
+    cached = _fracture_info_cache.get(key)
+    if cached is not None and cached[0] == (stat.st_mtime, stat.st_size):
+        return cached[1]
+
+    data = np.loadtxt(fracture_info, skiprows=1, ndmin=2)
+    info = {
+        'num_connections': data[:, 0].astype(int),
+        'perm': data[:, 1].copy(),
+        'aperture': data[:, 2].copy()
+    }
+    for values in info.values():
+        values.flags.writeable = False
+    _fracture_info_cache[key] = ((stat.st_mtime, stat.st_size), info)
+    return info
+
+
+def fracture_index(fracs):
+    """ Convert fracture labels of vertices or edges to an index array
+
+    Parameters
+    ----------
+        fracs : list
+            fracture labels, fracture number or 's' / 't'
+
+    Returns
+    -------
+        index : NumPy array
+            fracture number - 1, -1 for 's' and 't'
+
+        is_fracture : NumPy array
+            boolean array, False for 's' and 't'
+    """
+
+    index = np.array([x - 1 if x != 's' and x != 't' else -1 for x in fracs],
+                     dtype=int)
+    return index, index >= 0
+
+
+def edge_data(G):
+    """ List the edges of an undirected graph with their attribute dictionaries
+
+    Parameters
+    ----------
+        G : NetworkX graph
+
+    Returns
+    -------
+        u, v : lists
+            end points of every edge, in the order of G.edges()
+
+        data : list
+            attribute dictionary of every edge. Changing it changes the edge attributes of G
+
+    Notes
+    -----
+    Three flat lists are returned rather than a list of (u, v, d) tuples, which avoids allocating an object per edge on large graphs.
+    """
+
+    u = []
+    v = []
+    data = []
+    seen = set()
+    for n, nbrs in G.adjacency():
+        for m, d in nbrs.items():
+            if m not in seen:
+                u.append(n)
+                v.append(m)
+                data.append(d)
+        seen.add(n)
+    return u, v, data
+
+
 def add_perm(G, fracture_info="fracture_info.dat"):
     """ Add fracture permeability to Graph. If Graph representation is
     fracture, then permeability is a node attribute. If graph representation 
@@ -833,40 +1875,67 @@ def add_perm(G, fracture_info="fracture_info.dat"):
  
     Notes
     -----
-
+    Source and target (and the edges connecting to them) have unit permeability. G can be an ArrayGraph of the fracture or intersection graph, see function add_array_graph_perm
 """
 
-    perm = np.genfromtxt(fracture_info, skip_header=1)[:, 1]
+    info = load_fracture_info(fracture_info)
+    if isinstance(G, ArrayGraph):
+        add_array_graph_perm(G, info)
+        return
     if G.graph['representation'] == "fracture":
-        nodes = list(nx.nodes(G))
-        for n in nodes:
-            if n != 's' and n != 't':
-                G.nodes[n]['perm'] = perm[n - 1]
-                G.nodes[n]['iperm'] = 1.0 / perm[n - 1]
-            else:
-                G.nodes[n]['perm'] = 1.0
-                G.nodes[n]['iperm'] = 1.0
-
+        data = [d for n, d in G.nodes(data=True)]
+        index, is_fracture = fracture_index(list(G.nodes()))
     elif G.graph['representation'] == "intersection":
-        edges = list(nx.edges(G))
-        for u, v in edges:
-            x = G[u][v]['frac']
-            if x != 's' and x != 't':
-                G[u][v]['perm'] = perm[x - 1]
-                G[u][v]['iperm'] = 1.0 / perm[x - 1]
-            else:
-                G[u][v]['perm'] = 1.0
-                G[u][v]['iperm'] = 1.0
+        u, v, data = edge_data(G)
+        index, is_fracture = fracture_index([d['frac'] for d in data])
     elif G.graph['representation'] == "bipartite":
-        # add fracture info
-        with open(fracture_info) as f:
-            header = f.readline()
-            data = f.read().strip()
-            for fracture, line in enumerate(data.split('\n'), 1):
-                c, perm, aperture = line.split(' ')
-                G.nodes[fracture]['perm'] = float(perm)
-                G.nodes[fracture]['iperm'] = 1.0 / float(perm)
-                G.nodes[fracture]['aperture'] = float(aperture)
+        fractures = [n for n in range(1, len(info['perm']) + 1) if n in G]
+        data = [G.nodes[n] for n in fractures]
+        index = np.array(fractures, dtype=int) - 1
+        is_fracture = np.ones(len(index), dtype=bool)
+    else:
+        return
+
+    perm = np.ones(len(index))
+    perm[is_fracture] = info['perm'][index[is_fracture]]
+    iperm = 1.0 / perm
+    for d, k, ik in zip(data, perm.tolist(), iperm.tolist()):
+        d['perm'] = k
+        d['iperm'] = ik
+
+    if G.graph['representation'] == "bipartite":
+        for d, b in zip(data, info['aperture'][index].tolist()):
+            d['aperture'] = b
+
+
+def add_array_graph_perm(G, info):
+    """ Add fracture permeability to an ArrayGraph, on the vertices of the fracture graph and on the edges of the intersection graph
+
+    Parameters
+    ---------- 
+        G : ArrayGraph
+            graph based on the DFN
+        info : dict
+            see function load_fracture_info
+
+    Returns
+    -------
+        None
+"""
+
+    if G.graph['representation'] == "fracture":
+        fracs = G.labels
+        set_column = G.set_node_column
+    elif G.graph['representation'] == "intersection":
+        fracs = G.edge_data['frac']
+        set_column = G.set_edge_column
+    else:
+        return
+    is_fracture = fracs > 0
+    perm = np.ones(len(fracs))
+    perm[is_fracture] = info['perm'][fracs[is_fracture] - 1]
+    set_column('perm', perm)
+    set_column('iperm', 1.0 / perm)
 
 
 def add_area(G, fracture_info="fracture_info.dat"):
@@ -877,7 +1946,7 @@ def add_area(G, fracture_info="fracture_info.dat"):
     Parameters
     ----------
         G : NetworkX Graph
-            networkX graph 
+            networkX graph or ArrayGraph
         fracture_info : str
             filename for fracture information
     
@@ -886,16 +1955,28 @@ def add_area(G, fracture_info="fracture_info.dat"):
         None
 '''
 
-    aperture = np.genfromtxt(fracture_info, skip_header=1)[:, 2]
-    edges = list(nx.edges(G))
-    for u, v in edges:
-        x = G.edges[u, v]['frac']
-        if x != 's' and x != 't':
-            G.edges[u,
-                    v]['area'] = aperture[x - 1] * (G.nodes[u]['length'] +
-                                                    G.nodes[v]['length']) / 2.0
-        else:
-            G.edges[u, v]['area'] = 1.0
+    aperture = load_fracture_info(fracture_info)['aperture']
+    if isinstance(G, ArrayGraph):
+        frac = G.edge_data['frac']
+        is_fracture = frac > 0
+        length = G.node_data['length']
+        area = np.ones(G.num_edges)
+        area[is_fracture] = aperture[frac[is_fracture] - 1] * (
+            length[G.u[is_fracture]] + length[G.v[is_fracture]]) / 2.0
+        G.set_edge_column('area', area)
+        return
+
+    u, v, data = edge_data(G)
+    index, is_fracture = fracture_index([d['frac'] for d in data])
+    length = dict(G.nodes(data='length'))
+    area = np.ones(len(data))
+    if is_fracture.any():
+        keep = np.flatnonzero(is_fracture).tolist()
+        ends = np.array([length[u[i]] for i in keep], dtype=float) + np.array(
+            [length[v[i]] for i in keep], dtype=float)
+        area[keep] = aperture[index[keep]] * ends / 2.0
+    for d, a in zip(data, area.tolist()):
+        d['area'] = a
     return
 
 
@@ -904,15 +1985,29 @@ def add_weight(G):
     Parameters
     ----------
         G : NetworkX Graph
-            networkX graph 
+            networkX graph or ArrayGraph
     
     Returns
     -------
         None
 '''
-    edges = list(nx.edges(G))
-    for u, v in edges:
-        if G.edges[u, v]['length'] > 0:
-            G.edges[u, v]['weight'] = G.edges[u, v]['perm'] * G.edges[
-                u, v]['area'] / G.edges[u, v]['length']
+    if isinstance(G, ArrayGraph):
+        length = G.edge_data['length']
+        keep = length > 0
+        weight = np.full(G.num_edges, np.nan)
+        weight[keep] = G.edge_data['perm'][keep] * G.edge_data['area'][
+            keep] / length[keep]
+        G.set_edge_column('weight', weight, present=keep)
+        return
+
+    u, v, data = edge_data(G)
+    length = np.array([d['length'] for d in data], dtype=float)
+    keep = np.flatnonzero(length > 0)
+    if len(keep) == 0:
+        return
+    perm = np.array([data[i]['perm'] for i in keep.tolist()], dtype=float)
+    area = np.array([data[i]['area'] for i in keep.tolist()], dtype=float)
+    weight = perm * area / length[keep]
+    for i, w in zip(keep.tolist(), weight.tolist()):
+        data[i]['weight'] = w
     return
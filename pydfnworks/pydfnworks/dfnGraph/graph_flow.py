@@ -1,10 +1,13 @@
 import networkx as nx
 import numpy as np
 import sys
+import timeit
 import scipy.sparse
+import scipy.sparse.linalg
 
 # pydfnworks modules
 from pydfnworks.dfnGraph import dfn2graph as d2g
+from pydfnworks.dfnGraph.array_graph import ArrayGraph
 
 
 def get_laplacian_sparse_mat(G,
@@ -51,7 +54,7 @@ def get_laplacian_sparse_mat(G,
     return D, A
 
 
-def prepare_graph_with_attributes(inflow, outflow,G=None):
+def prepare_graph_with_attributes(inflow, outflow, G=None, prune=False):
     """ Create a NetworkX graph, prepare it for flow solve by equipping edges with  attributes, renumber vertices, and tag vertices which are on inlet or outlet
     
     Parameters
@@ -62,11 +65,21 @@ def prepare_graph_with_attributes(inflow, outflow,G=None):
         outflow: string
             name of file containing list of DFN fractures on outflow boundary
 
+        G : NetworkX graph or ArrayGraph
+            optional, graph with source 's' and target 't'. Default is None, in which case the intersection graph is created. An ArrayGraph is prepared by prepare_array_graph
+
+        prune : bool
+            If True, the clusters not connected to the inflow and outflow boundaries and the dead-end branches are removed, see function prune_non_flowing. Default is False
+
     Returns
     -------
         Gtilde : NetworkX graph
+            vertices are numbered from 0 and their label in G is stored in the attribute 'old_label'. If prune is True, Gtilde.graph['isolated_clusters'] lists the labels of the vertices of the removed clusters
     """
 
+    if isinstance(G, ArrayGraph):
+        return prepare_array_graph(G, prune)
+
     if G == None:
         G = d2g.create_intersection_graph(
             inflow, outflow, intersection_file="intersection_list.dat")
@@ -78,7 +91,10 @@ def prepare_graph_with_attributes(inflow, outflow,G=None):
 
     else:
         Gtilde = G
-        
+
+    if prune:
+        Gtilde, clusters = d2g.prune_non_flowing(Gtilde)
+        Gtilde.graph['isolated_clusters'] = [list(c) for c in clusters]
 
     for v in nx.nodes(Gtilde):
         Gtilde.nodes[v]['inletflag'] = False
@@ -101,12 +117,459 @@ def prepare_graph_with_attributes(inflow, outflow,G=None):
     return Gtilde
 
 
-def solve_flow_on_graph(Gtilde, Pin, Pout, fluid_viscosity=8.9e-4):
-    """ Given a NetworkX graph prepared  for flow solve, solve for vertex pressures, and equip edges with attributes (Darcy) flux  and time of travel
+def prepare_array_graph(G, prune=False):
+    """ Prepare an ArrayGraph for flow solve: tag the inlet and outlet vertices, remove source and target, and number the vertices in the sorted order of their labels, see function prepare_graph_with_attributes
 
     Parameters
     ----------
-        Gtilde : NetworkX graph
+        G : ArrayGraph
+            graph with source 's' and target 't', G is not modified
+
+        prune : bool
+            If True, the vertices that cannot carry flow are removed first, see function prune_non_flowing. Default is False
+
+    Returns
+    -------
+        Gtilde : ArrayGraph
+            vertices are labeled 0, 1, ... and their label in G is stored in the column 'old_label'
+    """
+
+    if prune:
+        G, clusters = d2g.prune_non_flowing(G)
+        G.graph['isolated_clusters'] = [list(c) for c in clusters]
+
+    source = G.index('s')
+    target = G.index('t')
+    inlet = np.zeros(G.num_nodes, dtype=bool)
+    outlet = np.zeros(G.num_nodes, dtype=bool)
+    inlet[G.neighbors(source)] = True
+    outlet[G.neighbors(target)] = True
+
+    keep = np.ones(G.num_nodes, dtype=bool)
+    keep[[source, target]] = False
+    keep = np.flatnonzero(keep)
+    if G.labels.dtype != object:
+        keep = keep[np.argsort(G.labels[keep], kind='stable')]
+
+    Gtilde = G.subgraph(keep)
+    Gtilde.set_node_column('inletflag', inlet[keep])
+    Gtilde.set_node_column('outletflag', outlet[keep])
+    Gtilde.set_node_column('old_label', Gtilde.labels, kind=G.label_kind)
+    Gtilde.labels = np.arange(Gtilde.num_nodes)
+    Gtilde.label_kind = 'int'
+    return Gtilde
+
+
+def graph_flow_arrays(Gtilde):
+    """ Gather the vertices and edges of a NetworkX graph prepared for flow solve into arrays
+
+    Parameters
+    ----------
+        Gtilde : NetworkX graph or ArrayGraph
+            obtained from prepare_graph_with_attributes
+
+    Returns
+    -------
+        arrays : dict
+            'nodes' and 'edges' are the lists of vertices and edges of Gtilde. 'u' and 'v' are the indices in 'nodes' of the end points of each edge. 'weight', 'perm', and 'length' are the edge attributes, edges without weight have unit weight. 'inlet' and 'outlet' are boolean arrays marking the inlet and outlet vertices
+
+    Notes
+    -----
+    For an ArrayGraph the columns are used directly, 'nodes' are the vertex indices and 'edges' is None
+    """
+
+    if isinstance(Gtilde, ArrayGraph):
+        weight = Gtilde.edge_data.get('weight')
+        if weight is None:
+            weight = np.ones(Gtilde.num_edges)
+        elif ('edge', 'weight') in Gtilde.present:
+            weight = np.where(Gtilde.present[('edge', 'weight')], weight,
+                              1.0)
+        arrays = {}
+        arrays['nodes'] = np.arange(Gtilde.num_nodes)
+        arrays['edges'] = None
+        arrays['u'] = Gtilde.u
+        arrays['v'] = Gtilde.v
+        arrays['weight'] = np.asarray(weight, dtype=float)
+        arrays['perm'] = np.asarray(Gtilde.edge_data['perm'], dtype=float)
+        arrays['length'] = np.asarray(Gtilde.edge_data['length'], dtype=float)
+        arrays['inlet'] = np.asarray(Gtilde.node_data['inletflag'], dtype=bool)
+        arrays['outlet'] = np.asarray(Gtilde.node_data['outletflag'],
+                                      dtype=bool)
+        return arrays
+
+    nodes = list(nx.nodes(Gtilde))
+    index = {n: i for i, n in enumerate(nodes)}
+    edges = list(nx.edges(Gtilde))
+
+    arrays = {}
+    arrays['nodes'] = nodes
+    arrays['edges'] = edges
+    arrays['u'] = np.array([index[u] for u, v in edges], dtype=np.int64)
+    arrays['v'] = np.array([index[v] for u, v in edges], dtype=np.int64)
+    arrays['weight'] = np.array(
+        [d for u, v, d in Gtilde.edges(data='weight', default=1.0)],
+        dtype=float)
+    arrays['perm'] = np.array([d for u, v, d in Gtilde.edges(data='perm')],
+                              dtype=float)
+    arrays['length'] = np.array(
+        [d for u, v, d in Gtilde.edges(data='length')], dtype=float)
+    arrays['inlet'] = np.array(
+        [d for n, d in Gtilde.nodes(data='inletflag', default=False)],
+        dtype=bool)
+    arrays['outlet'] = np.array(
+        [d for n, d in Gtilde.nodes(data='outletflag', default=False)],
+        dtype=bool)
+    return arrays
+
+
+def assemble_laplacian(num_nodes, u, v, weight, dirichlet):
+    """ Assemble the weighted graph Laplacian L = D - A directly from edge arrays, with the rows of Dirichlet vertices replaced by rows of the identity
+
+    Parameters
+    ----------
+        num_nodes : int
+            number of vertices
+
+        u, v : NumPy arrays
+            indices of the end points of each edge
+
+        weight : NumPy array
+            weight of each edge
+
+        dirichlet : NumPy array
+            boolean array, True for vertices with a prescribed pressure
+
+    Returns
+    -------
+        L : scipy.sparse.csr_matrix
+            Laplacian with boundary conditions applied
+    """
+
+    degree = np.bincount(u, weight, num_nodes) + np.bincount(
+        v, weight, num_nodes)
+    free_u = ~dirichlet[u]
+    free_v = ~dirichlet[v]
+    diagonal = np.where(dirichlet, 1.0, degree)
+    vertices = np.arange(num_nodes)
+
+    rows = np.concatenate((u[free_u], v[free_v], vertices))
+    cols = np.concatenate((v[free_u], u[free_v], vertices))
+    data = np.concatenate((-weight[free_u], -weight[free_v], diagonal))
+    return scipy.sparse.coo_matrix((data, (rows, cols)),
+                                   shape=(num_nodes, num_nodes)).tocsr()
+
+
+def edge_flux(pressure, u, v, perm, length, fluid_viscosity=8.9e-4):
+    """ Compute the (Darcy) flux and travel time of every edge from the vertex pressures
+
+    Parameters
+    ----------
+        pressure : NumPy array
+            vertex pressures
+
+        u, v : NumPy arrays
+            indices of the end points of each edge
+
+        perm : NumPy array
+            permeability of each edge
+
+        length : NumPy array
+            length of each edge
+
+        fluid_viscosity : double
+            optional, in Pa-s, default is for water
+
+    Returns
+    -------
+        flux : NumPy array
+            flux of each edge, zero where the pressure difference is below machine precision
+
+        time : NumPy array
+            travel time of each edge, NaN where there is no flux
+    """
+
+    delta_p = np.abs(pressure[u] - pressure[v])
+    flowing = delta_p > np.spacing(pressure[u])
+    flux = np.zeros(len(u))
+    flux[flowing] = (perm[flowing] /
+                     fluid_viscosity) * delta_p[flowing] / length[flowing]
+    time = np.full(len(u), np.nan)
+    time[flowing] = length[flowing] / flux[flowing]
+    return flux, time
+
+
+def check_solver_options(solver, preconditioner):
+    """ Check the names of the linear solver and preconditioner of the graph flow solve
+
+    Parameters
+    ----------
+        solver : string
+            "direct", "cg", or "bicgstab"
+
+        preconditioner : string
+            "jacobi", "ilu", or "amg"
+
+    Returns
+    -------
+        solver : string
+            solver to be used
+
+        preconditioner : string
+            preconditioner to be used
+
+    Notes
+    -----
+    If pyamg is not installed, "amg" falls back to "jacobi". The incomplete LU factors are not symmetric, so "cg" with "ilu" is run as "bicgstab".
+    """
+
+    if solver not in ["direct", "cg", "bicgstab"]:
+        error = "ERROR: Unknown solver {}\n".format(solver)
+        sys.stderr.write(error)
+        sys.exit(1)
+
+    if solver != "direct" and preconditioner == "amg":
+        try:
+            import pyamg
+        except ImportError:
+            print("--> Warning: pyamg is not available, using jacobi preconditioner")
+            preconditioner = "jacobi"
+
+    if solver != "direct" and preconditioner not in ["jacobi", "ilu", "amg"]:
+        error = "ERROR: Unknown preconditioner {}\n".format(preconditioner)
+        sys.stderr.write(error)
+        sys.exit(1)
+
+    if solver == "cg" and preconditioner == "ilu":
+        print("--> Incomplete LU is not symmetric, using bicgstab")
+        solver = "bicgstab"
+    return solver, preconditioner
+
+
+def build_preconditioner(L_free, preconditioner):
+    """ Build the preconditioner of the reduced graph Laplacian
+
+    Parameters
+    ----------
+        L_free : scipy.sparse.csr_matrix
+            Laplacian restricted to the vertices without a prescribed pressure
+
+        preconditioner : string
+            "jacobi", "ilu", or "amg"
+
+    Returns
+    -------
+        M : scipy.sparse.linalg.LinearOperator or sparse matrix
+            approximate inverse of L_free
+    """
+
+    if preconditioner == "jacobi":
+        M = scipy.sparse.diags(1.0 / L_free.diagonal())
+    elif preconditioner == "ilu":
+        ilu = scipy.sparse.linalg.spilu(L_free.tocsc(),
+                                        drop_tol=1e-5,
+                                        fill_factor=10)
+        M = scipy.sparse.linalg.LinearOperator(L_free.shape, ilu.solve)
+    else:
+        import pyamg
+        M = pyamg.smoothed_aggregation_solver(
+            L_free, symmetry='symmetric').aspreconditioner(cycle='V')
+    return M
+
+
+def krylov_solve(L_free, b, solver, M, tol=1e-10, maxiter=None, x0=None):
+    """ Solve the reduced graph Laplacian system with a preconditioned Krylov method
+
+    Parameters
+    ----------
+        L_free : scipy.sparse.csr_matrix
+            Laplacian restricted to the vertices without a prescribed pressure
+
+        b : NumPy array
+            right hand side
+
+        solver : string
+            "cg" or "bicgstab"
+
+        M : scipy.sparse.linalg.LinearOperator or sparse matrix
+            preconditioner, see function build_preconditioner
+
+        tol : double
+            relative residual tolerance, default is 1e-10
+
+        maxiter : int
+            maximum number of iterations, default is None (scipy default)
+
+        x0 : NumPy array
+            initial guess, default is None
+
+    Returns
+    -------
+        x : NumPy array
+            solution
+
+        iterations : int
+            number of iterations
+    """
+
+    iterations = [0]
+
+    def count(xk):
+        iterations[0] += 1
+
+    krylov = getattr(scipy.sparse.linalg, solver)
+    try:
+        x, status = krylov(L_free,
+                           b,
+                           x0=x0,
+                           rtol=tol,
+                           atol=0.0,
+                           maxiter=maxiter,
+                           M=M,
+                           callback=count)
+    except TypeError:
+        # scipy < 1.12 names the relative tolerance tol
+        iterations[0] = 0
+        x, status = krylov(L_free,
+                           b,
+                           x0=x0,
+                           tol=tol,
+                           atol=0.0,
+                           maxiter=maxiter,
+                           M=M,
+                           callback=count)
+    if status > 0:
+        print("--> Warning: %s did not converge in %d iterations" %
+              (solver, status))
+    return x, iterations[0]
+
+
+def solve_pressure(num_nodes,
+                   u,
+                   v,
+                   weight,
+                   dirichlet,
+                   rhs,
+                   solver="direct",
+                   preconditioner="jacobi",
+                   tol=1e-10,
+                   maxiter=None,
+                   x0=None):
+    """ Solve the graph Laplacian system for vertex pressures with a direct or an iterative solver
+
+    Parameters
+    ----------
+        num_nodes : int
+            number of vertices
+
+        u, v : NumPy arrays
+            indices of the end points of each edge
+
+        weight : NumPy array
+            weight of each edge
+
+        dirichlet : NumPy array
+            boolean array, True for vertices with a prescribed pressure
+
+        rhs : NumPy array
+            prescribed pressure of Dirichlet vertices, zero elsewhere
+
+        solver : string
+            "direct" for a sparse LU factorization (scipy spsolve), "cg" for preconditioned conjugate gradients, or "bicgstab" for preconditioned BiCGSTAB. Default is "direct"
+
+        preconditioner : string
+            preconditioner used with the iterative solvers: "jacobi", "ilu" (incomplete LU), or "amg" (algebraic multigrid, requires pyamg). Default is "jacobi"
+
+        tol : double
+            relative residual tolerance of the iterative solver, default is 1e-10
+
+        maxiter : int
+            maximum number of iterations of the iterative solver, default is None (scipy default)
+
+        x0 : NumPy array
+            initial guess of the vertex pressures for the iterative solver, e.g. a previous solution. Default is None
+
+    Returns
+    -------
+        pressure : NumPy array
+            vertex pressures
+
+        info : dict
+            'solver', 'preconditioner', 'time' (seconds), 'iterations', and relative 'residual' of the solve
+
+    Notes
+    -----
+    The iterative solvers work on the symmetric positive definite system of the vertices without a prescribed pressure. See function check_solver_options for the fall backs of the solver options.
+    """
+
+    solver, preconditioner = check_solver_options(solver, preconditioner)
+
+    info = {"solver": solver, "preconditioner": None}
+    tic = timeit.default_timer()
+
+    if solver == "direct":
+        L = assemble_laplacian(num_nodes, u, v, weight, dirichlet)
+        pressure = scipy.sparse.linalg.spsolve(L, rhs)
+        residual = np.linalg.norm(rhs - L.dot(pressure))
+        info["iterations"] = 1
+        info["residual"] = residual / max(np.linalg.norm(rhs), 1e-300)
+    else:
+        info["preconditioner"] = preconditioner
+        L = assemble_laplacian(num_nodes, u, v, weight,
+                               np.zeros(num_nodes, dtype=bool))
+        free = ~dirichlet
+        L_free = L[free][:, free].tocsr()
+        b = -L[free][:, dirichlet].dot(rhs[dirichlet])
+        M = build_preconditioner(L_free, preconditioner)
+
+        if x0 is not None:
+            x0 = np.asarray(x0, dtype=float)[free]
+        x, iterations = krylov_solve(L_free, b, solver, M, tol, maxiter, x0)
+
+        pressure = np.array(rhs, dtype=float)
+        pressure[free] = x
+        residual = np.linalg.norm(b - L_free.dot(x))
+        info["iterations"] = iterations
+        info["residual"] = residual / max(np.linalg.norm(b), 1e-300)
+
+    info["time"] = timeit.default_timer() - tic
+    print("--> Solver: {}, preconditioner: {}, iterations: {}, residual: {:0.2e}, time: {:0.2f} seconds".format(
+        info["solver"], info["preconditioner"], info["iterations"],
+        info["residual"], info["time"]))
+    return pressure, info
+
+
+def solve_flow_on_arrays(num_nodes,
+                         u,
+                         v,
+                         weight,
+                         perm,
+                         length,
+                         inlet,
+                         outlet,
+                         Pin,
+                         Pout,
+                         fluid_viscosity=8.9e-4,
+                         solver="direct",
+                         preconditioner="jacobi",
+                         tol=1e-10,
+                         maxiter=None,
+                         x0=None):
+    """ Solve for vertex pressures, edge fluxes, and travel times on a graph given as arrays
+
+    Parameters
+    ----------
+        num_nodes : int
+            number of vertices
+
+        u, v : NumPy arrays
+            indices of the end points of each edge
+
+        weight, perm, length : NumPy arrays
+            weight, permeability, and length of each edge
+
+        inlet, outlet : NumPy arrays
+            boolean arrays, True for inlet / outlet vertices
 
         Pin : double
             Value of pressure (in Pa) at inlet
@@ -116,60 +579,340 @@ def solve_flow_on_graph(Gtilde, Pin, Pout, fluid_viscosity=8.9e-4):
         
         fluid_viscosity : double
             optional, in Pa-s, default is for water
+
+        solver, preconditioner, tol, maxiter, x0 :
+            see function solve_pressure
     
     Returns
     -------
-        Gtilde : NetworkX graph 
-            Gtilde is updated with vertex pressures, edge fluxes and travel times
-    """
+        pressure : NumPy array
+            vertex pressures
+
+        flux : NumPy array
+            edge fluxes
 
-    Inlet = [v for v in nx.nodes(Gtilde) if Gtilde.nodes[v]['inletflag']]
-    Outlet = [v for v in nx.nodes(Gtilde) if Gtilde.nodes[v]['outletflag']]
+        time : NumPy array
+            edge travel times, NaN for edges without flux
+
+        info : dict
+            solver report, see function solve_pressure
+    """
 
-    if not set(Inlet).isdisjoint(set(Outlet)):
+    if (inlet & outlet).any():
         error = "Incompatible graph: Vertex connected to both source and target\n"
         sys.stderr.write(error)
         sys.exit(1)
 
-    D, A = get_laplacian_sparse_mat(Gtilde, weight='weight', format='lil')
+    rhs = np.zeros(num_nodes)
+    rhs[inlet] = Pin
+    rhs[outlet] = Pout
 
-    rhs = np.zeros(Gtilde.number_of_nodes())
+    print("Solving sparse system")
+    pressure, info = solve_pressure(num_nodes, u, v, weight, inlet | outlet,
+                                    rhs, solver, preconditioner, tol,
+                                    maxiter, x0)
+    flux, time = edge_flux(pressure, u, v, perm, length, fluid_viscosity)
+    return pressure, flux, time, info
 
-    for v in Inlet:
-        rhs[v] = Pin
-        A[v, :] = 0
-        D[v, v] = 1.0
-    for v in Outlet:
-        rhs[v] = Pout
-        A[v, :] = 0
-        D[v, v] = 1.0
-    L = D - A  # automatically converts to csr when returning L
 
-    print("Solving sparse system")
-    Phat = scipy.sparse.linalg.spsolve(L, rhs)
-    print("Updating graph edges with flow solution")
+def solve_flow_on_graph(Gtilde,
+                        Pin,
+                        Pout,
+                        fluid_viscosity=8.9e-4,
+                        solver="direct",
+                        preconditioner="jacobi",
+                        tol=1e-10,
+                        maxiter=None,
+                        x0=None):
+    """ Given a NetworkX graph prepared  for flow solve, solve for vertex pressures, and equip edges with attributes (Darcy) flux  and time of travel
 
-    for v in nx.nodes(Gtilde):
-        Gtilde.nodes[v]['pressure'] = Phat[v]
-
-    for u, v in nx.edges(Gtilde):
-        delta_p = abs(Gtilde.nodes[u]['pressure'] -
-                      Gtilde.nodes[v]['pressure'])
-        if delta_p > np.spacing(Gtilde.nodes[u]['pressure']):
-            Gtilde.edges[u, v]['flux'] = (
-                Gtilde.edges[u, v]['perm'] / fluid_viscosity
-            ) * abs(Gtilde.nodes[u]['pressure'] -
-                    Gtilde.nodes[v]['pressure']) / Gtilde.edges[u, v]['length']
-            Gtilde.edges[u, v]['time'] = Gtilde.edges[
-                u, v]['length'] / Gtilde.edges[u, v]['flux']
-        else:
-            Gtilde.edges[u, v]['flux'] = 0
+    Parameters
+    ----------
+        Gtilde : NetworkX graph or ArrayGraph
+
+        Pin : double
+            Value of pressure (in Pa) at inlet
+        
+        Pout : double
+            Value of pressure (in Pa) at outlet
+        
+        fluid_viscosity : double
+            optional, in Pa-s, default is for water
 
+        solver, preconditioner, tol, maxiter, x0 :
+            see function solve_pressure, x0 is ordered as the vertices of Gtilde
+    
+    Returns
+    -------
+        Gtilde : NetworkX graph or ArrayGraph
+            Gtilde is updated with vertex pressures, edge fluxes and travel times
+
+    Notes
+    -----
+    Edges without flux are not given a travel time. The solver report is stored in Gtilde.graph['flow_solver']
+    """
+
+    arrays = graph_flow_arrays(Gtilde)
+    pressure, flux, time, info = solve_flow_on_arrays(
+        len(arrays['nodes']), arrays['u'], arrays['v'], arrays['weight'],
+        arrays['perm'], arrays['length'], arrays['inlet'], arrays['outlet'],
+        Pin, Pout, fluid_viscosity, solver, preconditioner, tol, maxiter, x0)
+    Gtilde.graph['flow_solver'] = info
+    set_flow_attributes(Gtilde, arrays, pressure, flux, time)
     print("Graph flow complete")
     return Gtilde
 
 
-def run_graph_flow(self, inflow, outflow, Pin, Pout, fluid_viscosity=8.9e-4, G = None):
+def set_flow_attributes(Gtilde, arrays, pressure, flux, time):
+    """ Equip the vertices of a graph with pressures and its edges with (Darcy) flux and time of travel
+
+    Parameters
+    ----------
+        Gtilde : NetworkX graph or ArrayGraph
+
+        arrays : dict
+            vertices and edges of Gtilde, see function graph_flow_arrays
+
+        pressure : NumPy array
+            vertex pressures
+
+        flux, time : NumPy arrays
+            edge fluxes and travel times, see function edge_flux
+
+    Returns
+    -------
+        None
+
+    Notes
+    -----
+    Edges without flux are not given a travel time. For an ArrayGraph, the columns 'pressure', 'flux', and 'time' are set, 'time' is NaN and marked as absent for edges without flux
+    """
+
+    print("Updating graph edges with flow solution")
+    if isinstance(Gtilde, ArrayGraph):
+        Gtilde.set_node_column('pressure', np.asarray(pressure, dtype=float))
+        Gtilde.set_edge_column('flux', np.asarray(flux, dtype=float))
+        Gtilde.set_edge_column('time',
+                               np.asarray(time, dtype=float),
+                               present=flux > 0)
+        return
+    edges = arrays['edges']
+    nx.set_node_attributes(Gtilde,
+                           dict(zip(arrays['nodes'], pressure.tolist())),
+                           'pressure')
+    nx.set_edge_attributes(Gtilde, dict(zip(edges, flux.tolist())), 'flux')
+    flowing = np.flatnonzero(flux > 0).tolist()
+    nx.set_edge_attributes(Gtilde,
+                           {edges[i]: time[i]
+                            for i in flowing}, 'time')
+
+
+class GraphFlowSystem():
+    """ Graph Laplacian of a graph prepared for flow solve with fixed inlet and outlet vertices. The system is assembled and factorized (or preconditioned) once and reused for any number of inlet and outlet pressures
+
+    Attributes
+    ----------
+        arrays : dict
+            vertices and edges of the graph, see function graph_flow_arrays
+
+        num_nodes : int
+            number of vertices
+
+        free : NumPy array
+            boolean array, True for vertices without a prescribed pressure
+
+        L : scipy.sparse.csr_matrix
+            Laplacian of the graph without boundary conditions
+
+        L_free : scipy.sparse.csr_matrix
+            Laplacian restricted to the free vertices
+
+        coupling : scipy.sparse.csr_matrix
+            block of the Laplacian coupling free vertices to inlet / outlet vertices
+
+        solver, preconditioner : string
+            see function solve_pressure
+
+        factor : scipy.sparse.linalg.SuperLU
+            LU factors of L_free, if solver is "direct"
+
+        M : scipy.sparse.linalg.LinearOperator or sparse matrix
+            preconditioner of L_free, if solver is iterative
+
+        setup_time : double
+            time in seconds to assemble and factorize the system
+    """
+
+    def __init__(self,
+                 Gtilde,
+                 fluid_viscosity=8.9e-4,
+                 solver="direct",
+                 preconditioner="jacobi",
+                 tol=1e-10,
+                 maxiter=None):
+        """ Assemble and factorize the graph Laplacian
+
+        Parameters
+        ----------
+            Gtilde : NetworkX graph
+                obtained from prepare_graph_with_attributes
+
+            fluid_viscosity : double
+                optional, in Pa-s, default is for water
+
+            solver, preconditioner, tol, maxiter :
+                see function solve_pressure
+        """
+
+        tic = timeit.default_timer()
+        self.arrays = graph_flow_arrays(Gtilde)
+        self.num_nodes = len(self.arrays['nodes'])
+        self.fluid_viscosity = fluid_viscosity
+        self.tol = tol
+        self.maxiter = maxiter
+
+        inlet = self.arrays['inlet']
+        outlet = self.arrays['outlet']
+        if (inlet & outlet).any():
+            error = "Incompatible graph: Vertex connected to both source and target\n"
+            sys.stderr.write(error)
+            sys.exit(1)
+        if not inlet.any() or not outlet.any():
+            error = "Incompatible graph: No inlet or no outlet vertices\n"
+            sys.stderr.write(error)
+            sys.exit(1)
+
+        self.solver, self.preconditioner = check_solver_options(
+            solver, preconditioner)
+        self.free = ~(inlet | outlet)
+        self.L = assemble_laplacian(self.num_nodes, self.arrays['u'],
+                                    self.arrays['v'], self.arrays['weight'],
+                                    np.zeros(self.num_nodes, dtype=bool))
+        L_rows = self.L[self.free]
+        self.L_free = L_rows[:, self.free].tocsr()
+        self.coupling = L_rows[:, ~self.free].tocsr()
+
+        self.factor = None
+        self.M = None
+        if self.solver == "direct":
+            self.preconditioner = None
+            self.factor = scipy.sparse.linalg.splu(self.L_free.tocsc())
+        else:
+            self.M = build_preconditioner(self.L_free, self.preconditioner)
+        self.setup_time = timeit.default_timer() - tic
+        print("--> Graph flow system: %d vertices, %d free, setup time: %0.2f seconds" %
+              (self.num_nodes, self.free.sum(), self.setup_time))
+
+    def solve(self, Pin, Pout, x0=None):
+        """ Solve for the vertex pressures for one or several pairs of inlet and outlet pressures
+
+        Parameters
+        ----------
+            Pin : double or array
+                Value(s) of pressure (in Pa) at inlet
+
+            Pout : double or array
+                Value(s) of pressure (in Pa) at outlet, broadcast against Pin
+
+            x0 : NumPy array
+                optional, initial guess of the vertex pressures for the iterative solvers
+
+        Returns
+        -------
+            pressure : NumPy array
+                vertex pressures, shape (num_nodes,) for a single pair and (num_nodes, number of pairs) otherwise
+
+        Notes
+        -----
+        With the direct solver all pairs are solved with the stored factors in a single call. The iterative solvers reuse the preconditioner and use the previous solution as the initial guess of the next pair.
+        """
+
+        Pin, Pout = np.broadcast_arrays(np.asarray(Pin, dtype=float),
+                                        np.asarray(Pout, dtype=float))
+        single = Pin.ndim == 0
+        Pin = np.atleast_1d(Pin)
+        Pout = np.atleast_1d(Pout)
+
+        inlet = self.arrays['inlet'][~self.free]
+        rhs = np.where(inlet[:, None], Pin[None, :], Pout[None, :])
+        b = -self.coupling.dot(rhs)
+
+        if self.solver == "direct":
+            x = self.factor.solve(b)
+        else:
+            x = np.zeros(b.shape)
+            guess = None
+            if x0 is not None:
+                guess = np.asarray(x0, dtype=float)[self.free]
+            for j in range(b.shape[1]):
+                x[:, j], iterations = krylov_solve(self.L_free, b[:, j],
+                                                   self.solver, self.M,
+                                                   self.tol, self.maxiter,
+                                                   guess)
+                guess = x[:, j]
+
+        pressure = np.zeros((self.num_nodes, len(Pin)))
+        pressure[self.free] = x
+        pressure[~self.free] = rhs
+        if single:
+            return pressure[:, 0]
+        return pressure
+
+    def flow_rate(self, pressure):
+        """ Volumetric flow rate through the inlet vertices
+
+        Parameters
+        ----------
+            pressure : NumPy array
+                vertex pressures, as returned by solve
+
+        Returns
+        -------
+            rate : double or NumPy array
+                volumetric flow rate (in m^3/s) into the network for each pressure field
+        """
+
+        residual = self.L.dot(pressure)
+        return residual[self.arrays['inlet']].sum(
+            axis=0) / self.fluid_viscosity
+
+    def update_graph(self, Gtilde, pressure):
+        """ Equip Gtilde with the pressures, fluxes and travel times of a solution
+
+        Parameters
+        ----------
+            Gtilde : NetworkX graph
+                graph used to build the system
+
+            pressure : NumPy array
+                vertex pressures of a single solve
+
+        Returns
+        -------
+            Gtilde : NetworkX graph
+                Gtilde is updated with vertex pressures, edge fluxes and travel times
+        """
+
+        flux, time = edge_flux(pressure, self.arrays['u'], self.arrays['v'],
+                               self.arrays['perm'], self.arrays['length'],
+                               self.fluid_viscosity)
+        set_flow_attributes(Gtilde, self.arrays, pressure, flux, time)
+        return Gtilde
+
+
+def run_graph_flow(self,
+                   inflow,
+                   outflow,
+                   Pin,
+                   Pout,
+                   fluid_viscosity=8.9e-4,
+                   G=None,
+                   solver="direct",
+                   preconditioner="jacobi",
+                   tol=1e-10,
+                   maxiter=None,
+                   x0=None,
+                   prune=False):
     """ Run the graph flow portion of the workflow
 
     Parameters
@@ -192,16 +935,127 @@ def run_graph_flow(self, inflow, outflow, Pin, Pout, fluid_viscosity=8.9e-4, G =
         
         fluid_viscosity : double
             optional, in Pa-s, default is for water
+
+        G : NetworkX graph or ArrayGraph
+            optional, intersection graph of the DFN. Default is None, in which case the graph is created
+
+        solver : string
+            "direct", "cg", or "bicgstab", default is "direct"
+
+        preconditioner : string
+            "jacobi", "ilu", or "amg", used with the iterative solvers. Default is "jacobi"
+
+        tol : double
+            relative residual tolerance of the iterative solver, default is 1e-10
+
+        maxiter : int
+            maximum number of iterations of the iterative solver
+
+        x0 : NumPy array
+            initial guess of the vertex pressures, e.g. the pressures of a previous solve
+
+        prune : bool
+            If True, flow is solved on the flowing subnetwork only, see function prepare_graph_with_attributes. Default is False
     
     Returns
     -------
-        Gtilde : NetworkX graph 
+        Gtilde : NetworkX graph or ArrayGraph
             Grtilde is updated with vertex pressures, edge fluxes and travel times
 
     Notes
     -----
     Information on individual functions in found therein
     """
-    Gtilde = prepare_graph_with_attributes(inflow, outflow, G)
-    Gtilde = solve_flow_on_graph(Gtilde, Pin, Pout, fluid_viscosity)
+    Gtilde = prepare_graph_with_attributes(inflow, outflow, G, prune)
+    Gtilde = solve_flow_on_graph(Gtilde, Pin, Pout, fluid_viscosity, solver,
+                                 preconditioner, tol, maxiter, x0)
     return Gtilde
+
+
+def graph_effective_perm(self,
+                         directions=('x', 'y', 'z'),
+                         Pin=2e6,
+                         Pout=1e6,
+                         fluid_viscosity=8.9e-4,
+                         domain=None,
+                         solver="direct",
+                         preconditioner="jacobi",
+                         tol=1e-10,
+                         maxiter=None):
+    """ Compute the graph-based effective permeability of the DFN in the principal directions
+
+    Parameters
+    ----------
+        self : object
+            DFN Class
+
+        directions : tuple
+            principal directions, any of 'x' (left to right), 'y' (front to back), and 'z' (top to bottom). Default is all three
+
+        Pin : double
+            Value of pressure (in Pa) at inlet
+        
+        Pout : double
+            Value of pressure (in Pa) at outlet
+
+        fluid_viscosity : double
+            optional, in Pa-s, default is for water
+
+        domain : dict
+            optional, domain sizes in x, y, z. Default is None, in which case they are read from params.txt
+
+        solver, preconditioner, tol, maxiter :
+            see function solve_pressure
+
+    Returns
+    -------
+        perm : dict
+            effective permeability (in m^2) of each direction
+
+    Notes
+    -----
+    The intersection graph and its attributes are built once, with the intersections of all boundaries, and only the inlet and outlet vertices are tagged per direction, see function connect_boundaries. The factorization is built once per direction. The effective permeability is k = Q mu L / (A (Pin - Pout)), where Q is the volumetric flow rate through the inlet vertices, L is the length of the domain in the direction of flow and A is the cross section. Results are written to screen.
+    """
+
+    boundaries = {
+        'x': ("left", "right"),
+        'y': ("front", "back"),
+        'z': ("top", "bottom")
+    }
+    if domain is None:
+        from pydfnworks.dfnFlow.mass_balance import get_domain
+        domain = get_domain()
+
+    for direction in directions:
+        if direction not in boundaries:
+            error = "ERROR: Unknown direction {}\n".format(direction)
+            sys.stderr.write(error)
+            sys.exit(1)
+
+    print("\n--> Computing graph-based effective permeability")
+    G = d2g.create_intersection_graph(None,
+                                      None,
+                                      intersection_file="intersection_list.dat",
+                                      boundaries=True)
+    d2g.add_area(G)
+    d2g.add_weight(G)
+    perm = {}
+    for direction in directions:
+        inflow, outflow = boundaries[direction]
+        Gtilde = prepare_graph_with_attributes(inflow,
+                                               outflow,
+                                               G=d2g.connect_boundaries(
+                                                   G, inflow, outflow))
+        system = GraphFlowSystem(Gtilde, fluid_viscosity, solver,
+                                 preconditioner, tol, maxiter)
+        pressure = system.solve(Pin, Pout)
+        rate = system.flow_rate(pressure)
+
+        length = domain[direction]
+        surface = np.prod([domain[d] for d in ['x', 'y', 'z'] if d != direction])
+        pgrad = (Pin - Pout) / length
+        perm[direction] = rate / surface * fluid_viscosity / pgrad
+        print("--> Direction %s (%s to %s): flow rate [m3/s] %e, effective permeability [m2] %e"
+              % (direction, inflow, outflow, rate, perm[direction]))
+    print("--> Complete\n")
+    return perm
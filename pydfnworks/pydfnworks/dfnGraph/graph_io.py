@@ -0,0 +1,702 @@
+"""
+.. module:: graph_io.py
+   :synopsis: compact binary (NPZ / HDF5) storage of the graph representations of a DFN
+
+"""
+
+import networkx as nx
+import numpy as np
+import json
+import os
+import sys
+
+# placeholder for attributes that a vertex or edge does not have
+_missing = object()
+
+# attributes of a NetworkX graph object that are not user data
+_graph_internals = ['graph', '_node', '_adj', '__networkx_cache__']
+
+
+def _json_default(value):
+    """ Convert NumPy scalars and arrays for json.dumps """
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (set, tuple)):
+        return list(value)
+    return str(value)
+
+
+def column_kind(values):
+    """ Determine how a column of attribute values is stored
+
+    Parameters
+    ----------
+        values : list
+            attribute values, _missing where an item does not have the attribute
+
+    Returns
+    -------
+        kind : string
+            'bool', 'int', 'float', 'str', 'label' (mix of int and str), 'tuple<n>' (tuples of length n), or 'json'
+    """
+
+    types = set()
+    lengths = set()
+    for x in values:
+        if x is _missing:
+            continue
+        if isinstance(x, (bool, np.bool_)):
+            types.add('bool')
+        elif isinstance(x, (int, np.integer)):
+            types.add('int')
+        elif isinstance(x, (float, np.floating)):
+            types.add('float')
+        elif isinstance(x, str):
+            types.add('str')
+        elif isinstance(x, tuple):
+            types.add('tuple')
+            lengths.add(len(x))
+        else:
+            types.add('json')
+
+    if len(types) == 0 or types == set(['float']) or types == set(
+        ['int', 'float']):
+        return 'float'
+    if len(types) == 1 and 'tuple' not in types:
+        return types.pop()
+    if types == set(['int', 'str']):
+        return 'label'
+    if types == set(['tuple']) and len(lengths) == 1:
+        return 'tuple%d' % lengths.pop()
+    return 'json'
+
+
+def encode_column(prefix, values, arrays):
+    """ Encode a column of attribute values into NumPy arrays
+
+    Parameters
+    ----------
+        prefix : string
+            name of the column, used as prefix of the array names
+
+        values : list
+            attribute values, _missing where an item does not have the attribute
+
+        arrays : dict
+            the arrays of the column are added to arrays
+
+    Returns
+    -------
+        kind : string
+            see function column_kind
+
+    Notes
+    -----
+    Only the present values are stored. If an item does not have the attribute, the boolean array prefix/present is stored as well.
+    """
+
+    present = np.array([x is not _missing for x in values], dtype=bool)
+    if not present.all():
+        arrays[prefix + '/present'] = present
+        values = [x for x in values if x is not _missing]
+
+    kind = column_kind(values)
+    if kind in ['bool', 'int', 'float']:
+        dtype = {'bool': bool, 'int': np.int64, 'float': float}[kind]
+        arrays[prefix + '/values'] = np.array(values, dtype=dtype)
+    elif kind == 'str':
+        arrays[prefix + '/values'] = np.array(values, dtype=str)
+    elif kind == 'label':
+        is_str = np.array([isinstance(x, str) for x in values], dtype=bool)
+        arrays[prefix + '/is_str'] = is_str
+        arrays[prefix + '/int'] = np.array(
+            [x for x in values if not isinstance(x, str)], dtype=np.int64)
+        arrays[prefix + '/str'] = np.array(
+            [x for x in values if isinstance(x, str)], dtype=str)
+    elif kind.startswith('tuple'):
+        for j in range(int(kind[5:])):
+            arrays[prefix + '/%d/kind' % j] = np.array(
+                encode_column(prefix + '/%d' % j, [x[j] for x in values],
+                              arrays))
+    else:
+        arrays[prefix + '/values'] = np.array(
+            [json.dumps(x, default=_json_default) for x in values], dtype=str)
+    return kind
+
+
+def decode_column(prefix, kind, arrays, size):
+    """ Decode a column of attribute values stored by encode_column
+
+    Parameters
+    ----------
+        prefix : string
+            name of the column
+
+        kind : string
+            see function column_kind
+
+        arrays : dict-like
+            arrays of the file, only the arrays of this column are read
+
+        size : int
+            number of items (vertices or edges)
+
+    Returns
+    -------
+        values : list
+            attribute values, _missing where an item does not have the attribute
+    """
+
+    if prefix + '/present' in arrays:
+        present = read_array(arrays, prefix + '/present')
+    else:
+        present = None
+
+    if kind in ['bool', 'int', 'float', 'str']:
+        values = read_array(arrays, prefix + '/values').tolist()
+    elif kind == 'label':
+        is_str = read_array(arrays, prefix + '/is_str')
+        values = np.empty(len(is_str), dtype=object)
+        values[~is_str] = read_array(arrays, prefix + '/int').tolist()
+        values[is_str] = read_array(arrays, prefix + '/str').tolist()
+        values = values.tolist()
+    elif kind.startswith('tuple'):
+        components = []
+        for j in range(int(kind[5:])):
+            sub_kind = str(read_array(arrays, prefix + '/%d/kind' % j))
+            components.append(
+                decode_column(prefix + '/%d' % j, sub_kind, arrays, None))
+        values = list(zip(*components))
+    else:
+        values = [
+            json.loads(x)
+            for x in read_array(arrays, prefix + '/values').tolist()
+        ]
+
+    if present is None:
+        return values
+    full = [_missing] * size
+    for i, x in zip(np.flatnonzero(present).tolist(), values):
+        full[i] = x
+    return full
+
+
+def read_array(arrays, key, mmap=False):
+    """ Read one array from an opened NPZ or HDF5 file, or a directory of NPY files
+
+    Parameters
+    ----------
+        arrays : NpzFile, h5py.File, or NpyDirectory
+            opened graph file
+
+        key : string
+            name of the array
+
+        mmap : bool
+            If True, a numeric dataset of an HDF5 file that is stored contiguously and uncompressed is memory-mapped instead of read. Default is False
+
+    Returns
+    -------
+        array : NumPy array
+    """
+
+    data = arrays[key]
+    if hasattr(data, 'asstr'):
+        # h5py dataset
+        if mmap and data.ndim > 0 and data.dtype.kind in 'biuf':
+            offset = data.id.get_offset()
+            if offset is not None:
+                return np.memmap(data.file.filename,
+                                 dtype=data.dtype,
+                                 mode='r',
+                                 offset=offset,
+                                 shape=data.shape)
+        if data.dtype.kind in ['O', 'S']:
+            data = data.asstr()
+        data = np.asarray(data[()])
+        if data.dtype == object:
+            data = data.astype(str)
+    return data
+
+
+def graph_to_arrays(G):
+    """ Convert a NetworkX graph to a dictionary of NumPy arrays
+
+    Parameters
+    ----------
+        G : NetworkX graph
+            any graph representation of the DFN
+
+    Returns
+    -------
+        arrays : dict
+            NumPy arrays of vertex labels, edge end points, and attribute columns. The array 'meta' holds the graph attributes and the kind of each column in json format
+
+    Notes
+    -----
+    Edges are stored as the indices 'edges/u' and 'edges/v' of their end points in 'nodes'. Sets of vertices stored as attributes of the graph object, such as B.fractures and B.intersections of the bipartite graph, are stored as boolean masks over the vertices.
+    """
+
+    nodes = list(G.nodes())
+    index = {n: i for i, n in enumerate(nodes)}
+    arrays = {}
+    meta = {
+        'directed': G.is_directed(),
+        'multigraph': G.is_multigraph(),
+        'graph': G.graph,
+        'node_columns': {},
+        'edge_columns': {},
+        'node_sets': []
+    }
+
+    meta['node_kind'] = encode_column('nodes', nodes, arrays)
+
+    node_data = [d for n, d in G.nodes(data=True)]
+    names = []
+    for d in node_data:
+        for key in d:
+            if key not in names:
+                names.append(key)
+    for key in names:
+        meta['node_columns'][key] = encode_column(
+            'node/' + key, [d.get(key, _missing) for d in node_data], arrays)
+
+    edges = list(G.edges(data=True))
+    arrays['edges/u'] = np.array([index[u] for u, v, d in edges],
+                                 dtype=np.int64)
+    arrays['edges/v'] = np.array([index[v] for u, v, d in edges],
+                                 dtype=np.int64)
+    names = []
+    for u, v, d in edges:
+        for key in d:
+            if key not in names:
+                names.append(key)
+    for key in names:
+        meta['edge_columns'][key] = encode_column(
+            'edge/' + key, [d.get(key, _missing) for u, v, d in edges],
+            arrays)
+
+    for key, value in vars(G).items():
+        if key in _graph_internals or not isinstance(value, set):
+            continue
+        mask = np.zeros(len(nodes), dtype=bool)
+        mask[[index[n] for n in value if n in index]] = True
+        arrays['sets/' + key] = mask
+        meta['node_sets'].append(key)
+
+    arrays['meta'] = np.array(json.dumps(meta, default=_json_default))
+    return arrays
+
+
+def arrays_to_graph(arrays, node_attributes=None, edge_attributes=None):
+    """ Build a NetworkX graph from arrays created by graph_to_arrays
+
+    Parameters
+    ----------
+        arrays : dict-like
+            dictionary of arrays or opened NPZ / HDF5 file
+
+        node_attributes : list
+            names of the vertex attributes to load. Default is None, in which case all attributes are loaded
+
+        edge_attributes : list
+            names of the edge attributes to load. Default is None, in which case all attributes are loaded
+
+    Returns
+    -------
+        G : NetworkX graph
+            graph with the graph attributes (including 'representation'), vertices, edges, and the requested attributes
+
+    Notes
+    -----
+    Only the arrays of the requested attributes are read from the file.
+    """
+
+    meta = json.loads(str(read_array(arrays, 'meta')))
+    if meta['multigraph']:
+        G = nx.MultiDiGraph() if meta['directed'] else nx.MultiGraph()
+    else:
+        G = nx.DiGraph() if meta['directed'] else nx.Graph()
+    G.graph.update(meta['graph'])
+
+    u = read_array(arrays, 'edges/u')
+    num_edges = len(u)
+    nodes = decode_column('nodes', meta['node_kind'], arrays, None)
+    num_nodes = len(nodes)
+
+    columns = select_columns(meta['node_columns'], node_attributes)
+    values = [
+        decode_column('node/' + key, meta['node_columns'][key], arrays,
+                      num_nodes) for key in columns
+    ]
+    attribute_dict = select_attribute_dict(columns, arrays, 'node/')
+    if len(columns) > 0:
+        G.add_nodes_from(
+            (n, attribute_dict(columns, row))
+            for n, row in zip(nodes, zip(*values)))
+    else:
+        G.add_nodes_from(nodes)
+
+    u = u.tolist()
+    v = read_array(arrays, 'edges/v').tolist()
+    columns = select_columns(meta['edge_columns'], edge_attributes)
+    values = [
+        decode_column('edge/' + key, meta['edge_columns'][key], arrays,
+                      num_edges) for key in columns
+    ]
+    attribute_dict = select_attribute_dict(columns, arrays, 'edge/')
+    if len(columns) > 0:
+        G.add_edges_from(
+            (nodes[i], nodes[j], attribute_dict(columns, row))
+            for i, j, row in zip(u, v, zip(*values)))
+    else:
+        G.add_edges_from((nodes[i], nodes[j]) for i, j in zip(u, v))
+
+    for key in meta['node_sets']:
+        mask = read_array(arrays, 'sets/' + key)
+        setattr(G, key, set(nodes[i] for i in np.flatnonzero(mask).tolist()))
+    return G
+
+
+def arrays_to_columns(arrays,
+                      node_attributes=None,
+                      edge_attributes=None,
+                      mmap=False):
+    """ Read the vertex labels, edge end points and attribute columns of a graph from arrays created by graph_to_arrays, without building a graph
+
+    Parameters
+    ----------
+        arrays : dict-like
+            dictionary of arrays or opened NPZ / HDF5 file or NpyDirectory
+
+        node_attributes : list
+            names of the vertex attributes to load. Default is None, in which case all attributes are loaded
+
+        edge_attributes : list
+            names of the edge attributes to load. Default is None, in which case all attributes are loaded
+
+        mmap : bool
+            memory-map the numeric arrays of an HDF5 file, see function read_array. Default is False
+
+    Returns
+    -------
+        columns : dict
+            'meta' is the meta entry of the file, with the graph attributes and the column kinds. 'labels' are the vertex labels, 'u' and 'v' the end points of the edges, as indices into 'labels'. 'node' and 'edge' map the names of the requested attributes to their columns
+
+    Notes
+    -----
+    Integer vertex labels, edge end points, and 'bool', 'int', and 'float' columns without missing values are NumPy arrays as stored, so they stay memory-mapped when arrays are memory-mapped. Other columns are decoded into lists, with _missing where an item does not have the attribute, see function decode_column. Sets of vertices stored with the graph are not loaded.
+    """
+
+    meta = json.loads(str(read_array(arrays, 'meta')))
+
+    def column(prefix, kind, size):
+        if kind in ['bool', 'int', 'float'
+                    ] and prefix + '/present' not in arrays:
+            return read_array(arrays, prefix + '/values', mmap)
+        return decode_column(prefix, kind, arrays, size)
+
+    columns = {'meta': meta, 'node': {}, 'edge': {}}
+    columns['labels'] = column('nodes', meta['node_kind'], None)
+    columns['u'] = read_array(arrays, 'edges/u', mmap)
+    columns['v'] = read_array(arrays, 'edges/v', mmap)
+    for where, requested, size in [('node', node_attributes,
+                                    len(columns['labels'])),
+                                   ('edge', edge_attributes,
+                                    len(columns['u']))]:
+        stored = meta[where + '_columns']
+        for key in select_columns(stored, requested):
+            columns[where][key] = column(where + '/' + key, stored[key],
+                                         size)
+    return columns
+
+
+def arrays_to_array_graph(arrays,
+                          node_attributes=None,
+                          edge_attributes=None,
+                          mmap=False):
+    """ Build an ArrayGraph from arrays created by graph_to_arrays
+
+    Parameters
+    ----------
+        arrays : dict-like
+            dictionary of arrays or opened NPZ / HDF5 file or NpyDirectory
+
+        node_attributes : list
+            names of the vertex attributes to load. Default is None, in which case all attributes are loaded
+
+        edge_attributes : list
+            names of the edge attributes to load. Default is None, in which case all attributes are loaded
+
+        mmap : bool
+            memory-map the numeric arrays of an HDF5 file, see function read_array. Default is False
+
+    Returns
+    -------
+        G : ArrayGraph
+            graph with the graph attributes, vertices, edges, and the requested attributes
+
+    Notes
+    -----
+    The columns are read by arrays_to_columns. Columns that are read as NumPy arrays are used as stored, so they stay memory-mapped when arrays are memory-mapped. Decoded columns are encoded as ArrayGraph columns.
+    """
+
+    from pydfnworks.dfnGraph.array_graph import ArrayGraph, encode_values
+
+    columns = arrays_to_columns(arrays, node_attributes, edge_attributes,
+                                mmap)
+    meta = columns['meta']
+    if meta['directed'] or meta['multigraph']:
+        error = "ERROR: ArrayGraph only holds undirected simple graphs\n"
+        sys.stderr.write(error)
+        sys.exit(1)
+
+    def encode(values, kind):
+        if isinstance(values, np.ndarray):
+            return values, kind, None
+        return encode_values(values)
+
+    labels, label_kind, _ = encode(columns['labels'], meta['node_kind'])
+    kinds = {}
+    present = {}
+    data = {'node': {}, 'edge': {}}
+    for where in ['node', 'edge']:
+        stored = meta[where + '_columns']
+        for key, values in columns[where].items():
+            data[where][key], kinds[(where, key)], mask = encode(
+                values, stored[key])
+            if mask is not None:
+                present[(where, key)] = mask
+
+    return ArrayGraph(labels, columns['u'], columns['v'], data['node'],
+                      data['edge'], meta['graph'], label_kind, kinds, present)
+
+
+class NpyDirectory():
+    '''
+    Arrays of a graph stored as one NPY file per array in a directory, see function dump_binary_graph. Arrays are read, or memory-mapped with mmap_mode='r', when they are accessed.
+    '''
+    def __init__(self, path, mmap_mode=None):
+        self.path = path
+        self.mmap_mode = mmap_mode
+
+    def filename(self, key):
+        return os.path.join(self.path, *key.split('/')) + '.npy'
+
+    def __contains__(self, key):
+        return os.path.isfile(self.filename(key))
+
+    def __getitem__(self, key):
+        return np.load(self.filename(key), mmap_mode=self.mmap_mode)
+
+
+def select_attribute_dict(columns, arrays, prefix):
+    """ Select the function that builds the attribute dictionary of a vertex or an edge
+
+    Parameters
+    ----------
+        columns : list
+            names of the loaded columns
+
+        arrays : dict-like
+            arrays of the file
+
+        prefix : string
+            'node/' or 'edge/'
+
+    Returns
+    -------
+        attribute_dict : function
+            maps the column names and the values of one item to its attribute dictionary
+
+    Notes
+    -----
+    Missing values only need to be skipped if one of the columns has missing values.
+    """
+
+    if any(prefix + key + '/present' in arrays for key in columns):
+        return lambda keys, row: {
+            k: x
+            for k, x in zip(keys, row) if x is not _missing
+        }
+    return lambda keys, row: dict(zip(keys, row))
+
+
+def select_columns(available, requested):
+    """ Check the names of requested attribute columns
+
+    Parameters
+    ----------
+        available : dict
+            columns stored in the file
+
+        requested : list
+            requested columns, None for all
+
+    Returns
+    -------
+        columns : list
+            names of the columns to load
+    """
+
+    if requested is None:
+        return list(available)
+    for key in requested:
+        if key not in available:
+            error = "ERROR: Attribute {} is not stored in the graph file\n".format(
+                key)
+            sys.stderr.write(error)
+            sys.exit(1)
+    return list(requested)
+
+
+def dump_binary_graph(self, G, name, file_format="npz", compress=False):
+    """ Write graph out in a compact binary format
+
+    Parameters
+    ----------
+        self : object
+            DFN Class
+
+        G : NetworkX graph
+            NetworkX Graph based on the DFN (fracture, intersection, or bipartite)
+
+        name : string
+             Name of output file (no extension)
+
+        file_format : string
+            "npz" (NumPy, written to name.npz), "hdf5" (requires h5py, written to name.h5), or "npy" (one NumPy file per array, written to the directory name). Default is "npz"
+
+        compress : bool
+            If True, the arrays are compressed. Not available for "npy". Default is False
+
+    Returns
+    -------
+        None
+
+    Notes
+    -----
+    Vertex labels, edge end points and every vertex and edge attribute are stored as arrays, see function graph_to_arrays. The graph can be read with load_binary_graph. Arrays of "npy" directories and uncompressed "hdf5" files can be memory-mapped when loaded.
+    """
+
+    arrays = graph_to_arrays(G)
+    if file_format == "npz":
+        filename = name + ".npz"
+        print("--> Dumping Graph into file: " + filename)
+        if compress:
+            np.savez_compressed(filename, **arrays)
+        else:
+            np.savez(filename, **arrays)
+    elif file_format == "hdf5":
+        import h5py
+        filename = name + ".h5"
+        print("--> Dumping Graph into file: " + filename)
+        options = {}
+        if compress:
+            options['compression'] = 'gzip'
+        with h5py.File(filename, "w") as f:
+            for key, data in arrays.items():
+                if data.dtype.kind == 'U':
+                    data = data.astype(object)
+                    dtype = h5py.string_dtype()
+                else:
+                    dtype = data.dtype
+                if data.ndim == 0:
+                    f.create_dataset(key, data=data, dtype=dtype)
+                else:
+                    f.create_dataset(key, data=data, dtype=dtype, **options)
+    elif file_format == "npy":
+        if compress:
+            error = "ERROR: Compression is not available for the npy format\n"
+            sys.stderr.write(error)
+            sys.exit(1)
+        print("--> Dumping Graph into directory: " + name)
+        for key, data in arrays.items():
+            filename = NpyDirectory(name).filename(key)
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            np.save(filename, data)
+    else:
+        error = "ERROR: Unknown graph file format {}\n".format(file_format)
+        sys.stderr.write(error)
+        sys.exit(1)
+    print("--> Complete")
+
+
+def load_binary_graph(self,
+                      name,
+                      node_attributes=None,
+                      edge_attributes=None,
+                      columns=False,
+                      array_graph=False,
+                      mmap=False):
+    """ Read in graph written by dump_binary_graph
+
+    Parameters
+    ----------
+        self : object
+            DFN Class
+
+        name : string
+             Name of input file, name.npz or name.h5, or of an npy directory. The extension may be omitted
+
+        node_attributes : list
+            names of the vertex attributes to load. Default is None, in which case all attributes are loaded
+
+        edge_attributes : list
+            names of the edge attributes to load. Default is None, in which case all attributes are loaded
+
+        columns : bool
+            If True, the vertex labels, edge end points and attribute columns are returned instead of a NetworkX graph, see function arrays_to_columns. Default is False
+
+        array_graph : bool
+            If True, an ArrayGraph is returned instead of a NetworkX graph, see function arrays_to_array_graph. Default is False
+
+        mmap : bool
+            If True, the numeric columns are memory-mapped instead of read into memory, requires columns=True or array_graph=True. Only npy directories and uncompressed hdf5 files can be memory-mapped, arrays of npz files are always read. Default is False
+
+    Returns
+    -------
+        G : NetworkX graph, ArrayGraph or dict
+            Graph based on the DFN, or its columns
+
+    Notes
+    -----
+    Attributes that are not requested are not read from the file.
+    """
+
+    if name.endswith(".npz") or name.endswith(".h5") or os.path.isdir(name):
+        filename = name
+    elif os.path.isfile(name + ".npz"):
+        filename = name + ".npz"
+    elif os.path.isfile(name + ".h5"):
+        filename = name + ".h5"
+    else:
+        error = "ERROR: Graph file {}.npz or {}.h5 or directory {} not found\n".format(
+            name, name, name)
+        sys.stderr.write(error)
+        sys.exit(1)
+
+    if columns:
+        load = lambda arrays: arrays_to_columns(arrays, node_attributes,
+                                                edge_attributes, mmap)
+    elif array_graph:
+        load = lambda arrays: arrays_to_array_graph(
+            arrays, node_attributes, edge_attributes, mmap)
+    else:
+        load = lambda arrays: arrays_to_graph(arrays, node_attributes,
+                                              edge_attributes)
+
+    print("--> Loading Graph in file: " + filename)
+    if os.path.isdir(filename):
+        G = load(NpyDirectory(filename, 'r' if mmap else None))
+    elif filename.endswith(".npz"):
+        with np.load(filename) as arrays:
+            G = load(arrays)
+    else:
+        import h5py
+        with h5py.File(filename, "r") as arrays:
+            G = load(arrays)
+    print("--> Complete")
+    return G
@@ -15,6 +15,12 @@ import multiprocessing as mp
 
 # pydfnworks modules
 import pydfnworks.dfnGraph.graph_flow
+from pydfnworks.dfnGraph.array_graph import ArrayGraph
+from pydfnworks.dfnGraph import graph_transport_arrays as gta
+
+# graph and transport parameters of a worker process, set once by
+# init_particle_worker so that they are not pickled with every particle
+_worker_data = {}
 
 
 def create_neighbor_list(Gtilde):
@@ -33,6 +39,7 @@ def create_neighbor_list(Gtilde):
     -----
     dict[n]['child'] is a list of vertices downstream to vertex n
     dict[n]['prob'] is a list of probabilities for choosing a downstream node for vertex n
+    dict[n]['alias_prob'] and dict[n]['alias'] are the Walker alias table of dict[n]['prob'], see function alias_table in graph_transport_arrays
     """
 
     nbrs_dict = {}
@@ -57,13 +64,141 @@ def create_neighbor_list(Gtilde):
             nbrs_dict[i]['child'] = node_list
             nbrs_dict[i]['prob'] = np.array(prob_list,
                                             dtype=float) / sum(prob_list)
+            alias_prob, alias = gta.alias_table(nbrs_dict[i]['prob'])
+            nbrs_dict[i]['alias_prob'] = alias_prob.tolist()
+            nbrs_dict[i]['alias'] = alias.tolist()
         else:
             nbrs_dict[i]['child'] = None
             nbrs_dict[i]['prob'] = None
+            nbrs_dict[i]['alias_prob'] = None
+            nbrs_dict[i]['alias'] = None
 
     return nbrs_dict
 
 
+def alias_draw(alias_prob, alias, u):
+    """ Draw an outcome from a Walker alias table
+
+    Parameters
+    ----------
+        alias_prob, alias : lists
+            see function alias_table in graph_transport_arrays
+
+        u : double
+            uniform random number in [0,1)
+
+    Returns
+    -------
+        j : int
+            index of the outcome
+    """
+
+    x = u * len(alias)
+    j = int(x)
+    if x - j < alias_prob[j]:
+        return j
+    return alias[j]
+
+
+class RandomStream():
+    '''
+    Source of uniform random numbers in [0,1) drawn from numpy.random in blocks, so that a particle hop does not call into numpy
+
+    Attributes:
+        * block_size : number of random numbers generated at a time
+        * rng : generator providing random(size), default is numpy.random
+        * transform : optional function applied to every block of uniform random numbers, e.g. scipy.special.erfcinv
+    '''
+    def __init__(self, block_size=10000, rng=numpy.random, transform=None):
+        self.block_size = block_size
+        self.rng = rng
+        self.transform = transform
+        self.block = []
+        self.position = 0
+
+    def random(self):
+        """ Next uniform random number
+
+        Parameters
+        ----------
+            self: object
+
+        Returns
+        -------
+            u : double
+                uniform random number in [0,1), or its image under transform
+        """
+
+        if self.position == len(self.block):
+            block = self.rng.random(self.block_size)
+            if self.transform is not None:
+                block = self.transform(block)
+            self.block = block.tolist()
+            self.position = 0
+        u = self.block[self.position]
+        self.position += 1
+        return u
+
+
+def add_tdrw_coefficients(Gtilde, nbrs_dict, matrix_porosity,
+                          matrix_diffusivity):
+    """ Store the nondimensional matrix diffusion coefficient of every downstream edge in the neighbor list
+
+    Parameters
+    ----------
+        Gtilde: NetworkX graph 
+            obtained from output of graph_flow
+
+        nbrs_dict : dict
+            see function create_neighbor_list
+
+        matrix_porosity: float
+            matrix porosity
+
+        matrix_diffusivity: float
+            matrix diffusivity in m^2/s
+
+    Returns
+    -------
+        None
+
+    Notes
+    -----
+    nbrs_dict[n]['a_nondim'] is a list aligned with nbrs_dict[n]['child'], see function tdrw_coefficient in graph_transport_arrays
+    """
+
+    for i, nbrs in nbrs_dict.items():
+        if nbrs['child'] is None:
+            nbrs['a_nondim'] = None
+            continue
+        perm = np.array([Gtilde.edges[i, v]['perm'] for v in nbrs['child']],
+                        dtype=float)
+        nbrs['a_nondim'] = gta.tdrw_coefficient(perm, matrix_porosity,
+                                                matrix_diffusivity).tolist()
+
+
+def inlet_vertices(Gtilde):
+    """ List the inlet vertices of a graph obtained from graph_flow
+
+    Parameters
+    ----------
+        Gtilde: NetworkX graph 
+            obtained from output of graph_flow
+
+    Returns
+    -------
+        Inlet : list
+            vertices with inletflag True
+    """
+
+    Inlet = [v for v, flag in Gtilde.nodes(data='inletflag') if flag]
+    if len(Inlet) == 0:
+        error = "ERROR: No inlet vertices found in graph\n"
+        sys.stderr.write(error)
+        sys.exit(1)
+    return Inlet
+
+
 class Particle():
     ''' 
     Class for graph particle tracking, instantiated for each particle
@@ -74,7 +209,7 @@ class Particle():
         * tdrw_time : Total advection+diffusion time of travel of particle [s]
         * dist : total distance travelled in advection [m]
         * flag : True if particle exited system, else False
-        * frac_seq : Dictionary, contains information about fractures through which the particle went
+        * frac_seq : Dictionary, contains information about fractures through which the particle went, in order of first visit. frac_seq[frac] holds the 'time', 'tdrw_time' and 'dist' spent in the fracture, summed over all visits
     '''
     def __init__(self):
         self.frac_seq = {}
@@ -103,8 +238,16 @@ class Particle():
         self.tdrw_time = t
         self.dist = L
 
-    def track(self, Gtilde, nbrs_dict, frac_porosity, tdrw_flag,
-              matrix_porosity, matrix_diffusivity):
+    def track(self,
+              Gtilde,
+              nbrs_dict,
+              frac_porosity,
+              tdrw_flag,
+              matrix_porosity,
+              matrix_diffusivity,
+              Inlet=None,
+              stream=None,
+              tdrw_stream=None):
         """ track a particle from inlet vertex to outlet vertex
 
         Parameters
@@ -115,14 +258,33 @@ class Particle():
             nbrs_dict: nested dictionary
                 dictionary of downstream neighbors for each vertex
 
+            Inlet : list
+                inlet vertices, see function inlet_vertices. Default is None, in which case they are found from Gtilde
+
+            stream : object
+                RandomStream providing the uniform random numbers. Default is None, in which case a new stream is created
+
+            tdrw_stream : object
+                RandomStream providing erfcinv of uniform random numbers for the matrix diffusion delay. Default is None, in which case a new stream is created from the generator of stream
+
         Returns
         -------
 
+        Notes
+        -----
+        If nbrs_dict holds the matrix diffusion coefficients of the edges (see function add_tdrw_coefficients), they are not recomputed at every step
         """
 
-        Inlet = [v for v in nx.nodes(Gtilde) if Gtilde.nodes[v]['inletflag']]
+        if Inlet is None:
+            Inlet = inlet_vertices(Gtilde)
+        if stream is None:
+            stream = RandomStream(block_size=100)
+        if tdrw_flag and tdrw_stream is None:
+            tdrw_stream = RandomStream(block_size=100,
+                                       rng=stream.rng,
+                                       transform=scipy.special.erfcinv)
 
-        curr_v = numpy.random.choice(Inlet)
+        curr_v = Inlet[int(stream.random() * len(Inlet))]
 
         while True:
 
@@ -130,24 +292,27 @@ class Particle():
                 self.flag = True
                 break
 
-            if nbrs_dict[curr_v]['child'] is None:
+            nbrs = nbrs_dict[curr_v]
+            if nbrs['child'] is None:
                 self.flag = False
                 break
 
-            next_v = numpy.random.choice(nbrs_dict[curr_v]['child'],
-                                         p=nbrs_dict[curr_v]['prob'])
+            j = alias_draw(nbrs['alias_prob'], nbrs['alias'], stream.random())
+            next_v = nbrs['child'][j]
 
             frac = Gtilde.edges[curr_v, next_v]['frac']
 
             t = Gtilde.edges[curr_v, next_v]['time'] * frac_porosity
 
             if tdrw_flag:
-                a_nondim = matrix_porosity * math.sqrt(
-                    matrix_diffusivity /
-                    (12 * Gtilde.edges[curr_v, next_v]['perm']))
-                xi = numpy.random.random_sample()
-                t_tdrw = t + math.pow(a_nondim * t / scipy.special.erfcinv(xi),
-                                      2)
+                if nbrs.get('a_nondim') is not None:
+                    a_nondim = nbrs['a_nondim'][j]
+                else:
+                    a_nondim = matrix_porosity * math.sqrt(
+                        matrix_diffusivity /
+                        (12 * Gtilde.edges[curr_v, next_v]['perm']))
+                # erfcinv(xi) of a uniform random number xi
+                t_tdrw = t + math.pow(a_nondim * t / tdrw_stream.random(), 2)
             else:
                 t_tdrw = t
 
@@ -175,17 +340,18 @@ class Particle():
         Returns
         -------
 
+        Notes
+        -----
+        Values of a fracture that is visited again are added to those of the earlier visits
         """
 
-        self.frac_seq.update(
-            {frac: {
-                'time': 0.0,
-                'tdrw_time': 0.0,
-                'dist': 0.0
-            }})
-        self.frac_seq[frac]['time'] += t
-        self.frac_seq[frac]['tdrw_time'] += t_tdrw
-        self.frac_seq[frac]['dist'] += L
+        seq = self.frac_seq.get(frac)
+        if seq is None:
+            self.frac_seq[frac] = {'time': t, 'tdrw_time': t_tdrw, 'dist': L}
+        else:
+            seq['time'] += t
+            seq['tdrw_time'] += t_tdrw
+            seq['dist'] += L
         self.time += t
         self.tdrw_time += t_tdrw
         self.dist += L
@@ -281,7 +447,317 @@ def prepare_output_files(partime_file, frac_id_file):
         sys.exit(1)
 
 
-def dump_particle_info(particles, partime_file, frac_id_file):
+class ParticleWriter():
+    '''
+    Class for writing particle information to partime_file and frac_id_file while particles are tracked. Data is buffered and written in blocks, so the files are opened once and the memory used does not depend on the number of particles.
+
+    Attributes:
+        * partime_file : name of file to which the total travel times and lengths are written for each particle
+        * frac_id_file : name of file to which the fractures visited by each particle are written
+        * output_format : "ascii" for the text files written by dfnGraph or "hdf5" for binary files
+        * buffer_size : number of particles buffered before writing
+        * nparticles : number of particles passed to the writer
+        * pfailcount : number of particles that did not exit the domain
+        * frac_totals : number of exited particles visiting each fracture and the time and distance they spent in it, see function fracture_totals in graph_transport_arrays
+        * monitor : optional ConvergenceMonitor to which the travel times of the exited particles are added as they are written, default is None
+
+    Notes
+    -----
+    In the hdf5 format, partime_file holds the dataset 'partime' with one row per particle and the columns of the ascii file. frac_id_file holds the datasets 'frac_offsets' and 'frac_ids', the fractures visited by particle i are frac_ids[frac_offsets[i]:frac_offsets[i+1]], and the datasets 'frac_time', 'frac_tdrw_time', 'frac_dist' aligned with 'frac_ids'. Only particles that exit the domain are written, as in the ascii format.
+    '''
+    def __init__(self,
+                 partime_file,
+                 frac_id_file,
+                 output_format="ascii",
+                 buffer_size=10000):
+        self.partime_file = partime_file
+        self.frac_id_file = frac_id_file
+        self.output_format = output_format
+        self.buffer_size = buffer_size
+        self.nparticles = 0
+        self.pfailcount = 0
+        self.frac_totals = None
+        self.monitor = None
+        self.buffer_partime = []
+        self.buffer_frac = []
+
+        if output_format == "ascii":
+            prepare_output_files(partime_file, frac_id_file)
+            self.f1 = open(partime_file, "a")
+            self.f2 = open(frac_id_file, "a")
+        elif output_format == "hdf5":
+            import h5py
+            try:
+                self.f1 = h5py.File(partime_file, "w")
+                self.f2 = h5py.File(frac_id_file, "w")
+            except:
+                error = "ERROR: Unable to open supplied output files {} and {}\n".format(
+                    partime_file, frac_id_file)
+                sys.stderr.write(error)
+                sys.exit(1)
+            self.f1.create_dataset("partime", (0, 4),
+                                   maxshape=(None, 4),
+                                   dtype=float,
+                                   chunks=(min(buffer_size, 65536), 4))
+            self.f1["partime"].attrs["columns"] = [
+                "advective time (s)", "advection+diffusion time (s)",
+                "diffusion time (s)", "total advection distance covered (m)"
+            ]
+            self.f2.create_dataset("frac_offsets",
+                                   data=np.zeros(1, dtype=np.int64),
+                                   maxshape=(None, ),
+                                   chunks=(min(buffer_size, 65536), ))
+            self.f2.create_dataset("frac_ids", (0, ),
+                                   maxshape=(None, ),
+                                   dtype=np.int64,
+                                   chunks=(65536, ))
+            for key in ["frac_time", "frac_tdrw_time", "frac_dist"]:
+                self.f2.create_dataset(key, (0, ),
+                                       maxshape=(None, ),
+                                       dtype=float,
+                                       chunks=(65536, ))
+        else:
+            error = "ERROR: Unknown output format {}\n".format(output_format)
+            sys.stderr.write(error)
+            sys.exit(1)
+
+    def write_particle(self, particle):
+        """ Buffer the information of a single particle
+
+        Parameters
+        ----------
+            self: object
+
+            particle : object
+                Particle object
+
+        Returns
+        -------
+        """
+
+        self.nparticles += 1
+        if not particle.flag:
+            self.pfailcount += 1
+            return
+
+        self.buffer_partime.append([
+            particle.time, particle.tdrw_time,
+            particle.tdrw_time - particle.time, particle.dist
+        ])
+        self.buffer_frac.append(particle.frac_seq)
+        if len(self.buffer_partime) >= self.buffer_size:
+            self.flush()
+
+    def write_results(self, results):
+        """ Write the information of a chunk of particles from the array based transport engine
+
+        Parameters
+        ----------
+            self: object
+
+            results : dict
+                see function track_particles_batch in graph_transport_arrays
+
+        Returns
+        -------
+        """
+
+        self.flush()
+        flag = results['flag']
+        exited = np.flatnonzero(flag)
+        self.nparticles += len(flag)
+        self.pfailcount += len(flag) - len(exited)
+
+        partime = np.column_stack(
+            (results['time'][exited], results['tdrw_time'][exited],
+             results['tdrw_time'][exited] - results['time'][exited],
+             results['dist'][exited]))
+
+        frac_offsets = results['frac_offsets']
+        counts = frac_offsets[exited + 1] - frac_offsets[exited]
+        # gather the fractures of the exited particles
+        keep = np.repeat(flag, np.diff(frac_offsets))
+        self.write_block(partime, counts, results['frac_ids'][keep],
+                         results['frac_time'][keep],
+                         results['frac_tdrw_time'][keep],
+                         results['frac_dist'][keep])
+
+    def flush(self):
+        """ Write the buffered particles to file
+
+        Parameters
+        ----------
+            self: object
+
+        Returns
+        -------
+        """
+
+        if not self.buffer_partime:
+            return
+        partime = np.array(self.buffer_partime, dtype=float)
+        counts = np.array([len(seq) for seq in self.buffer_frac],
+                          dtype=np.int64)
+        frac_ids = np.array([frac for seq in self.buffer_frac for frac in seq],
+                            dtype=np.int64)
+        values = [
+            np.array([
+                data[key] for seq in self.buffer_frac
+                for data in seq.values()
+            ],
+                     dtype=float) for key in ['time', 'tdrw_time', 'dist']
+        ]
+        self.buffer_partime = []
+        self.buffer_frac = []
+        self.write_block(partime, counts, frac_ids, *values)
+
+    def write_block(self, partime, counts, frac_ids, frac_time,
+                    frac_tdrw_time, frac_dist):
+        """ Write a block of particles to file
+
+        Parameters
+        ----------
+            self: object
+
+            partime : NumPy array
+                one row per particle, advective time, advection+diffusion time, diffusion time, and distance
+
+            counts : NumPy array
+                number of fractures visited by each particle
+
+            frac_ids : NumPy array
+                fractures visited by the particles, in particle order
+
+            frac_time : NumPy array
+                advective time spent by the particles in the fractures, aligned with frac_ids
+
+            frac_tdrw_time : NumPy array
+                advection+diffusion time spent by the particles in the fractures, aligned with frac_ids
+
+            frac_dist : NumPy array
+                distance travelled by the particles in the fractures, aligned with frac_ids
+
+        Returns
+        -------
+        """
+
+        self.frac_totals = gta.fracture_totals(frac_ids, frac_time,
+                                               frac_tdrw_time, frac_dist,
+                                               self.frac_totals)
+        if self.monitor is not None:
+            self.monitor.add(
+                partime[:, 0 if self.monitor.column == 'time' else 1])
+
+        if self.output_format == "ascii":
+            self.f1.write("".join(
+                "{:3.3E} {:3.3E} {:3.3E} {:3.3E} \n".format(*row)
+                for row in partime.tolist()))
+            lines = []
+            start = 0
+            frac_ids = frac_ids.tolist()
+            for n in counts.tolist():
+                lines.append("".join("{:d}  ".format(frac)
+                                     for frac in frac_ids[start:start + n]) +
+                             "\n")
+                start += n
+            self.f2.write("".join(lines))
+        else:
+            dset = self.f1["partime"]
+            n = dset.shape[0]
+            dset.resize((n + len(partime), 4))
+            dset[n:] = partime
+
+            offsets = self.f2["frac_offsets"]
+            n = offsets.shape[0]
+            offsets.resize((n + len(counts), ))
+            offsets[n:] = offsets[n - 1] + np.cumsum(counts)
+
+            for key, value in [("frac_ids", frac_ids),
+                               ("frac_time", frac_time),
+                               ("frac_tdrw_time", frac_tdrw_time),
+                               ("frac_dist", frac_dist)]:
+                dset = self.f2[key]
+                n = dset.shape[0]
+                dset.resize((n + len(value), ))
+                dset[n:] = value
+
+    def fracture_statistics(self):
+        """ Per-fracture statistics of the particles written so far that exited the domain
+
+        Parameters
+        ----------
+            self: object
+
+        Returns
+        -------
+            stats : dict
+                see function fracture_statistics in graph_transport_arrays
+        """
+
+        self.flush()
+        if self.frac_totals is None:
+            return gta.fracture_statistics(
+                gta.fracture_totals(np.zeros(0, dtype=np.int64), [], [], []))
+        return gta.fracture_statistics(self.frac_totals)
+
+    def close(self):
+        """ Flush the buffer and close the files
+
+        Parameters
+        ----------
+            self: object
+
+        Returns
+        -------
+            pfailcount : int 
+                Number of particles that do not exit the domain
+        """
+
+        self.flush()
+        self.f1.close()
+        self.f2.close()
+        return self.pfailcount
+
+
+def load_particle_results(partime_file, frac_id_file=None):
+    """ Load the particle information written by run_graph_transport in the hdf5 format 
+
+        Parameters
+        ----------
+            partime_file : string
+                name of the hdf5 file with the total travel times and lengths of each particle
+
+            frac_id_file : string
+                name of the hdf5 file with the fractures visited by each particle, default is None
+
+        Returns
+        -------
+            results : dict
+                'time', 'tdrw_time', 'dist' arrays for each particle that exited the domain. If frac_id_file is provided 'frac_offsets' and 'frac_ids' hold the fractures visited by each particle, those of particle i are frac_ids[frac_offsets[i]:frac_offsets[i+1]], and 'frac_time', 'frac_tdrw_time', 'frac_dist', if present in the file, hold the time and distance spent in each of these fractures
+        """
+
+    import h5py
+    results = {}
+    with h5py.File(partime_file, "r") as f1:
+        partime = f1["partime"][:]
+    results['time'] = partime[:, 0]
+    results['tdrw_time'] = partime[:, 1]
+    results['dist'] = partime[:, 3]
+    if frac_id_file is not None:
+        with h5py.File(frac_id_file, "r") as f2:
+            for key in [
+                    "frac_offsets", "frac_ids", "frac_time", "frac_tdrw_time",
+                    "frac_dist"
+            ]:
+                if key in f2:
+                    results[key] = f2[key][:]
+    return results
+
+
+def dump_particle_info(particles,
+                       partime_file,
+                       frac_id_file,
+                       output_format="ascii"):
     """ If running graph transport in parallel, this function dumps out all the
         particle information is a single pass rather then opening and closing the
         files for every particle
@@ -290,7 +766,40 @@ def dump_particle_info(particles, partime_file, frac_id_file):
         Parameters
         ----------
             particles : list
-                list of particle objects 
+                list (or iterable) of particle objects 
+
+            partime_file : string
+                name of file to  which the total travel times and lengths will be written for each particle
+
+            frac_id_file : string
+                name of file to which detailed information of each particle's travel will be written
+
+            output_format : string
+                "ascii" or "hdf5", see ParticleWriter. Default is "ascii"
+
+        Returns
+        -------
+            pfailcount : int 
+                Number of particles that do not exit the domain
+
+        """
+
+    writer = ParticleWriter(partime_file, frac_id_file, output_format)
+    for particle in particles:
+        writer.write_particle(particle)
+    return writer.close()
+
+
+def dump_particle_arrays(results,
+                         partime_file,
+                         frac_id_file,
+                         output_format="ascii"):
+    """ Dumps out the particle information produced by the array based transport engine. Output is identical to dump_particle_info
+
+        Parameters
+        ----------
+            results : dict
+                see function track_particles_batch in graph_transport_arrays
 
             partime_file : string
                 name of file to  which the total travel times and lengths will be written for each particle
@@ -298,6 +807,9 @@ def dump_particle_info(particles, partime_file, frac_id_file):
             frac_id_file : string
                 name of file to which detailed information of each particle's travel will be written
 
+            output_format : string
+                "ascii" or "hdf5", see ParticleWriter. Default is "ascii"
+
         Returns
         -------
             pfailcount : int 
@@ -305,48 +817,71 @@ def dump_particle_info(particles, partime_file, frac_id_file):
 
         """
 
-    prepare_output_files(partime_file, frac_id_file)
+    writer = ParticleWriter(partime_file, frac_id_file, output_format)
+    writer.write_results(results)
+    return writer.close()
 
-    f1 = open(partime_file, "a")
-    f2 = open(frac_id_file, "a")
 
-    pfailcount = 0
+def check_convergence(convergence, writer):
+    """ Check whether enough particles have been tracked, see ConvergenceMonitor in transport_statistics
 
-    for particle in particles:
-        if particle.flag:
-            f1.write("{:3.3E} {:3.3E} {:3.3E} {:3.3E} \n".format(
-                particle.time, particle.tdrw_time,
-                particle.tdrw_time - particle.time, particle.dist))
+        Parameters
+        ----------
+            convergence : object
+                ConvergenceMonitor or None
 
-            data1 = [
-                key for key in particle.frac_seq
-                if isinstance(key, dict) is False
-            ]
-            n = len(data1)
+            writer : object
+                ParticleWriter to which the particles are written
+
+        Returns
+        -------
+            stop : bool
+                True if tracking should stop, always False if convergence is None
+        """
+
+    if convergence is None or writer.nparticles < convergence.next_check:
+        return False
+    writer.flush()
+    return convergence.check(writer.nparticles)
 
-            for i in range(n):
-                f2.write("{:d}  ".format(data1[i]))
-            f2.write("\n")
-            # f2.write("{:d}".format(n))
-            # for i in range(0, 4 * n):
-            #     if i < n:
-            #         f2.write("{3:d}  ".format(data1[i]))
-            #     elif n - 1 < i < 2 * n:
-            #         f2.write("{:3.2E}  ".format(
-            #             self.frac_seq[data1[i - n]]['time']))
-            #     elif 2 * n - 1 < i < 3 * n:
-            #         f2.write("{:3.2E}  ".format(
-            #             self.frac_seq[data1[i - 2 * n]]['tdrw_time']))
-            #     else:
-            #         f2.write("{:3.2E}  ".format(
-            #             self.frac_seq[data1[i - 3 * n]]['dist']))
-            # f2.write("\n")
-        else:
-            pfailcount += 1
 
-    f1.close()
-    f2.close()
-    return pfailcount
+def dump_fracture_statistics(frac_stats, frac_stats_file):
+    """ Write the per-fracture statistics of the visited fractures to a text file
+
+        Parameters
+        ----------
+            frac_stats : dict
+                see function fracture_statistics in graph_transport_arrays
+
+            frac_stats_file : string
+                name of the file
+
+        Returns
+        -------
+            None
+        """
+
+    visited = np.flatnonzero(frac_stats['visits'])
+    data = np.column_stack(
+        (visited, frac_stats['visits'][visited],
+         frac_stats['mean_time'][visited],
+         frac_stats['mean_tdrw_time'][visited],
+         frac_stats['mean_dist'][visited]))
+    try:
+        np.savetxt(
+            frac_stats_file,
+            data,
+            fmt=["%d", "%d", "%3.3E", "%3.3E", "%3.3E"],
+            header=
+            "fracture id  number of particles  mean advective time (s)  mean advection+diffusion time (s)  mean advection distance (m)"
+        )
+    except:
+        error = "ERROR: Unable to open supplied frac_stats_file file {}\n".format(
+            frac_stats_file)
+        sys.stderr.write(error)
+        sys.exit(1)
+    print("--> Fracture statistics written to file: {}".format(
+        frac_stats_file))
 
 
 def track_particle(data):
@@ -375,6 +910,15 @@ def track_particle(data):
             matrix_diffusivity: float
                 default is 1e-11 m^2/s
 
+            Inlet : list
+                optional, inlet vertices, see function inlet_vertices
+
+            stream : object
+                optional, RandomStream providing the uniform random numbers
+
+            tdrw_stream : object
+                optional, RandomStream providing erfcinv of uniform random numbers
+
         Returns
         -------
             particle : object
@@ -386,11 +930,71 @@ def track_particle(data):
     particle.set_start_time_dist(0, 0)
     particle.track(data["Gtilde"], data["nbrs_dict"], data["frac_porosity"],
                    data["tdrw_flag"], data["matrix_porosity"],
-                   data["matrix_diffusivity"])
+                   data["matrix_diffusivity"], data.get("Inlet"),
+                   data.get("stream"), data.get("tdrw_stream"))
 
     return particle
 
 
+def init_particle_worker(data):
+    """ Pool initializer, publishes the graph and the transport parameters to a worker process once
+
+        Parameters
+        ----------
+            data : dict
+                see function track_particle
+
+        Returns
+        -------
+            None
+        """
+
+    _worker_data.update(data)
+
+
+def track_particle_block(data, block):
+    """ Tracks a block of particles with the random stream of the block, see function track_particle
+
+        Parameters
+        ----------
+            data : dict
+                see function track_particle, data["entropy"] is the seed of the run, see function random_seed in graph_transport_arrays
+
+            block : tuple
+                (start, stop, block index), see function stream_blocks in graph_transport_arrays
+
+        Returns
+        -------
+            particles : list
+                particle trajectory information of particles start:stop
+        """
+
+    start, stop, b = block
+    block_data = dict(data)
+    rng = gta.block_generator(data["entropy"], b)
+    block_data["stream"] = RandomStream(rng=rng)
+    block_data["tdrw_stream"] = RandomStream(rng=rng,
+                                             transform=scipy.special.erfcinv)
+    return [track_particle(block_data) for i in range(start, stop)]
+
+
+def track_particle_block_worker(block):
+    """ Tracks a block of particles inside a worker process, see function track_particle_block
+
+        Parameters
+        ----------
+            block : tuple
+                (start, stop, block index)
+
+        Returns
+        -------
+            particles : list
+                particle trajectory information 
+        """
+
+    return track_particle_block(_worker_data, block)
+
+
 def run_graph_transport(self,
                         Gtilde,
                         nparticles,
@@ -399,7 +1003,14 @@ def run_graph_transport(self,
                         frac_porosity=1.0,
                         tdrw_flag=False,
                         matrix_porosity=0.02,
-                        matrix_diffusivity=1e-11):
+                        matrix_diffusivity=1e-11,
+                        engine="particle",
+                        chunk_size=None,
+                        output_format="ascii",
+                        seed=None,
+                        first_particle=0,
+                        frac_stats_file=None,
+                        convergence=None):
     """ Run  particle tracking on the given NetworkX graph
 
     Parameters
@@ -407,8 +1018,8 @@ def run_graph_transport(self,
         self : object
             DFN Class
             
-        Gtilde : NetworkX graph 
-            obtained from graph_flow
+        Gtilde : NetworkX graph or ArrayGraph
+            obtained from graph_flow. An ArrayGraph is compiled directly by the array engine and converted to NetworkX for the particle engine
 
         nparticles: int 
             number of particles
@@ -427,69 +1038,153 @@ def run_graph_transport(self,
             default is 0.02
         matrix_diffusivity: float
             default is 1e-11 in SI units
+        engine : string
+            "particle" tracks one Particle object at a time, "array" compiles the graph into NumPy arrays and advances all particles together. Default is "particle"
+        chunk_size : int
+            number of particles tracked and written at a time by the array engine. Default is 4 chunks per processor and at most 100000 particles per chunk
+        output_format : string
+            "ascii" writes text files, "hdf5" writes binary files that can be read with load_particle_results. Default is "ascii"
+        seed : int
+            seed of the random streams. The same seed gives identical output for any number of processors and chunk size. Default is None, in which case a seed is drawn and printed
+        first_particle : int
+            global index of the first particle, a multiple of 1000. Runs with first_particle = 0, m, 2m, ... and the same seed reproduce the particles of a single run. Default is 0
+        frac_stats_file : string
+            name of file to which the number of visiting particles and their mean residence time and distance are written for each visited fracture. Default is None
+        convergence : object
+            ConvergenceMonitor, see transport_statistics. If provided, particles are tracked in batches until the monitored quantiles of the travel time distribution are stable, the wall-clock budget of the monitor is used, or nparticles particles are tracked. The number of particles used and the convergence history are kept in the monitor. Default is None
 
     Returns
     -------
+        frac_stats : dict
+            per-fracture statistics of the particles that exited the domain, arrays indexed by fracture id, see function fracture_statistics in graph_transport_arrays
 
     Notes
     -----
     Information on individual functions is found therein
     """
 
-    nbrs_dict = create_neighbor_list(Gtilde)
+    if engine not in ["particle", "array"]:
+        error = "ERROR: Unknown transport engine {}\n".format(engine)
+        sys.stderr.write(error)
+        sys.exit(1)
+
+    if isinstance(Gtilde, ArrayGraph) and engine == "particle":
+        print("--> Converting ArrayGraph to NetworkX for the particle engine")
+        Gtilde = Gtilde.to_networkx()
+
+    if isinstance(Gtilde, ArrayGraph):
+        # the array engine compiles the graph columns directly
+        nbrs_dict = None
+    else:
+        nbrs_dict = create_neighbor_list(Gtilde)
+        if tdrw_flag:
+            add_tdrw_coefficients(Gtilde, nbrs_dict, matrix_porosity,
+                                  matrix_diffusivity)
 
-    print("--> Creating downstream neighbor list")
+        print("--> Creating downstream neighbor list")
 
-    Inlet = [v for v in nx.nodes(Gtilde) if Gtilde.nodes[v]['inletflag']]
+        Inlet = inlet_vertices(Gtilde)
 
-    pfailcount = 0
     print("--> Starting particle tracking for %d particles" % nparticles)
+    entropy = gta.random_seed(seed)
+    print("--> Random seed: %d" % entropy)
+    blocks = gta.stream_blocks(nparticles, first_particle=first_particle)
+
+    writer = ParticleWriter(partime_file, frac_id_file, output_format)
+    if convergence is not None:
+        print("--> Tracking until the travel time quantiles converge, at most %d particles"
+              % nparticles)
+        convergence.start()
+        writer.monitor = convergence
+        # chunks of one batch, so that the checks do not depend on ncpu
+        if chunk_size is None:
+            chunk_size = convergence.batch_size
+
+    if engine == "array":
+        print("--> Compiling graph into arrays")
+        arrays = gta.compile_transport_arrays(Gtilde, nbrs_dict)
+        if self.ncpu > 1:
+            print("--> Using %d processors" % self.ncpu)
+        chunks = gta.track_particle_chunks(arrays, nparticles, self.ncpu,
+                                           chunk_size, frac_porosity,
+                                           tdrw_flag, matrix_porosity,
+                                           matrix_diffusivity, entropy,
+                                           first_particle)
+        for results in chunks:
+            writer.write_results(results)
+            print("--> Tracked %d particles out of %d" %
+                  (writer.nparticles, nparticles))
+            if check_convergence(convergence, writer):
+                break
+        # stops the workers if tracking stopped early
+        chunks.close()
+        print("--> Tracking Complete")
 
-    if self.ncpu > 1:
+    elif self.ncpu > 1:
         print("--> Using %d processors" % self.ncpu)
-        mp_input = []
-        for i in range(nparticles):
-
-            data = {}
-            data["Gtilde"] = Gtilde
-            data["nbrs_dict"] = nbrs_dict
-            data["frac_porosity"] = frac_porosity
-            data["tdrw_flag"] = tdrw_flag
-            data["matrix_porosity"] = matrix_porosity
-            data["matrix_diffusivity"] = matrix_diffusivity
-            #data["partime_file"] = partime_file
-            #data["frac_id_file"] = frac_id_file
-            mp_input.append(data)
-
-        pool = mp.Pool(self.ncpu)
-        particles = pool.map(track_particle, mp_input)
+        data = {}
+        data["Gtilde"] = Gtilde
+        data["nbrs_dict"] = nbrs_dict
+        data["frac_porosity"] = frac_porosity
+        data["tdrw_flag"] = tdrw_flag
+        data["matrix_porosity"] = matrix_porosity
+        data["matrix_diffusivity"] = matrix_diffusivity
+        data["Inlet"] = Inlet
+        data["entropy"] = entropy
+
+        # the graph is sent to each worker once rather than with every particle
+        pool = mp.Pool(self.ncpu,
+                       initializer=init_particle_worker,
+                       initargs=(data, ))
+        if convergence is None:
+            tasks = max(1, len(blocks) // (4 * self.ncpu))
+        else:
+            tasks = 1
+        # particles are written as they are returned rather than kept in memory
+        for particles in pool.imap(track_particle_block_worker,
+                                   blocks,
+                                   chunksize=tasks):
+            for particle in particles:
+                writer.write_particle(particle)
+            if check_convergence(convergence, writer):
+                # discard the blocks still being tracked
+                pool.terminate()
+                break
         pool.close()
         pool.join()
         pool.terminate()
         print("--> Tracking Complete")
-        print("--> Writing Data to files: {} and {}".format(
-            partime_file, frac_id_file))
-        dump_particle_info(particles, partime_file, frac_id_file)
-        print("--> Writing Data Complete")
 
     else:
-        prepare_output_files(partime_file, frac_id_file)
-        for i in range(nparticles):
-            if i % 1000 == 0:
-                print("--> Starting particle %d out of %d" % (i, nparticles))
-            particle_i = Particle()
-            particle_i.set_start_time_dist(0, 0)
-            particle_i.track(Gtilde, nbrs_dict, frac_porosity, tdrw_flag,
-                             matrix_porosity, matrix_diffusivity)
-
-            if particle_i.flag:
-                particle_i.write_file(partime_file, frac_id_file)
-            else:
-                pfailcount += 1
+        for start, stop, b in blocks:
+            print("--> Starting particle %d out of %d" % (start, nparticles))
+            rng = gta.block_generator(entropy, b)
+            stream = RandomStream(rng=rng)
+            tdrw_stream = RandomStream(rng=rng,
+                                       transform=scipy.special.erfcinv)
+            for i in range(start, stop):
+                particle_i = Particle()
+                particle_i.set_start_time_dist(0, 0)
+                particle_i.track(Gtilde, nbrs_dict, frac_porosity, tdrw_flag,
+                                 matrix_porosity, matrix_diffusivity, Inlet,
+                                 stream, tdrw_stream)
+                writer.write_particle(particle_i)
+            if check_convergence(convergence, writer):
+                break
+
+    if convergence is not None:
+        convergence.finish(writer.nparticles)
+    ntracked = writer.nparticles
+    frac_stats = writer.fracture_statistics()
+    pfailcount = writer.close()
+    print("--> Data written to files: {} and {}".format(
+        partime_file, frac_id_file))
+    if frac_stats_file is not None:
+        dump_fracture_statistics(frac_stats, frac_stats_file)
 
     if pfailcount == 0:
         print("--> All particles exited")
     else:
         print("--> Out of {} particles, {} particles did not exit".format(
-            nparticles, pfailcount))
-    return
+            ntracked, pfailcount))
+    return frac_stats
@@ -0,0 +1,885 @@
+"""
+.. module:: graph_transport_arrays.py
+   :synopsis: array-backed particle tracking on a pipe network representation of a DFN
+
+"""
+
+import networkx as nx
+import numpy as np
+import numpy.random
+import sys
+import scipy.special
+import scipy.sparse
+import multiprocessing as mp
+
+from pydfnworks.dfnGraph.array_graph import ArrayGraph
+
+# graph arrays and transport parameters of a worker process, set once by
+# init_transport_worker so that they are not pickled with every task
+_worker_data = {}
+
+
+def compile_transport_arrays(Gtilde, nbrs_dict=None):
+    """ Compile the graph obtained from graph_flow and its downstream neighbor list into flat NumPy arrays
+
+    Parameters
+    ----------
+        Gtilde : NetworkX graph or ArrayGraph
+            obtained from graph_flow
+
+        nbrs_dict : dict
+            see function create_neighbor_list, not used for an ArrayGraph
+
+    Returns
+    -------
+        arrays : dict
+            dictionary of NumPy arrays describing the downstream graph
+
+    Notes
+    -----
+    The downstream edges are stored in compressed sparse row (CSR) format. Vertex i is the i-th vertex of Gtilde and its downstream edges occupy the slots arrays['offsets'][i]:arrays['offsets'][i+1] of the arrays 'child', 'alias_prob', 'alias', 'time', 'length', 'perm', and 'frac'. 'alias_prob' and 'alias' hold the Walker alias table of each vertex, with 'alias' given as slot indices. 'inlet' is the list of inlet vertices and 'outletflag' is True for the outlet vertices.
+    An ArrayGraph is compiled from its columns, see function compile_array_graph
+    """
+
+    if isinstance(Gtilde, ArrayGraph):
+        return compile_array_graph(Gtilde)
+
+    nodes = list(nx.nodes(Gtilde))
+    index = {v: i for i, v in enumerate(nodes)}
+    num_nodes = len(nodes)
+
+    degree = np.zeros(num_nodes, dtype=np.int64)
+    child = []
+    alias_prob = []
+    alias = []
+    time = []
+    length = []
+    perm = []
+    frac = []
+
+    for i, v in enumerate(nodes):
+        if v not in nbrs_dict or nbrs_dict[v]['child'] is None:
+            continue
+        degree[i] = len(nbrs_dict[v]['child'])
+        if nbrs_dict[v].get('alias') is None:
+            keep, other = alias_table(nbrs_dict[v]['prob'])
+        else:
+            keep = nbrs_dict[v]['alias_prob']
+            other = nbrs_dict[v]['alias']
+        alias_prob.extend(keep)
+        alias.extend(len(child) + np.asarray(other))
+        for w in nbrs_dict[v]['child']:
+            edge = Gtilde.edges[v, w]
+            child.append(index[w])
+            # edges without flux are never chosen (zero probability)
+            time.append(edge.get('time', 0.0))
+            length.append(edge['length'])
+            perm.append(edge['perm'])
+            frac.append(edge['frac'])
+
+    offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(degree)
+
+    arrays = {}
+    arrays['offsets'] = offsets
+    arrays['child'] = np.array(child, dtype=np.int64)
+    arrays['alias_prob'] = np.array(alias_prob, dtype=float)
+    arrays['alias'] = np.array(alias, dtype=np.int64)
+    arrays['time'] = np.array(time, dtype=float)
+    arrays['length'] = np.array(length, dtype=float)
+    arrays['perm'] = np.array(perm, dtype=float)
+    arrays['frac'] = np.array(frac, dtype=np.int64)
+    arrays['inlet'] = np.array(
+        [index[v] for v in nodes if Gtilde.nodes[v]['inletflag']],
+        dtype=np.int64)
+    arrays['outletflag'] = np.array(
+        [Gtilde.nodes[v]['outletflag'] for v in nodes], dtype=bool)
+    return arrays
+
+
+def compile_array_graph(Gtilde):
+    """ Compile an ArrayGraph obtained from graph_flow into the arrays of compile_transport_arrays without building a neighbor list
+
+    Parameters
+    ----------
+        Gtilde : ArrayGraph
+            obtained from graph_flow
+
+    Returns
+    -------
+        arrays : dict
+            see function compile_transport_arrays
+
+    Notes
+    -----
+    An edge is downstream of vertex i if the pressure drop from i is larger than the spacing of the pressure of i, as in create_neighbor_list. Outlet vertices have no downstream edges. The downstream edges of a vertex are in the order of the adjacency of Gtilde
+    """
+
+    num_nodes = Gtilde.num_nodes
+    pressure = Gtilde.node_data['pressure']
+    outletflag = np.asarray(Gtilde.node_data['outletflag'], dtype=bool)
+
+    offsets, neighbors, edges = Gtilde.adjacency()
+    source = np.repeat(np.arange(num_nodes), np.diff(offsets))
+    down = (pressure[source] - pressure[neighbors] >
+            np.spacing(pressure[source])) & ~outletflag[source]
+    source = source[down]
+    child = neighbors[down]
+    edges = edges[down]
+
+    degree = np.bincount(source, minlength=num_nodes)
+    offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(degree)
+
+    flux = Gtilde.edge_data['flux'][edges]
+    prob = flux / np.bincount(source, weights=flux, minlength=num_nodes)[source]
+
+    # alias tables, trivial for vertices with a single downstream edge
+    alias_prob = np.ones(len(child))
+    alias = np.arange(len(child))
+    for i in np.flatnonzero(degree > 1).tolist():
+        lo = offsets[i]
+        hi = offsets[i + 1]
+        keep, other = alias_table(prob[lo:hi])
+        alias_prob[lo:hi] = keep
+        alias[lo:hi] = lo + other
+
+    time = np.nan_to_num(Gtilde.edge_data['time'][edges], nan=0.0)
+
+    arrays = {}
+    arrays['offsets'] = offsets
+    arrays['child'] = child
+    arrays['alias_prob'] = alias_prob
+    arrays['alias'] = alias
+    arrays['time'] = time
+    arrays['length'] = np.asarray(Gtilde.edge_data['length'],
+                                  dtype=float)[edges]
+    arrays['perm'] = np.asarray(Gtilde.edge_data['perm'], dtype=float)[edges]
+    arrays['frac'] = np.asarray(Gtilde.edge_data['frac'],
+                                dtype=np.int64)[edges]
+    arrays['inlet'] = np.flatnonzero(Gtilde.node_data['inletflag'])
+    arrays['outletflag'] = outletflag
+    return arrays
+
+
+def alias_table(prob):
+    """ Build the Walker alias table of a discrete probability distribution (Vose's method)
+
+    Parameters
+    ----------
+        prob : NumPy array
+            probabilities of the outcomes, sum to one
+
+    Returns
+    -------
+        alias_prob : NumPy array
+            probability of keeping outcome j when column j is drawn
+
+        alias : NumPy array
+            outcome chosen instead of j with probability 1 - alias_prob[j]
+
+    Notes
+    -----
+    Outcome j is drawn in O(1) from a single uniform random number u in [0,1): with x = u * n and j = int(x), the outcome is j if x - j < alias_prob[j] and alias[j] otherwise, see function alias_draw in graph_transport
+    """
+
+    n = len(prob)
+    scaled = np.asarray(prob, dtype=float) * n
+    alias_prob = np.ones(n)
+    alias = np.arange(n)
+    small = [j for j in range(n) if scaled[j] < 1.0]
+    large = [j for j in range(n) if scaled[j] >= 1.0]
+    while small and large:
+        j = small.pop()
+        k = large[-1]
+        alias_prob[j] = scaled[j]
+        alias[j] = k
+        scaled[k] -= 1.0 - scaled[j]
+        if scaled[k] < 1.0:
+            large.pop()
+            small.append(k)
+    # left over columns are full up to round off
+    return alias_prob, alias
+
+
+def tdrw_coefficient(perm, matrix_porosity, matrix_diffusivity):
+    """ Nondimensional matrix diffusion coefficient of the time domain random walk for edges of given permeability
+
+    Parameters
+    ----------
+        perm : NumPy array
+            permeability of the edges
+
+        matrix_porosity: float
+            matrix porosity
+
+        matrix_diffusivity: float
+            matrix diffusivity in m^2/s
+
+    Returns
+    -------
+        a_nondim : NumPy array
+            matrix_porosity * sqrt(matrix_diffusivity / (12 perm)). The advection+diffusion time of an edge with advective time t is t + (a_nondim t / erfcinv(xi))^2, xi uniform in [0,1)
+    """
+
+    return matrix_porosity * np.sqrt(matrix_diffusivity /
+                                     (12 * np.asarray(perm, dtype=float)))
+
+
+def draw_downstream(arrays, curr, xi):
+    """ Choose a downstream edge for every vertex in curr from the alias tables
+
+    Parameters
+    ----------
+        arrays : dict
+            see function compile_transport_arrays
+
+        curr : NumPy array
+            current vertex of each particle, every vertex must have at least one downstream edge
+
+        xi : NumPy array
+            uniform random numbers in [0,1), one per particle
+
+    Returns
+    -------
+        slot : NumPy array
+            index of the chosen edge in the CSR arrays
+
+    Notes
+    -----
+    Each draw takes a constant number of operations, see function alias_draw in graph_transport
+    """
+
+    start = arrays['offsets'][curr]
+    degree = arrays['offsets'][curr + 1] - start
+    x = xi * degree
+    column = np.minimum(x.astype(np.int64), degree - 1)
+    slot = start + column
+    keep = (x - column) < arrays['alias_prob'][slot]
+    return np.where(keep, slot, arrays['alias'][slot])
+
+
+def track_particles_batch(arrays,
+                          nparticles,
+                          frac_porosity=1.0,
+                          tdrw_flag=False,
+                          matrix_porosity=0.02,
+                          matrix_diffusivity=1e-11,
+                          rng=numpy.random):
+    """ Track a batch of particles from inlet vertices to outlet vertices, advancing all particles that are still moving by one edge per iteration
+
+    Parameters
+    ----------
+        arrays : dict
+            see function compile_transport_arrays
+
+        nparticles : int
+            number of particles
+
+        frac_porosity: float
+            porosity of fracture, default is 1.0
+
+        tdrw_flag : Bool
+            if False, matrix_porosity, matrix_diffusivity are ignored
+
+        matrix_porosity: float
+            default is 0.02
+
+        matrix_diffusivity: float
+            default is 1e-11 m^2/s
+
+        rng : object
+            source of uniform random numbers providing random(size), default is numpy.random
+
+    Returns
+    -------
+        results : dict
+            'time', 'tdrw_time', and 'dist' are arrays with the total advective time [s], advection+diffusion time [s], and distance [m] of each particle. 'flag' is True if the particle exited the system. 'frac_ids' holds the fractures visited by each particle in order of first visit and the fractures of particle i are frac_ids[frac_offsets[i]:frac_offsets[i+1]]. 'frac_time', 'frac_tdrw_time', and 'frac_dist' are aligned with 'frac_ids' and hold the time and distance the particle spent in the fracture, summed over all visits. Together with 'frac_offsets' they form a sparse particle x fracture matrix in CSR format, see function particle_fracture_matrix
+
+    Notes
+    -----
+    Produces the same statistics as Particle.track.
+    If arrays holds 'a_nondim', the matrix diffusion coefficient of every edge computed by tdrw_coefficient with the same matrix_porosity and matrix_diffusivity, it is used instead of being recomputed
+    """
+
+    inlet = arrays['inlet']
+    if len(inlet) == 0:
+        error = "ERROR: No inlet vertices found in graph\n"
+        sys.stderr.write(error)
+        sys.exit(1)
+
+    offsets = arrays['offsets']
+    outletflag = arrays['outletflag']
+    if tdrw_flag:
+        if 'a_nondim' in arrays:
+            a_nondim = arrays['a_nondim']
+        else:
+            a_nondim = tdrw_coefficient(arrays['perm'], matrix_porosity,
+                                        matrix_diffusivity)
+
+    time = np.zeros(nparticles)
+    tdrw_time = np.zeros(nparticles)
+    dist = np.zeros(nparticles)
+    flag = np.zeros(nparticles, dtype=bool)
+
+    hop_particle = []
+    hop_frac = []
+    hop_values = ([], [], [])
+
+    live = np.arange(nparticles)
+    curr = inlet[(rng.random(nparticles) * len(inlet)).astype(np.int64)]
+
+    while live.size > 0:
+        exited = outletflag[curr]
+        flag[live[exited]] = True
+        moving = ~exited & (offsets[curr] < offsets[curr + 1])
+        live = live[moving]
+        curr = curr[moving]
+        if live.size == 0:
+            break
+
+        slot = draw_downstream(arrays, curr, rng.random(live.size))
+
+        t = arrays['time'][slot] * frac_porosity
+        if tdrw_flag:
+            xi = rng.random(live.size)
+            t_tdrw = t + (a_nondim[slot] * t / scipy.special.erfcinv(xi))**2
+        else:
+            t_tdrw = t
+
+        L = arrays['length'][slot]
+        time[live] += t
+        tdrw_time[live] += t_tdrw
+        dist[live] += L
+        hop_particle.append(live)
+        hop_frac.append(arrays['frac'][slot])
+        for values, value in zip(hop_values, (t, t_tdrw, L)):
+            values.append(value)
+        curr = arrays['child'][slot]
+
+    frac_offsets, frac_ids, frac_values = fracture_sequences(
+        hop_particle, hop_frac, nparticles, hop_values)
+
+    results = {}
+    results['time'] = time
+    results['tdrw_time'] = tdrw_time
+    results['dist'] = dist
+    results['flag'] = flag
+    results['frac_offsets'] = frac_offsets
+    results['frac_ids'] = frac_ids
+    results['frac_time'] = frac_values[0]
+    results['frac_tdrw_time'] = frac_values[1]
+    results['frac_dist'] = frac_values[2]
+    return results
+
+
+def fracture_sequences(hop_particle, hop_frac, nparticles, hop_values=None):
+    """ Reduce the per-hop records of a batch to the list of fractures visited by each particle in order of first visit
+
+    Parameters
+    ----------
+        hop_particle : list
+            list of arrays of particle indices, one array per hop
+
+        hop_frac : list
+            list of arrays of fracture ids, one array per hop
+
+        nparticles : int
+            number of particles in the batch
+
+        hop_values : tuple
+            tuple of lists of arrays aligned with hop_frac, e.g. the lists of times, tdrw times and lengths of the hops. Default is None
+
+    Returns
+    -------
+        frac_offsets : NumPy array
+            fractures of particle i are frac_ids[frac_offsets[i]:frac_offsets[i+1]]
+
+        frac_ids : NumPy array
+            fracture ids
+
+        frac_values : list
+            one array per entry of hop_values, aligned with frac_ids and summed over all the hops of a particle in a fracture. Empty if hop_values is None
+    """
+
+    if hop_values is None:
+        hop_values = ()
+    if hop_particle:
+        particle = np.concatenate(hop_particle)
+        frac = np.concatenate(hop_frac)
+        values = [np.concatenate(value) for value in hop_values]
+    else:
+        particle = np.zeros(0, dtype=np.int64)
+        frac = np.zeros(0, dtype=np.int64)
+        values = [np.zeros(0) for value in hop_values]
+
+    # group hops by particle, keeping the order of the hops
+    order = np.argsort(particle, kind='stable')
+    particle = particle[order]
+    frac = frac[order]
+
+    # keep the first visit of each fracture and sum the values of all visits
+    frac_values = values
+    if frac.size > 0:
+        key = particle * (frac.max() + 1) + frac
+        _, first, inverse = np.unique(key,
+                                      return_index=True,
+                                      return_inverse=True)
+        visit_order = np.argsort(first)
+        frac_values = [
+            np.bincount(inverse.ravel(), weights=value[order])[visit_order]
+            for value in values
+        ]
+        first = first[visit_order]
+        particle = particle[first]
+        frac = frac[first]
+
+    frac_offsets = np.zeros(nparticles + 1, dtype=np.int64)
+    frac_offsets[1:] = np.cumsum(np.bincount(particle, minlength=nparticles))
+    return frac_offsets, frac, frac_values
+
+
+def particle_fracture_matrix(results, key='time', nfrac=None):
+    """ Sparse particle x fracture matrix of the time or distance each particle spent in each fracture
+
+    Parameters
+    ----------
+        results : dict
+            see function track_particles_batch
+
+        key : string
+            'time', 'tdrw_time', or 'dist'. Default is 'time'
+
+        nfrac : int
+            number of columns, default is the largest fracture id + 1
+
+    Returns
+    -------
+        matrix : SciPy sparse csr matrix
+            entry (i, f) is the value of particle i in fracture f
+    """
+
+    frac_ids = results['frac_ids']
+    if nfrac is None:
+        nfrac = int(frac_ids.max()) + 1 if frac_ids.size > 0 else 0
+    nparticles = len(results['frac_offsets']) - 1
+    return scipy.sparse.csr_matrix(
+        (results['frac_' + key], frac_ids, results['frac_offsets']),
+        shape=(nparticles, nfrac))
+
+
+def fracture_totals(frac_ids, frac_time, frac_tdrw_time, frac_dist,
+                    totals=None):
+    """ Accumulate the number of particles visiting each fracture and the time and distance they spent in it
+
+    Parameters
+    ----------
+        frac_ids : NumPy array
+            fractures visited by the particles, each fracture at most once per particle
+
+        frac_time : NumPy array
+            advective time spent in the fracture, aligned with frac_ids
+
+        frac_tdrw_time : NumPy array
+            advection+diffusion time spent in the fracture, aligned with frac_ids
+
+        frac_dist : NumPy array
+            distance travelled in the fracture, aligned with frac_ids
+
+        totals : dict
+            totals of previous particles, to which the new particles are added. Default is None
+
+    Returns
+    -------
+        totals : dict
+            'visits', 'time', 'tdrw_time', and 'dist' arrays indexed by fracture id
+    """
+
+    frac_ids = np.asarray(frac_ids, dtype=np.int64)
+    nfrac = int(frac_ids.max()) + 1 if frac_ids.size > 0 else 0
+    if totals is not None:
+        nfrac = max(nfrac, len(totals['visits']))
+
+    new = {}
+    new['visits'] = np.bincount(frac_ids, minlength=nfrac)
+    new['time'] = np.bincount(frac_ids, weights=frac_time, minlength=nfrac)
+    new['tdrw_time'] = np.bincount(frac_ids,
+                                   weights=frac_tdrw_time,
+                                   minlength=nfrac)
+    new['dist'] = np.bincount(frac_ids, weights=frac_dist, minlength=nfrac)
+    if totals is not None:
+        for key in new:
+            new[key][:len(totals[key])] += totals[key]
+    return new
+
+
+def fracture_statistics(totals):
+    """ Per-fracture statistics from the totals accumulated by fracture_totals
+
+    Parameters
+    ----------
+        totals : dict
+            see function fracture_totals
+
+    Returns
+    -------
+        stats : dict
+            the totals and 'mean_time', 'mean_tdrw_time', 'mean_dist', the mean residence time and distance of the particles visiting each fracture. The means are NaN for fractures without visits
+    """
+
+    stats = dict(totals)
+    visits = totals['visits']
+    for key in ['time', 'tdrw_time', 'dist']:
+        mean = np.full(len(visits), np.nan)
+        np.divide(totals[key], visits, out=mean, where=visits > 0)
+        stats['mean_' + key] = mean
+    return stats
+
+
+def merge_results(results_list):
+    """ Merge the results of consecutive batches of particles into a single set of results
+
+    Parameters
+    ----------
+        results_list : list
+            list of dictionaries returned by track_particles_batch, in particle order
+
+    Returns
+    -------
+        results : dict
+            see function track_particles_batch
+    """
+
+    results = {}
+    for key in [
+            'time', 'tdrw_time', 'dist', 'flag', 'frac_ids', 'frac_time',
+            'frac_tdrw_time', 'frac_dist'
+    ]:
+        results[key] = np.concatenate([r[key] for r in results_list])
+
+    # shift the offsets of every batch by the number of fractures before it
+    shift = 0
+    frac_offsets = [np.zeros(1, dtype=np.int64)]
+    for r in results_list:
+        frac_offsets.append(r['frac_offsets'][1:] + shift)
+        shift += r['frac_offsets'][-1]
+    results['frac_offsets'] = np.concatenate(frac_offsets)
+    return results
+
+
+def particle_ranges(nparticles, chunk_size):
+    """ Split the particles into consecutive index ranges
+
+    Parameters
+    ----------
+        nparticles : int
+            number of particles
+
+        chunk_size : int
+            maximum number of particles in a range
+
+    Returns
+    -------
+        ranges : list
+            list of (start, stop) tuples
+    """
+
+    return [(start, min(start + chunk_size, nparticles))
+            for start in range(0, nparticles, chunk_size)]
+
+
+def random_seed(seed=None):
+    """ Entropy of the random streams of a transport run
+
+    Parameters
+    ----------
+        seed : int
+            seed of the run, default is None, in which case fresh entropy is drawn from the operating system
+
+    Returns
+    -------
+        entropy : int
+            entropy of the root numpy.random.SeedSequence, passing it as seed reproduces the run
+    """
+
+    return numpy.random.SeedSequence(seed).entropy
+
+
+def block_generator(entropy, block):
+    """ Independent random generator of a block of particles
+
+    Parameters
+    ----------
+        entropy : int
+            see function random_seed
+
+        block : int
+            index of the block of particles
+
+    Returns
+    -------
+        rng : numpy.random.Generator
+
+    Notes
+    -----
+    The generator is seeded with the child block of SeedSequence(entropy).spawn, built directly from its spawn key so that any block can be generated without spawning the ones before it
+    """
+
+    sequence = numpy.random.SeedSequence(entropy, spawn_key=(block, ))
+    return numpy.random.Generator(numpy.random.PCG64(sequence))
+
+
+def stream_blocks(nparticles, block_size=1000, first_particle=0):
+    """ Split the particles into the blocks that own a random stream
+
+    Parameters
+    ----------
+        nparticles : int
+            number of particles
+
+        block_size : int
+            number of particles per block, default is 1000
+
+        first_particle : int
+            global index of the first particle, must be a multiple of block_size. Default is 0
+
+    Returns
+    -------
+        blocks : list
+            list of (start, stop, block) tuples, particles start:stop use the stream of block
+    """
+
+    if first_particle % block_size != 0:
+        error = "ERROR: first_particle {} is not a multiple of the block size {}\n".format(
+            first_particle, block_size)
+        sys.stderr.write(error)
+        sys.exit(1)
+    first_block = first_particle // block_size
+    return [(start, stop, first_block + b) for b, (start, stop) in enumerate(
+        particle_ranges(nparticles, block_size))]
+
+
+def track_blocks(arrays, blocks, entropy, params):
+    """ Track blocks of particles, each with its own random generator
+
+    Parameters
+    ----------
+        arrays : dict
+            see function compile_transport_arrays
+
+        blocks : list
+            see function stream_blocks
+
+        entropy : int
+            see function random_seed
+
+        params : dict
+            keyword arguments passed to track_particles_batch
+
+    Returns
+    -------
+        results : dict
+            see function track_particles_batch
+    """
+
+    return merge_results([
+        track_particles_batch(arrays,
+                              stop - start,
+                              rng=block_generator(entropy, block),
+                              **params) for start, stop, block in blocks
+    ])
+
+
+def init_transport_worker(arrays, params, entropy):
+    """ Pool initializer, publishes the graph arrays, the transport parameters and the random seed to a worker process once
+
+    Parameters
+    ----------
+        arrays : dict
+            see function compile_transport_arrays
+
+        params : dict
+            keyword arguments passed to track_particles_batch
+
+        entropy : int
+            see function random_seed
+
+    Returns
+    -------
+        None
+    """
+
+    _worker_data['arrays'] = arrays
+    _worker_data['params'] = params
+    _worker_data['entropy'] = entropy
+
+
+def track_particle_blocks(blocks):
+    """ Track a chunk of blocks of particles inside a worker process
+
+    Parameters
+    ----------
+        blocks : list
+            see function stream_blocks
+
+    Returns
+    -------
+        results : dict
+            see function track_particles_batch
+    """
+
+    return track_blocks(_worker_data['arrays'], blocks,
+                        _worker_data['entropy'], _worker_data['params'])
+
+
+def track_particle_chunks(arrays,
+                          nparticles,
+                          ncpu=1,
+                          chunk_size=None,
+                          frac_porosity=1.0,
+                          tdrw_flag=False,
+                          matrix_porosity=0.02,
+                          matrix_diffusivity=1e-11,
+                          seed=None,
+                          first_particle=0,
+                          block_size=1000):
+    """ Track particles in chunks of consecutive particles and yield the results of each chunk in particle order. With ncpu > 1 the chunks are tracked on ncpu processes, the graph arrays are sent to every worker once and workers receive blocks of particle indices
+
+    Parameters
+    ----------
+        arrays : dict
+            see function compile_transport_arrays
+
+        nparticles : int
+            number of particles
+
+        ncpu : int
+            number of processes, default is 1
+
+        chunk_size : int
+            number of particles per chunk, rounded up to a multiple of block_size. Default is 4 chunks per process and at most 100000 particles per chunk
+
+        frac_porosity: float
+            porosity of fracture, default is 1.0
+
+        tdrw_flag : Bool
+            if False, matrix_porosity, matrix_diffusivity are ignored
+
+        matrix_porosity: float
+            default is 0.02
+
+        matrix_diffusivity: float
+            default is 1e-11 m^2/s
+
+        seed : int
+            seed of the random streams, see function random_seed. Default is None
+
+        first_particle : int
+            global index of the first particle, a multiple of block_size. Default is 0
+
+        block_size : int
+            number of particles sharing a random stream, default is 1000
+
+    Yields
+    -------
+        results : dict
+            see function track_particles_batch
+
+    Notes
+    -----
+    Only the results of the chunks being tracked or written are held in memory. Closing the generator early stops the worker processes.
+    Every block of block_size particles is tracked with its own generator, see function block_generator. For a given seed and block_size the results are bit-identical for any ncpu and chunk_size, and a run of n particles can be split into runs with first_particle set to the index of their first particle.
+    """
+
+    if chunk_size is None:
+        chunk_size = min(100000, max(1, -(-nparticles // (4 * ncpu))))
+    blocks_per_chunk = max(1, -(-chunk_size // block_size))
+
+    params = {
+        "frac_porosity": frac_porosity,
+        "tdrw_flag": tdrw_flag,
+        "matrix_porosity": matrix_porosity,
+        "matrix_diffusivity": matrix_diffusivity
+    }
+    if tdrw_flag:
+        arrays = dict(arrays)
+        arrays['a_nondim'] = tdrw_coefficient(arrays['perm'], matrix_porosity,
+                                              matrix_diffusivity)
+    entropy = random_seed(seed)
+    blocks = stream_blocks(nparticles, block_size, first_particle)
+    chunks = [
+        blocks[i:i + blocks_per_chunk]
+        for i in range(0, len(blocks), blocks_per_chunk)
+    ]
+
+    if ncpu > 1:
+        pool = mp.Pool(ncpu,
+                       initializer=init_transport_worker,
+                       initargs=(arrays, params, entropy))
+        try:
+            for results in pool.imap(track_particle_blocks, chunks):
+                yield results
+        except GeneratorExit:
+            # the caller stopped early, discard the chunks still being tracked
+            pool.terminate()
+            raise
+        finally:
+            pool.close()
+            pool.join()
+            pool.terminate()
+    else:
+        for chunk in chunks:
+            yield track_blocks(arrays, chunk, entropy, params)
+
+
+def track_particles_parallel(arrays,
+                             nparticles,
+                             ncpu,
+                             chunk_size=None,
+                             frac_porosity=1.0,
+                             tdrw_flag=False,
+                             matrix_porosity=0.02,
+                             matrix_diffusivity=1e-11,
+                             seed=None):
+    """ Track particles on ncpu processes and merge the results, see function track_particle_chunks
+
+    Parameters
+    ----------
+        arrays : dict
+            see function compile_transport_arrays
+
+        nparticles : int
+            number of particles
+
+        ncpu : int
+            number of processes
+
+        chunk_size : int
+            number of particles per task
+
+        frac_porosity: float
+            porosity of fracture, default is 1.0
+
+        tdrw_flag : Bool
+            if False, matrix_porosity, matrix_diffusivity are ignored
+
+        matrix_porosity: float
+            default is 0.02
+
+        matrix_diffusivity: float
+            default is 1e-11 m^2/s
+
+        seed : int
+            seed of the random streams, default is None
+
+    Returns
+    -------
+        results : dict
+            see function track_particles_batch
+    """
+
+    return merge_results(
+        list(
+            track_particle_chunks(arrays, nparticles, ncpu, chunk_size,
+                                  frac_porosity, tdrw_flag, matrix_porosity,
+                                  matrix_diffusivity, seed)))
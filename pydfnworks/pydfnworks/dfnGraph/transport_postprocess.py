@@ -0,0 +1,334 @@
+"""
+.. module:: transport_postprocess.py
+   :synopsis: streaming breakthrough curves and travel time statistics from particle tracking output files
+
+"""
+
+import numpy as np
+import sys
+import os
+import multiprocessing as mp
+from itertools import islice
+
+from pydfnworks.dfnGraph.transport_statistics import QuantileSketch
+
+
+def partime_columns(header):
+    """ Columns of the travel times and distance in a partime file, from its header
+
+    Parameters
+    ----------
+        header : string
+            first line of the file
+
+    Returns
+    -------
+        columns : dict
+            column index of 'time', 'tdrw_time', and 'dist'
+
+    Notes
+    -----
+    Files written by dfnGraph have the columns advective time, advection+diffusion time, diffusion time, and distance. Files written by DFNTrans start with the number of time steps and the flux weight of the particle, see TrackingPart.c. Without matrix diffusion 'tdrw_time' is the advective time.
+    """
+
+    if header.startswith("# of time steps"):
+        if "diffusion" in header:
+            return {'time': 2, 'tdrw_time': 3, 'dist': 6}
+        return {'time': 2, 'tdrw_time': 2, 'dist': 7}
+    return {'time': 0, 'tdrw_time': 1, 'dist': 3}
+
+
+def is_hdf5(partime_file):
+    """ Check if a partime file is in the hdf5 format written by run_graph_transport
+
+    Parameters
+    ----------
+        partime_file : string
+            name of the file
+
+    Returns
+    -------
+        hdf5 : bool
+    """
+
+    with open(partime_file, "rb") as f:
+        return f.read(8) == b"\x89HDF\r\n\x1a\n"
+
+
+def read_partime_chunks(partime_file, columns=None, chunk_size=1000000):
+    """ Read a partime file in chunks of particles, so the memory used does not depend on the number of particles
+
+    Parameters
+    ----------
+        partime_file : string
+            name of a partime file written by dfnGraph, in the ascii or hdf5 format, or by DFNTrans
+
+        columns : list
+            columns to read, from 'time', 'tdrw_time', and 'dist'. Default is all three
+
+        chunk_size : int
+            number of particles per chunk
+
+    Yields
+    ------
+        chunk : dict
+            NumPy array of each column for the particles of the chunk
+    """
+
+    if columns is None:
+        columns = ['time', 'tdrw_time', 'dist']
+    if not os.path.isfile(partime_file):
+        error = "ERROR: Unable to open supplied partime_file file {}\n".format(
+            partime_file)
+        sys.stderr.write(error)
+        sys.exit(1)
+
+    if is_hdf5(partime_file):
+        import h5py
+        index = partime_columns("")
+        with h5py.File(partime_file, "r") as f:
+            dset = f["partime"]
+            for start in range(0, dset.shape[0], chunk_size):
+                data = dset[start:start + chunk_size]
+                yield {key: data[:, index[key]] for key in columns}
+        return
+
+    with open(partime_file, "r") as f:
+        header = f.readline()
+        index = partime_columns(header)
+        ncol = None
+        if not header.startswith("#"):
+            ncol = len(header.split())
+            lines = [header]
+        else:
+            lines = []
+        while True:
+            lines += list(islice(f, chunk_size - len(lines)))
+            if not lines:
+                break
+            if ncol is None:
+                ncol = len(lines[0].split())
+            data = np.fromstring("".join(lines), sep=" ").reshape(-1, ncol)
+            lines = []
+            yield {key: data[:, index[key]] for key in columns}
+
+
+def summarize_partime_file(partime_file,
+                           columns=None,
+                           chunk_size=1000000,
+                           relative_accuracy=0.001):
+    """ Stream a partime file into one QuantileSketch per column
+
+    Parameters
+    ----------
+        partime_file : string
+            name of the partime file, see function read_partime_chunks
+
+        columns : list
+            columns to summarize, from 'time', 'tdrw_time', and 'dist'. Default is all three
+
+        chunk_size : int
+            number of particles read at a time
+
+        relative_accuracy : float
+            relative accuracy of the quantiles, see QuantileSketch in transport_statistics
+
+    Returns
+    -------
+        sketches : dict
+            QuantileSketch of each column
+    """
+
+    if columns is None:
+        columns = ['time', 'tdrw_time', 'dist']
+    sketches = {key: QuantileSketch(relative_accuracy) for key in columns}
+    for chunk in read_partime_chunks(partime_file, columns, chunk_size):
+        for key in columns:
+            sketches[key].add(chunk[key])
+    return sketches
+
+
+def summarize_partime_worker(args):
+    """ Worker function for summarize_partime
+
+    Parameters
+    ----------
+        args : tuple
+            arguments of summarize_partime_file
+
+    Returns
+    -------
+        sketches : dict
+            see function summarize_partime_file
+    """
+
+    return summarize_partime_file(*args)
+
+
+def summarize_partime(partime_files,
+                      columns=None,
+                      chunk_size=1000000,
+                      relative_accuracy=0.001,
+                      ncpu=1):
+    """ Summarize the travel times of one or more runs, e.g., the partime files of independent particle tracking runs. Files are read in chunks, in parallel when ncpu > 1, and their sketches are merged
+
+    Parameters
+    ----------
+        partime_files : string or list
+            name of a partime file or list of names, see function read_partime_chunks
+
+        columns : list
+            columns to summarize, from 'time', 'tdrw_time', and 'dist'. Default is all three
+
+        chunk_size : int
+            number of particles read at a time
+
+        relative_accuracy : float
+            relative accuracy of the quantiles, see QuantileSketch in transport_statistics
+
+        ncpu : int
+            number of processes reading files
+
+    Returns
+    -------
+        sketches : dict
+            QuantileSketch of each column for the particles of all files. Sketches of other runs can be added with their merge method
+
+    Notes
+    -----
+    Use breakthrough_statistics and log_binned_pdf to evaluate the sketches
+    """
+
+    if isinstance(partime_files, str):
+        partime_files = [partime_files]
+    if columns is None:
+        columns = ['time', 'tdrw_time', 'dist']
+    print("--> Summarizing travel times in %d file(s)" % len(partime_files))
+    args = [(partime_file, columns, chunk_size, relative_accuracy)
+            for partime_file in partime_files]
+    sketches = {key: QuantileSketch(relative_accuracy) for key in columns}
+    if ncpu > 1 and len(partime_files) > 1:
+        pool = mp.Pool(min(ncpu, len(partime_files)))
+        file_sketches = pool.imap_unordered(summarize_partime_worker, args)
+    else:
+        pool = None
+        file_sketches = map(summarize_partime_worker, args)
+    for file_sketch in file_sketches:
+        for key in columns:
+            sketches[key].merge(file_sketch[key])
+    if pool is not None:
+        pool.close()
+        pool.join()
+    print("--> Summarized %d particles" % sketches[columns[0]].count)
+    return sketches
+
+
+def breakthrough_statistics(sketch, quantiles=(0.05, 0.25, 0.5, 0.75,
+                                               0.95)):
+    """ Moments and quantiles of a distribution of travel times
+
+    Parameters
+    ----------
+        sketch : QuantileSketch
+            see function summarize_partime
+
+        quantiles : list
+            quantiles to estimate
+
+    Returns
+    -------
+        stats : dict
+            'count', 'mean', 'variance', 'std', 'min', 'max', 'quantiles', and the estimated 'quantile_values'. Mean and variance are exact, quantiles are within the relative accuracy of the sketch
+    """
+
+    variance = sketch.variance()
+    quantiles = np.asarray(quantiles, dtype=float)
+    return {
+        'count': sketch.count,
+        'mean': sketch.mean(),
+        'variance': variance,
+        'std': np.sqrt(variance),
+        'min': sketch.min if sketch.count else np.nan,
+        'max': sketch.max if sketch.count else np.nan,
+        'quantiles': quantiles,
+        'quantile_values': np.atleast_1d(sketch.quantile(quantiles))
+    }
+
+
+def log_binned_pdf(sketch, bins_per_decade=10):
+    """ Breakthrough curve, the PDF and CDF of the travel times in logarithmically spaced bins
+
+    Parameters
+    ----------
+        sketch : QuantileSketch
+            see function summarize_partime
+
+        bins_per_decade : int
+            number of bins per factor of 10
+
+    Returns
+    -------
+        edges : NumPy array
+            bin edges, aligned with powers of 10
+        pdf : NumPy array
+            probability density in each bin
+        cdf : NumPy array
+            fraction of particles arrived at the right edge of each bin
+
+    Notes
+    -----
+    Values are placed in bins by their value in the sketch, so a value within relative_accuracy of a bin edge may be counted in the neighboring bin. Zero values are only included in the CDF.
+    """
+
+    nonzero = np.flatnonzero(sketch.counts)
+    if len(nonzero) == 0:
+        return np.zeros(0), np.zeros(0), np.zeros(0)
+    values = sketch.bin_value(sketch.offset + nonzero)
+    counts = sketch.counts[nonzero]
+    log_values = np.log10(values) * bins_per_decade
+    lo = np.floor(log_values.min())
+    hi = max(np.floor(log_values.max()) + 1, lo + 1)
+    edges = np.power(10.0, np.arange(lo, hi + 1) / bins_per_decade)
+    index = np.floor(log_values - lo).astype(np.int64)
+    hist = np.bincount(index, weights=counts, minlength=len(edges) - 1)
+    pdf = hist / (sketch.count * np.diff(edges))
+    cdf = (sketch.zero_count + np.cumsum(hist)) / sketch.count
+    return edges, pdf, cdf
+
+
+def dump_breakthrough_curve(sketch, filename, bins_per_decade=10):
+    """ Write the breakthrough curve of the travel times to a text file
+
+    Parameters
+    ----------
+        sketch : QuantileSketch
+            see function summarize_partime
+
+        filename : string
+            name of the file
+
+        bins_per_decade : int
+            number of bins per factor of 10
+
+    Returns
+    -------
+        None
+    """
+
+    edges, pdf, cdf = log_binned_pdf(sketch, bins_per_decade)
+    data = np.column_stack(
+        (edges[:-1], edges[1:], np.sqrt(edges[:-1] * edges[1:]), pdf, cdf))
+    stats = breakthrough_statistics(sketch)
+    try:
+        np.savetxt(
+            filename,
+            data,
+            fmt="%3.6E",
+            header=
+            "particles %d  mean %3.6E  variance %3.6E\nbin start  bin end  bin center  pdf  cdf"
+            % (stats['count'], stats['mean'], stats['variance']))
+    except:
+        error = "ERROR: Unable to open supplied file {}\n".format(filename)
+        sys.stderr.write(error)
+        sys.exit(1)
+    print("--> Breakthrough curve written to file: {}".format(filename))
@@ -0,0 +1,407 @@
+"""
+.. module:: transport_statistics.py
+   :synopsis: streaming statistics of particle travel times for graph transport
+
+"""
+
+import numpy as np
+import sys
+import math
+from time import time as timer
+
+
+class QuantileSketch():
+    '''
+    Streaming, mergeable sketch of a distribution of positive values, e.g. particle travel times. Values are counted in logarithmically spaced bins, so quantiles are returned with a bounded relative error and the memory used does not depend on the number of values.
+
+    Attributes:
+        * relative_accuracy : relative error of the quantiles
+        * gamma : ratio of the bounds of a bin, (1 + relative_accuracy) / (1 - relative_accuracy)
+        * counts : NumPy array, number of values in bins offset, offset + 1, ...
+        * offset : index of the first bin in counts. Bin i holds the values in (gamma^(i-1), gamma^i]
+        * zero_count : number of values that are zero or negative
+        * count : number of values
+        * total : sum of the values
+        * total_squares : sum of the squares of the values
+        * min : smallest value
+        * max : largest value
+    '''
+    def __init__(self, relative_accuracy=0.001):
+        if not 0 < relative_accuracy < 1:
+            error = "ERROR: relative_accuracy must be in (0, 1), got {}\n".format(
+                relative_accuracy)
+            sys.stderr.write(error)
+            sys.exit(1)
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.offset = 0
+        self.zero_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.total_squares = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def bin_index(self, values):
+        """ Bin of each positive value
+
+        Parameters
+        ----------
+            self: object
+
+            values : NumPy array
+                positive values
+
+        Returns
+        -------
+            index : NumPy array
+                bin index of each value
+        """
+
+        return np.ceil(np.log(values) / self.log_gamma).astype(np.int64)
+
+    def bin_value(self, index):
+        """ Representative value of bins, the value with the smallest relative error to the bounds of the bin
+
+        Parameters
+        ----------
+            self: object
+
+            index : NumPy array
+                bin indices
+
+        Returns
+        -------
+            values : NumPy array
+                value of each bin
+        """
+
+        return 2 * np.power(self.gamma, index) / (self.gamma + 1)
+
+    def add_counts(self, index, counts):
+        """ Add counts to bins, growing the array of counts if needed
+
+        Parameters
+        ----------
+            self: object
+
+            index : int
+                bin of counts[0]
+
+            counts : NumPy array
+                counts of bins index, index + 1, ...
+
+        Returns
+        -------
+            None
+        """
+
+        if len(counts) == 0:
+            return
+        if len(self.counts) == 0:
+            self.counts = np.array(counts, dtype=np.int64)
+            self.offset = index
+            return
+        lo = min(self.offset, index)
+        hi = max(self.offset + len(self.counts), index + len(counts))
+        if lo < self.offset or hi > self.offset + len(self.counts):
+            grown = np.zeros(hi - lo, dtype=np.int64)
+            grown[self.offset - lo:self.offset - lo +
+                  len(self.counts)] = self.counts
+            self.counts = grown
+            self.offset = lo
+        self.counts[index - self.offset:index - self.offset +
+                    len(counts)] += counts
+
+    def add(self, values):
+        """ Add values to the sketch
+
+        Parameters
+        ----------
+            self: object
+
+            values : NumPy array
+                values
+
+        Returns
+        -------
+            None
+        """
+
+        values = np.asarray(values, dtype=float).ravel()
+        if values.size == 0:
+            return
+        self.count += values.size
+        self.total += values.sum()
+        self.total_squares += np.dot(values, values)
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+
+        positive = values[values > 0]
+        self.zero_count += values.size - positive.size
+        if positive.size == 0:
+            return
+        index = self.bin_index(positive)
+        lo = index.min()
+        self.add_counts(lo, np.bincount(index - lo))
+
+    def merge(self, other):
+        """ Add the values of another sketch with the same relative accuracy
+
+        Parameters
+        ----------
+            self: object
+
+            other : object
+                QuantileSketch
+
+        Returns
+        -------
+            None
+        """
+
+        if other.gamma != self.gamma:
+            error = "ERROR: Cannot merge sketches with different relative accuracy\n"
+            sys.stderr.write(error)
+            sys.exit(1)
+        self.add_counts(other.offset, other.counts)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.total += other.total
+        self.total_squares += other.total_squares
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q):
+        """ Estimate quantiles of the values
+
+        Parameters
+        ----------
+            self: object
+
+            q : float or NumPy array
+                quantiles in [0, 1]
+
+        Returns
+        -------
+            values : float or NumPy array
+                estimated quantiles, within relative_accuracy of the exact quantiles of the positive values. NaN if the sketch is empty
+        """
+
+        q = np.asarray(q, dtype=float)
+        if self.count == 0:
+            return np.full(q.shape, np.nan)[()]
+        # rank of the quantile among the sorted values
+        rank = q * (self.count - 1)
+        cum = self.zero_count + np.cumsum(self.counts)
+        i = np.searchsorted(cum, rank, side='right')
+        i = np.minimum(i, len(self.counts) - 1)
+        values = self.bin_value(self.offset + i)
+        # exact at the ends of the distribution
+        values = np.clip(values, self.min, self.max)
+        values = np.where(rank < self.zero_count, min(self.min, 0.0), values)
+        return values[()]
+
+    def mean(self):
+        """ Mean of the values, exact
+
+        Parameters
+        ----------
+            self: object
+
+        Returns
+        -------
+            mean : float
+        """
+
+        if self.count == 0:
+            return np.nan
+        return self.total / self.count
+
+    def variance(self):
+        """ Variance of the values, exact up to round-off
+
+        Parameters
+        ----------
+            self: object
+
+        Returns
+        -------
+            variance : float
+        """
+
+        if self.count == 0:
+            return np.nan
+        mean = self.total / self.count
+        return max(self.total_squares / self.count - mean * mean, 0.0)
+
+
+class ConvergenceMonitor():
+    '''
+    Decides when enough particles have been tracked. Travel times are added to a QuantileSketch as particles are written and the quantiles are compared every batch_size particles. Tracking stops once the relative change of every quantile stays within tolerance for patience consecutive batches, or when the wall-clock budget is exceeded.
+
+    Attributes:
+        * quantiles : quantiles of the travel time distribution that are monitored
+        * tolerance : largest relative change of a quantile between batches of a converged run
+        * batch_size : number of particles between checks
+        * max_time : wall-clock budget in seconds, None for no budget
+        * patience : number of consecutive batches within tolerance needed for convergence
+        * column : 'tdrw_time' to monitor the advection+diffusion times, which are the advective times when matrix diffusion is not used, or 'time' to monitor the advective times
+        * sketch : QuantileSketch of the travel times
+        * history : list of dictionaries, one per check, with the number of particles, elapsed time, quantile values and relative change
+        * converged : True once the quantiles are stable
+        * reason : reason tracking stopped, 'converged', 'time budget', or 'particle budget'
+        * nparticles : number of particles tracked when tracking stopped
+    '''
+    def __init__(self,
+                 quantiles=(0.05, 0.5, 0.95),
+                 tolerance=0.01,
+                 batch_size=10000,
+                 max_time=None,
+                 patience=2,
+                 column='tdrw_time',
+                 relative_accuracy=None):
+        if column not in ['time', 'tdrw_time']:
+            error = "ERROR: Unknown column {}, use 'time' or 'tdrw_time'\n".format(
+                column)
+            sys.stderr.write(error)
+            sys.exit(1)
+        if relative_accuracy is None:
+            relative_accuracy = tolerance / 10
+        self.quantiles = np.asarray(quantiles, dtype=float)
+        self.tolerance = tolerance
+        self.batch_size = batch_size
+        self.max_time = max_time
+        self.patience = patience
+        self.column = column
+        self.sketch = QuantileSketch(relative_accuracy)
+        self.history = []
+        self.converged = False
+        self.reason = None
+        self.nparticles = 0
+        self.next_check = batch_size
+        self.stable = 0
+        self.start_time = timer()
+
+    def start(self):
+        """ Reset the monitor at the start of particle tracking
+
+        Parameters
+        ----------
+            self: object
+
+        Returns
+        -------
+            None
+        """
+
+        self.sketch = QuantileSketch(self.sketch.relative_accuracy)
+        self.history = []
+        self.converged = False
+        self.reason = None
+        self.nparticles = 0
+        self.next_check = self.batch_size
+        self.stable = 0
+        self.start_time = timer()
+
+    def add(self, times):
+        """ Add the travel times of exited particles
+
+        Parameters
+        ----------
+            self: object
+
+            times : NumPy array
+                travel times
+
+        Returns
+        -------
+            None
+        """
+
+        self.sketch.add(times)
+
+    def check(self, nparticles):
+        """ Compare the quantiles with those of the previous check
+
+        Parameters
+        ----------
+            self: object
+
+            nparticles : int
+                number of particles tracked so far
+
+        Returns
+        -------
+            stop : bool
+                True if tracking should stop
+        """
+
+        self.nparticles = nparticles
+        if nparticles < self.next_check:
+            return False
+        while self.next_check <= nparticles:
+            self.next_check += self.batch_size
+
+        values = self.sketch.quantile(self.quantiles)
+        elapsed = timer() - self.start_time
+        if self.history:
+            previous = self.history[-1]['values']
+            with np.errstate(divide='ignore', invalid='ignore'):
+                change = np.max(
+                    np.abs(values - previous) / np.abs(previous))
+            if not np.isfinite(change):
+                change = np.inf
+        else:
+            change = np.inf
+        self.history.append({
+            'nparticles': nparticles,
+            'elapsed': elapsed,
+            'values': values,
+            'change': change
+        })
+        print("--> Convergence check at %d particles: %s, relative change %s"
+              % (nparticles, ", ".join(
+                  "t%g = %3.3E" % (100 * q, v)
+                  for q, v in zip(self.quantiles, values)),
+                 "%3.3E" % change if np.isfinite(change) else "n/a"))
+
+        if change <= self.tolerance:
+            self.stable += 1
+        else:
+            self.stable = 0
+        if self.stable >= self.patience:
+            self.converged = True
+            self.reason = 'converged'
+            return True
+        if self.max_time is not None and elapsed >= self.max_time:
+            self.reason = 'time budget'
+            return True
+        return False
+
+    def finish(self, nparticles):
+        """ Record the final number of particles and print the outcome
+
+        Parameters
+        ----------
+            self: object
+
+            nparticles : int
+                number of particles tracked
+
+        Returns
+        -------
+            None
+        """
+
+        self.nparticles = nparticles
+        if self.reason is None:
+            self.reason = 'particle budget'
+        print("--> Stopped after %d particles (%s)" %
+              (nparticles, self.reason))
+        if self.history:
+            print("--> Final quantiles: " + ", ".join(
+                "t%g = %3.3E" % (100 * q, v)
+                for q, v in zip(self.quantiles, self.history[-1]['values'])))
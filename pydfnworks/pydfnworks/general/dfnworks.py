@@ -74,8 +74,9 @@ class DFNWORKS(Frozen):
     # dfnGraph
     import pydfnworks.dfnGraph
     from pydfnworks.dfnGraph.dfn2graph import create_graph, k_shortest_paths_backbone, dump_json_graph, load_json_graph, plot_graph, greedy_edge_disjoint, dump_fractures, add_fracture_source, add_fracture_target
-    from pydfnworks.dfnGraph.graph_flow import run_graph_flow
+    from pydfnworks.dfnGraph.graph_flow import run_graph_flow, graph_effective_perm
     from pydfnworks.dfnGraph.graph_transport import run_graph_transport
+    from pydfnworks.dfnGraph.graph_io import dump_binary_graph, load_binary_graph
 
     def __init__(self,
                  jobname='',